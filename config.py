@@ -10,6 +10,12 @@ load_dotenv()
 class Config:
     """项目配置类"""
     
+    # 数据库后端：mysql 或 sqlite（单机部署的嵌入式数据库）
+    DB_BACKEND = os.getenv('DB_BACKEND', 'mysql').lower()
+    SQLITE_PATH = os.getenv('SQLITE_PATH', './storage/strawberry_trace.db')
+    SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))  # 内存映射读取字节数
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))    # 等待写锁的毫秒数
+    
     # 数据库配置
     DB_HOST = os.getenv('DB_HOST', 'localhost')
     DB_PORT = int(os.getenv('DB_PORT', 3306))
@@ -17,6 +23,49 @@ class Config:
     DB_PASSWORD = os.getenv('DB_PASSWORD')
     DB_NAME = os.getenv('DB_NAME', 'strawberry_trace')
     
+    # 数据库连接池配置
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))            # 连接池容量
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 10))   # 借出连接的最长等待秒数
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))   # 连接空闲超过该秒数后重建
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'  # 借出前探活
+    
+    DB_STREAM_BATCH_SIZE = int(os.getenv('DB_STREAM_BATCH_SIZE', 1000))  # 流式查询每批读取行数
+    DB_IN_CHUNK_SIZE = int(os.getenv('DB_IN_CHUNK_SIZE', 500))  # 批量查询时每条 IN (...) 语句的最大参数个数
+    DB_BULK_INSERT_SIZE = int(os.getenv('DB_BULK_INSERT_SIZE', 500))  # 批量写入时每条多行 INSERT 的行数
+    
+    # SQL执行统计配置
+    DB_METRICS_ENABLED = os.getenv('DB_METRICS_ENABLED', 'true').lower() == 'true'
+    DB_METRICS_SAMPLE_SIZE = int(os.getenv('DB_METRICS_SAMPLE_SIZE', 1024))  # 每个语句保留的延迟样本数
+    DB_SLOW_QUERY_MS = float(os.getenv('DB_SLOW_QUERY_MS', 200))  # 慢查询阈值（毫秒），0表示关闭
+    
+    # 只读从库地址，逗号分隔，例如 "10.0.0.2:3306,10.0.0.3"（账号与库名同主库）
+    DB_READ_REPLICAS = [h.strip() for h in os.getenv('DB_READ_REPLICAS', '').split(',') if h.strip()]
+    
+    # 表结构迁移配置（python main.py migrate）
+    DB_ONLINE_DDL = os.getenv('DB_ONLINE_DDL', 'true').lower() == 'true'  # MySQL 上以 ALGORITHM=INPLACE, LOCK=NONE 执行 ALTER，不阻塞读写
+    MIGRATION_LOCK_TIMEOUT = int(os.getenv('MIGRATION_LOCK_TIMEOUT', 60))  # 等待其他迁移进程释放迁移锁的秒数
+    
+    # 扫码查询缓存配置（按草莓ID和二维码缓存完整信息，写入后失效）
+    STRAWBERRY_CACHE_SIZE = int(os.getenv('STRAWBERRY_CACHE_SIZE', 2048))   # 最大缓存条目数
+    STRAWBERRY_CACHE_TTL = float(os.getenv('STRAWBERRY_CACHE_TTL', 60))     # 条目有效秒数，0表示关闭缓存
+    
+    # 统计报表配置（/api/statistics 按时间范围和粒度统计，快照缓存）
+    STATISTICS_CACHE_TTL = float(os.getenv('STATISTICS_CACHE_TTL', 30))     # 快照有效秒数，0表示关闭缓存
+    STATISTICS_STALE_TTL = float(os.getenv('STATISTICS_STALE_TTL', 300))    # 过期后先返回旧快照并后台刷新的宽限秒数
+    STATISTICS_MAX_BUCKETS = int(os.getenv('STATISTICS_MAX_BUCKETS', 400))  # 单次统计的最大时间段数
+    
+    # 健康检查配置
+    HEALTH_CACHE_TTL = float(os.getenv('HEALTH_CACHE_TTL', 5))            # 检查结果缓存秒数
+    HEALTH_DB_TIMEOUT = float(os.getenv('HEALTH_DB_TIMEOUT', 1))          # 数据库探活借出连接的最长等待秒数
+    HEALTH_POOL_SATURATION = float(os.getenv('HEALTH_POOL_SATURATION', 1.0))  # 连接池使用率达到该比例且有等待者时视为饱和
+    
+    # 草莓列表分页配置（按创建时间倒序的游标分页）
+    LIST_PAGE_SIZE = int(os.getenv('LIST_PAGE_SIZE', 50))           # 未指定 limit 时的每页数量
+    LIST_MAX_PAGE_SIZE = int(os.getenv('LIST_MAX_PAGE_SIZE', 500))  # 每页数量上限
+    
+    # 批量查询接口单次最多解析的二维码数
+    LOOKUP_MAX_CODES = int(os.getenv('LOOKUP_MAX_CODES', 100))
+    
     # 文件存储配置
     IMAGE_STORAGE_PATH = os.getenv('IMAGE_STORAGE_PATH', './images')
     QR_CODE_PATH = os.getenv('QR_CODE_PATH', './qr_codes')
@@ -24,16 +73,38 @@ class Config:
     PHOTO_STORAGE_PATH = os.getenv('PHOTO_STORAGE_PATH', './storage/photo')
     
     # 数据记录配置
-    MAX_RECORDS_PER_STRAWBERRY = 10  # 每颗草莓最多保留记录数
+    MAX_RECORDS_PER_STRAWBERRY = int(os.getenv('MAX_RECORDS_PER_STRAWBERRY', 10))  # 每颗草莓最多保留记录数
+    
+    # 记录清理任务配置（删除超出保留数量的旧记录及其图片）
+    RETENTION_BATCH_SIZE = int(os.getenv('RETENTION_BATCH_SIZE', 200))   # 每批处理的草莓数
+    RETENTION_INTERVAL = int(os.getenv('RETENTION_INTERVAL', 3600))      # 定时清理间隔秒数，0表示不定时执行
+    
+    # 批量操作与后台任务配置
+    BULK_MAX_IDS = int(os.getenv('BULK_MAX_IDS', 10000))        # 批量修改状态/删除时一次最多指定的草莓ID数
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))              # 后台任务（如删除后的文件清理）工作线程数
+    JOB_HISTORY_SIZE = int(os.getenv('JOB_HISTORY_SIZE', 200))  # 保留在内存中供查询的已结束任务数
+    
+    # 观察记录上传处理配置（async 模式下先保存上传文件并返回任务ID，由后台线程池处理）
+    INGEST_MODE = os.getenv('INGEST_MODE', 'sync')                     # 未指定 mode 参数时的处理方式：sync 或 async
+    INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', 2))               # 后台处理上传的线程数
+    INGEST_MAX_PENDING = int(os.getenv('INGEST_MAX_PENDING', 50))      # 排队及处理中的上传数上限，超出时返回503
+    
+    # 完整性检查配置（比对数据库引用的图片、缩略图、二维码文件与存储目录）
+    INTEGRITY_SCAN_WORKERS = int(os.getenv('INTEGRITY_SCAN_WORKERS', 8))   # 并行检查文件的线程数
+    INTEGRITY_CHECKPOINT_PATH = os.getenv('INTEGRITY_CHECKPOINT_PATH', './storage/integrity_checkpoint.json')  # 增量检查的检查点文件
     
     # 二维码配置
     QR_CODE_SIZE = 10
     QR_CODE_BORDER = 4
+    QR_RENDER_WORKERS = int(os.getenv('QR_RENDER_WORKERS', 0))             # 批量渲染二维码的进程数，0表示CPU核数
+    BATCH_CREATE_MAX_COUNT = int(os.getenv('BATCH_CREATE_MAX_COUNT', 20000))  # 一次批量创建的最大草莓数
     
     @classmethod
     def validate_config(cls):
         """验证必要的配置是否已设置"""
-        if not cls.DB_USER or not cls.DB_PASSWORD:
+        if cls.DB_BACKEND not in ('mysql', 'sqlite'):
+            raise ValueError(f"不支持的数据库后端: {cls.DB_BACKEND}（可选 mysql 或 sqlite）")
+        if cls.DB_BACKEND == 'mysql' and (not cls.DB_USER or not cls.DB_PASSWORD):
             raise ValueError("请在.env文件中设置数据库用户名和密码")
         
         # 创建必要的目录
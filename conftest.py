@@ -0,0 +1,92 @@
+"""
+测试共享的运行环境（使用嵌入式SQLite，无需MySQL）
+
+配置在首次导入 config 时读取，同一进程中的所有测试共用一个数据库和存储目录：
+在导入任何项目模块之前设置环境变量，并按旧版本（迁移之前）的表结构创建数据库，
+各测试文件的 setup_module 执行迁移（已是最新版本时不做修改）。
+pytest 会自动加载本文件；直接运行测试文件时由测试文件 import conftest 完成同样的准备。
+"""
+import os
+import atexit
+import shutil
+import sqlite3
+import tempfile
+
+# 迁移之前的表结构（原 database_schema.sql 对应的 SQLite 版本，含 clean_old_records 触发器）
+PRE_SERIES_SCHEMA = """
+CREATE TABLE strawberries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    qr_code VARCHAR(255) UNIQUE NOT NULL,
+    qr_code_path VARCHAR(500),
+    created_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    updated_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    status TEXT DEFAULT 'active' CHECK (status IN ('active', 'inactive', 'harvested')),
+    notes TEXT
+);
+CREATE INDEX idx_qr_code ON strawberries (qr_code);
+CREATE INDEX idx_status ON strawberries (status);
+CREATE INDEX idx_created_at ON strawberries (created_at);
+
+CREATE TABLE strawberry_records (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    strawberry_id INTEGER NOT NULL REFERENCES strawberries (id) ON DELETE CASCADE,
+    image_path VARCHAR(500) NOT NULL,
+    image_url VARCHAR(500),
+    ai_description TEXT,
+    growth_stage TEXT CHECK (growth_stage IN ('seedling', 'flowering', 'fruiting', 'ripening', 'mature')),
+    health_status TEXT DEFAULT 'healthy' CHECK (health_status IN ('healthy', 'warning', 'sick')),
+    size_estimate VARCHAR(50),
+    color_description VARCHAR(100),
+    recorded_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    created_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+CREATE INDEX idx_strawberry_id ON strawberry_records (strawberry_id);
+CREATE INDEX idx_recorded_at ON strawberry_records (recorded_at);
+
+CREATE TRIGGER clean_old_records
+AFTER INSERT ON strawberry_records
+FOR EACH ROW
+BEGIN
+    DELETE FROM strawberry_records
+    WHERE strawberry_id = NEW.strawberry_id
+    AND id NOT IN (
+        SELECT id FROM strawberry_records
+        WHERE strawberry_id = NEW.strawberry_id
+        ORDER BY recorded_at DESC
+        LIMIT 10
+    );
+END;
+
+INSERT INTO strawberries (qr_code, created_at) VALUES
+    ('OLD_001', '2024-05-01 08:00:00'), ('OLD_002', '2024-05-02 08:00:00');
+INSERT INTO strawberry_records (strawberry_id, image_path, growth_stage, health_status, recorded_at) VALUES
+    (1, 'old_1a.jpg', 'seedling', 'healthy', '2024-05-01 09:00:00'),
+    (1, 'old_1b.jpg', 'flowering', 'warning', '2024-05-08 09:00:00'),
+    (2, 'old_2a.jpg', 'fruiting', 'healthy', '2024-05-03 09:00:00');
+"""
+
+
+def _prepare():
+    """创建测试目录和旧版本数据库（同一进程只执行一次）"""
+    if os.environ.get('STRAWBERRY_TEST_DIR'):
+        return os.environ['STRAWBERRY_TEST_DIR']
+    test_dir = tempfile.mkdtemp(prefix='strawberry_test_')
+    os.environ['STRAWBERRY_TEST_DIR'] = test_dir
+    os.environ['DB_BACKEND'] = 'sqlite'
+    os.environ['SQLITE_PATH'] = os.path.join(test_dir, 'strawberry_trace.db')
+    os.environ['IMAGE_STORAGE_PATH'] = os.path.join(test_dir, 'images')
+    os.environ['QR_CODE_PATH'] = os.path.join(test_dir, 'qr_codes')
+    os.environ['PHOTO_STORAGE_PATH'] = os.path.join(test_dir, 'photo')
+    os.environ['INTEGRITY_CHECKPOINT_PATH'] = os.path.join(test_dir, 'integrity_checkpoint.json')
+    # 测试中不启动定时清理线程
+    os.environ['RETENTION_INTERVAL'] = '0'
+
+    connection = sqlite3.connect(os.environ['SQLITE_PATH'])
+    connection.executescript(PRE_SERIES_SCHEMA)
+    connection.commit()
+    connection.close()
+    atexit.register(shutil.rmtree, test_dir, True)
+    return test_dir
+
+
+TEST_DIR = _prepare()
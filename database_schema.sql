@@ -18,8 +18,13 @@ CREATE TABLE strawberries (
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
     status ENUM('active', 'inactive', 'harvested') DEFAULT 'active' COMMENT '草莓状态',
     notes TEXT COMMENT '备注信息',
-    INDEX idx_qr_code (qr_code),
-    INDEX idx_status (status),
+    -- 最新记录的冗余字段，由 StrawberryDAO 在写入/删除记录的同一事务中维护
+    latest_record_id BIGINT NULL COMMENT '最新记录ID',
+    latest_growth_stage ENUM('seedling', 'flowering', 'fruiting', 'ripening', 'mature') NULL COMMENT '最新生长阶段',
+    latest_health_status ENUM('healthy', 'warning', 'sick') NULL COMMENT '最新健康状态',
+    latest_recorded_at TIMESTAMP NULL DEFAULT NULL COMMENT '最新记录时间',
+    record_count INT NOT NULL DEFAULT 0 COMMENT '记录数量',
+    INDEX idx_status_created (status, created_at, id),
     INDEX idx_created_at (created_at)
 ) ENGINE=InnoDB 
 CHARACTER SET utf8mb4 
@@ -38,10 +43,17 @@ CREATE TABLE strawberry_records (
     health_status ENUM('healthy', 'warning', 'sick') DEFAULT 'healthy' COMMENT '健康状态',
     size_estimate VARCHAR(50) COMMENT '大小估计',
     color_description VARCHAR(100) COMMENT '颜色描述',
+    image_width INT COMMENT '图片宽度（像素）',
+    image_height INT COMMENT '图片高度（像素）',
+    image_format VARCHAR(16) COMMENT '图片格式',
+    image_size_bytes BIGINT COMMENT '图片文件大小（字节）',
+    image_has_exif BOOLEAN COMMENT '原图是否带EXIF信息',
+    image_taken_at DATETIME NULL COMMENT '拍摄时间（EXIF）',
+    thumbnail_path VARCHAR(500) COMMENT '缩略图路径',
     recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '记录时间',
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
     FOREIGN KEY (strawberry_id) REFERENCES strawberries(id) ON DELETE CASCADE,
-    INDEX idx_strawberry_id (strawberry_id),
+    INDEX idx_strawberry_recorded (strawberry_id, recorded_at),
     INDEX idx_recorded_at (recorded_at),
     INDEX idx_growth_stage (growth_stage),
     INDEX idx_health_status (health_status)
@@ -69,39 +81,39 @@ CHARACTER SET utf8mb4
 COLLATE utf8mb4_unicode_ci 
 COMMENT='系统操作日志表';
 
--- 创建触发器：自动清理超过10条的历史记录
-DELIMITER //
+-- 4. 统计计数器表
+-- 由 StrawberryDAO 在写入草莓/记录的同一事务中增减，统计接口直接读取；
+-- 名称如 strawberries、records、status:active、stage:flowering、health:healthy、created:2024-12-01，
+-- 与数据不一致时执行 python main.py reconcile_counters 重建
+CREATE TABLE statistics_counters (
+    name VARCHAR(100) PRIMARY KEY COMMENT '计数器名称',
+    value BIGINT NOT NULL DEFAULT 0 COMMENT '计数值',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间'
+) ENGINE=InnoDB 
+CHARACTER SET utf8mb4 
+COLLATE utf8mb4_unicode_ci 
+COMMENT='统计计数器表';
+
+-- 5. 表结构版本表
+-- 由 modules/migrations.py 维护；本脚本对应的版本为 5，之后的变更通过 python main.py migrate 执行
+CREATE TABLE schema_version (
+    version INT PRIMARY KEY COMMENT '迁移版本号',
+    description VARCHAR(255) NOT NULL COMMENT '迁移说明',
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '执行时间',
+    execution_ms INT COMMENT '执行耗时（毫秒）'
+) ENGINE=InnoDB 
+CHARACTER SET utf8mb4 
+COLLATE utf8mb4_unicode_ci 
+COMMENT='表结构版本表';
 
-CREATE TRIGGER clean_old_records 
-AFTER INSERT ON strawberry_records
-FOR EACH ROW
-BEGIN
-    DECLARE record_count INT;
-    
-    -- 计算该草莓的记录数量
-    SELECT COUNT(*) INTO record_count 
-    FROM strawberry_records 
-    WHERE strawberry_id = NEW.strawberry_id;
-    
-    -- 如果超过10条记录，删除最旧的记录
-    IF record_count > 10 THEN
-        DELETE FROM strawberry_records 
-        WHERE strawberry_id = NEW.strawberry_id 
-        AND id NOT IN (
-            SELECT id FROM (
-                SELECT id 
-                FROM strawberry_records 
-                WHERE strawberry_id = NEW.strawberry_id 
-                ORDER BY recorded_at DESC 
-                LIMIT 10
-            ) AS recent_records
-        );
-    END IF;
-END//
+INSERT INTO schema_version (version, description) VALUES
+    (1, '建表脚本初始化'), (2, '建表脚本初始化'), (3, '建表脚本初始化'), (4, '建表脚本初始化'), (5, '建表脚本初始化');
 
-DELIMITER ;
+-- 超出保留数量的旧记录由 modules/retention.py 的清理任务分批删除（同时删除图片文件），
+-- 不再使用逐行触发的 clean_old_records 触发器
 
 -- 创建视图：草莓及其最新记录
+-- 最新记录取自 strawberries 上的冗余字段，只按主键关联一条记录，无需对记录表做窗口排序
 CREATE VIEW strawberry_latest_view AS
 SELECT 
     s.id,
@@ -110,25 +122,16 @@ SELECT
     s.status as strawberry_status,
     s.notes,
     s.created_at as strawberry_created_at,
-    r.id as latest_record_id,
+    s.latest_record_id,
     r.image_path as latest_image_path,
     r.ai_description as latest_ai_description,
-    r.growth_stage as latest_growth_stage,
-    r.health_status as latest_health_status,
-    r.recorded_at as latest_recorded_at
+    s.latest_growth_stage,
+    s.latest_health_status,
+    s.latest_recorded_at,
+    s.record_count,
+    r.thumbnail_path as latest_thumbnail_path
 FROM strawberries s
-LEFT JOIN (
-    SELECT 
-        strawberry_id,
-        id,
-        image_path,
-        ai_description,
-        growth_stage,
-        health_status,
-        recorded_at,
-        ROW_NUMBER() OVER (PARTITION BY strawberry_id ORDER BY recorded_at DESC) as rn
-    FROM strawberry_records
-) r ON s.id = r.strawberry_id AND r.rn = 1;
+LEFT JOIN strawberry_records r ON r.id = s.latest_record_id;
 
 -- 插入示例数据（可选）
 -- INSERT INTO strawberries (qr_code, notes) VALUES 
@@ -0,0 +1,131 @@
+-- 草莓生长溯源系统数据库建表语句（SQLite 版）
+-- 由 database_schema.sql 翻译而来，供 DB_BACKEND=sqlite 的单机部署使用：
+--   ENUM 改为带 CHECK 约束的 TEXT，ON UPDATE CURRENT_TIMESTAMP 改为触发器，
+--   时间默认值使用本地时间，与 MySQL 会话时区设置保持一致。
+-- 首次连接时由 modules/db_backends.py 自动执行。
+
+-- 1. 草莓信息表
+-- 存储每颗草莓的基本信息和二维码信息
+CREATE TABLE IF NOT EXISTS strawberries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,                       -- 草莓唯一标识
+    qr_code VARCHAR(255) UNIQUE NOT NULL,                       -- 二维码内容
+    qr_code_path VARCHAR(500),                                  -- 二维码图片存储路径
+    created_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),  -- 创建时间
+    updated_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),  -- 更新时间
+    status TEXT DEFAULT 'active'
+        CHECK (status IN ('active', 'inactive', 'harvested')),  -- 草莓状态
+    notes TEXT,                                                 -- 备注信息
+    -- 最新记录的冗余字段，由 StrawberryDAO 在写入/删除记录的同一事务中维护
+    latest_record_id INTEGER,                                   -- 最新记录ID
+    latest_growth_stage TEXT,                                   -- 最新生长阶段
+    latest_health_status TEXT,                                  -- 最新健康状态
+    latest_recorded_at TIMESTAMP,                               -- 最新记录时间
+    record_count INTEGER NOT NULL DEFAULT 0                     -- 记录数量
+);
+
+CREATE INDEX IF NOT EXISTS idx_status_created ON strawberries (status, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_created_at ON strawberries (created_at);
+
+-- 更新时间：对应 MySQL 的 ON UPDATE CURRENT_TIMESTAMP
+CREATE TRIGGER IF NOT EXISTS strawberries_updated_at
+AFTER UPDATE ON strawberries
+FOR EACH ROW
+WHEN NEW.updated_at = OLD.updated_at
+BEGIN
+    UPDATE strawberries SET updated_at = datetime('now', 'localtime') WHERE id = NEW.id;
+END;
+
+-- 2. 草莓生长记录表
+-- 存储每颗草莓的生长观察记录，包括照片和AI描述
+CREATE TABLE IF NOT EXISTS strawberry_records (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,                       -- 记录唯一标识
+    strawberry_id INTEGER NOT NULL
+        REFERENCES strawberries(id) ON DELETE CASCADE,          -- 草莓ID，关联strawberries表
+    image_path VARCHAR(500) NOT NULL,                           -- 照片存储路径
+    image_url VARCHAR(500),                                     -- 照片访问URL（可选）
+    ai_description TEXT,                                        -- AI生成的生长状态描述
+    growth_stage TEXT
+        CHECK (growth_stage IN ('seedling', 'flowering', 'fruiting', 'ripening', 'mature')),  -- 生长阶段
+    health_status TEXT DEFAULT 'healthy'
+        CHECK (health_status IN ('healthy', 'warning', 'sick')),  -- 健康状态
+    size_estimate VARCHAR(50),                                  -- 大小估计
+    color_description VARCHAR(100),                             -- 颜色描述
+    image_width INTEGER,                                        -- 图片宽度（像素）
+    image_height INTEGER,                                       -- 图片高度（像素）
+    image_format VARCHAR(16),                                   -- 图片格式
+    image_size_bytes INTEGER,                                   -- 图片文件大小（字节）
+    image_has_exif BOOLEAN,                                     -- 原图是否带EXIF信息
+    image_taken_at TIMESTAMP,                                   -- 拍摄时间（EXIF）
+    thumbnail_path VARCHAR(500),                                -- 缩略图路径
+    recorded_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),  -- 记录时间
+    created_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))    -- 创建时间
+);
+
+CREATE INDEX IF NOT EXISTS idx_strawberry_recorded ON strawberry_records (strawberry_id, recorded_at);
+CREATE INDEX IF NOT EXISTS idx_recorded_at ON strawberry_records (recorded_at);
+CREATE INDEX IF NOT EXISTS idx_growth_stage ON strawberry_records (growth_stage);
+CREATE INDEX IF NOT EXISTS idx_health_status ON strawberry_records (health_status);
+
+-- 3. 系统日志表（可选）
+-- 记录系统操作日志
+CREATE TABLE IF NOT EXISTS system_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,                       -- 日志ID
+    operation_type TEXT NOT NULL
+        CHECK (operation_type IN ('create', 'update', 'delete', 'query')),  -- 操作类型
+    table_name VARCHAR(50) NOT NULL,                            -- 操作的表名
+    record_id INTEGER,                                          -- 操作的记录ID
+    operation_details TEXT,                                     -- 操作详情
+    ip_address VARCHAR(45),                                     -- IP地址
+    user_agent TEXT,                                            -- 用户代理
+    created_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))  -- 操作时间
+);
+
+CREATE INDEX IF NOT EXISTS idx_operation_type ON system_logs (operation_type);
+CREATE INDEX IF NOT EXISTS idx_table_name ON system_logs (table_name);
+CREATE INDEX IF NOT EXISTS idx_logs_created_at ON system_logs (created_at);
+
+-- 4. 统计计数器表
+-- 由 StrawberryDAO 在写入草莓/记录的同一事务中增减，统计接口直接读取；
+-- 名称如 strawberries、records、status:active、stage:flowering、health:healthy、created:2024-12-01，
+-- 与数据不一致时执行 python main.py reconcile_counters 重建
+CREATE TABLE IF NOT EXISTS statistics_counters (
+    name VARCHAR(100) PRIMARY KEY,                              -- 计数器名称
+    value INTEGER NOT NULL DEFAULT 0,                           -- 计数值
+    updated_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))  -- 更新时间
+);
+
+-- 5. 表结构版本表
+-- 由 modules/migrations.py 维护；本脚本对应的版本为 5，之后的变更通过 python main.py migrate 执行
+CREATE TABLE IF NOT EXISTS schema_version (
+    version INTEGER PRIMARY KEY,                                -- 迁移版本号
+    description VARCHAR(255) NOT NULL,                          -- 迁移说明
+    applied_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),  -- 执行时间
+    execution_ms INTEGER                                        -- 执行耗时（毫秒）
+);
+
+INSERT OR IGNORE INTO schema_version (version, description) VALUES
+    (1, '建表脚本初始化'), (2, '建表脚本初始化'), (3, '建表脚本初始化'), (4, '建表脚本初始化'), (5, '建表脚本初始化');
+
+-- 超出保留数量的旧记录由 modules/retention.py 的清理任务分批删除（同时删除图片文件），
+-- 不再使用逐行触发的 clean_old_records 触发器
+
+-- 创建视图：草莓及其最新记录
+-- 最新记录取自 strawberries 上的冗余字段，只按主键关联一条记录，无需对记录表做窗口排序
+CREATE VIEW IF NOT EXISTS strawberry_latest_view AS
+SELECT
+    s.id,
+    s.qr_code,
+    s.qr_code_path,
+    s.status as strawberry_status,
+    s.notes,
+    s.created_at as strawberry_created_at,
+    s.latest_record_id,
+    r.image_path as latest_image_path,
+    r.ai_description as latest_ai_description,
+    s.latest_growth_stage,
+    s.latest_health_status,
+    s.latest_recorded_at,
+    s.record_count,
+    r.thumbnail_path as latest_thumbnail_path
+FROM strawberries s
+LEFT JOIN strawberry_records r ON r.id = s.latest_record_id;
@@ -11,14 +11,11 @@ from modules.database import db_manager
 def check_image_paths():
     """检查数据库中的图片路径"""
     try:
-        # 连接数据库
-        db_manager.connect()
-        
         # 查询观察记录中的图片路径
         query = "SELECT id, strawberry_id, image_path, recorded_at FROM strawberry_records ORDER BY id DESC LIMIT 10"
-        cursor = db_manager.connection.cursor()
-        cursor.execute(query)
-        results = cursor.fetchall()
+        with db_manager.get_cursor(dictionary=False) as cursor:
+            cursor.execute(query)
+            results = cursor.fetchall()
         
         print("📷 数据库中的图片路径:")
         print("=" * 80)
@@ -65,7 +62,7 @@ def check_image_paths():
     except Exception as e:
         print(f"❌ 检查失败: {e}")
     finally:
-        db_manager.close()
+        db_manager.disconnect()
 
 if __name__ == "__main__":
     check_image_paths()
\ No newline at end of file
@@ -5,8 +5,10 @@
 """
 import sys
 import os
+import json
 import argparse
 from datetime import datetime
+from urllib.request import urlopen
 import logging
 
 # 添加项目根目录到Python路径
@@ -15,6 +17,11 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from config import Config
 from modules.trace_service import trace_service
 from modules.database import db_manager
+from modules.retention import retention_engine
+from modules.migrations import migration_runner, MigrationError
+from modules.exporter import bulk_exporter
+from modules.bundle import bundle_exporter
+from modules.batch_create import batch_creator
 
 # 配置日志
 logging.basicConfig(
@@ -49,6 +56,14 @@ class StrawberryTraceApp:
                 logger.error("数据库连接失败，请检查配置")
                 return False
             
+            # 检查表结构版本
+            try:
+                pending = migration_runner.pending()
+                if pending:
+                    logger.warning(f"有 {len(pending)} 个表结构迁移尚未执行，请运行: python main.py migrate")
+            except Exception as e:
+                logger.warning(f"检查表结构版本失败: {e}")
+            
             logger.info("系统初始化完成")
             return True
             
@@ -208,25 +223,25 @@ class StrawberryTraceApp:
             
             # 显示基本信息
             print("\n📋 基本信息:")
-            print(f"ID: {strawberry['id']}")
-            print(f"二维码: {strawberry['qr_code']}")
-            print(f"状态: {strawberry['status']}")
-            print(f"创建时间: {strawberry['created_at']}")
-            if strawberry.get('notes'):
-                print(f"备注: {strawberry['notes']}")
+            print(f"ID: {strawberry.id}")
+            print(f"二维码: {strawberry.qr_code}")
+            print(f"状态: {strawberry.status}")
+            print(f"创建时间: {strawberry.created_at}")
+            if strawberry.notes:
+                print(f"备注: {strawberry.notes}")
             
             # 显示记录
             print(f"\n📈 生长记录 (共{len(records)}条):")
             for i, record in enumerate(records, 1):
                 print(f"\n记录 {i}:")
-                print(f"  时间: {record['recorded_at']}")
-                if record.get('growth_stage'):
-                    print(f"  生长阶段: {record['growth_stage']}")
-                if record.get('health_status'):
-                    print(f"  健康状态: {record['health_status']}")
-                if record.get('ai_description'):
-                    print(f"  AI描述: {record['ai_description']}")
-                print(f"  图片: {record['image_path']}")
+                print(f"  时间: {record.recorded_at}")
+                if record.growth_stage:
+                    print(f"  生长阶段: {record.growth_stage}")
+                if record.health_status:
+                    print(f"  健康状态: {record.health_status}")
+                if record.ai_description:
+                    print(f"  AI描述: {record.ai_description}")
+                print(f"  图片: {record.image_path}")
                 
         except Exception as e:
             logger.error(f"查看草莓信息失败: {e}")
@@ -254,16 +269,16 @@ class StrawberryTraceApp:
             records = full_info['records']
             
             print("✅ 找到草莓信息:")
-            print(f"ID: {strawberry['id']}")
-            print(f"状态: {strawberry['status']}")
-            print(f"创建时间: {strawberry['created_at']}")
+            print(f"ID: {strawberry.id}")
+            print(f"状态: {strawberry.status}")
+            print(f"创建时间: {strawberry.created_at}")
             print(f"记录数量: {len(records)}")
             
             if records:
                 latest_record = records[0]
-                print(f"最新记录时间: {latest_record['recorded_at']}")
-                if latest_record.get('growth_stage'):
-                    print(f"当前生长阶段: {latest_record['growth_stage']}")
+                print(f"最新记录时间: {latest_record.recorded_at}")
+                if latest_record.growth_stage:
+                    print(f"当前生长阶段: {latest_record.growth_stage}")
                 
         except Exception as e:
             logger.error(f"二维码查询失败: {e}")
@@ -294,11 +309,11 @@ class StrawberryTraceApp:
             print("-" * 80)
             
             for strawberry in strawberries:
-                latest_time = strawberry.get('latest_recorded_at', '无记录')
-                growth_stage = strawberry.get('latest_growth_stage', '未知')
+                latest_time = strawberry.latest_recorded_at or '无记录'
+                growth_stage = strawberry.latest_growth_stage or '未知'
                 
-                print(f"{strawberry['id']:<5} {strawberry['qr_code']:<20} "
-                      f"{strawberry['strawberry_status']:<10} {str(latest_time):<20} {growth_stage:<10}")
+                print(f"{strawberry.id:<5} {strawberry.qr_code:<20} "
+                      f"{strawberry.strawberry_status:<10} {str(latest_time):<20} {growth_stage:<10}")
                 
         except Exception as e:
             logger.error(f"查看草莓列表失败: {e}")
@@ -416,30 +431,199 @@ class StrawberryTraceApp:
                 print("❌ 无效的数量")
                 return
             
-            count = int(count_str)
-            if count <= 0 or count > 100:
-                print("❌ 数量必须在1-100之间")
-                return
-            
             prefix = input("请输入前缀（可选，默认SB）: ").strip() or "SB"
-            
-            print(f"正在批量生成 {count} 个二维码...")
-            
-            success_count = 0
-            for i in range(count):
-                strawberry = self.service.create_new_strawberry(f"批量生成 {i+1}", prefix)
-                if strawberry:
-                    success_count += 1
-                    print(f"  {i+1}/{count}: {strawberry['qr_code']}")
-                else:
-                    print(f"  {i+1}/{count}: 生成失败")
-            
-            print(f"✅ 批量生成完成，成功: {success_count}/{count}")
+            self.batch_create_strawberries(int(count_str), prefix, "批量生成")
             
         except Exception as e:
             logger.error(f"批量生成失败: {e}")
             print(f"❌ 批量生成失败: {e}")
     
+    def batch_create_strawberries(self, count, prefix=None, notes=None):
+        """批量创建草莓：后台任务中写入数据库并并行生成二维码，期间显示进度"""
+        try:
+            job = batch_creator.submit(count, prefix, notes)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return False
+        
+        print(f"正在批量创建 {count} 颗草莓...")
+        while not job.wait(0.5):
+            progress = job.to_dict()
+            print(f"\r  二维码 {progress['processed']}/{progress['total']}", end='', flush=True)
+        print()
+        
+        if job.status == 'failed':
+            print(f"❌ 批量创建失败: {job.error}")
+            return False
+        result = job.result
+        print(f"✅ 批量创建完成：{result['created']} 颗草莓，二维码 {result['rendered']} 个，"
+              f"耗时 {result['elapsed_seconds']} 秒")
+        if result['ids']:
+            print(f"草莓ID: {result['ids'][0]} - {result['ids'][-1]}")
+        for item in result['failed']:
+            print(f"  ⚠️ 草莓 {item['id']}（{item['qr_code']}）二维码生成失败: {item['error']}")
+        return not result['failed']
+    
+    def show_db_metrics(self, url=None, top=20):
+        """显示数据库查询统计（指定url时读取运行中的Web服务的统计）"""
+        if url:
+            with urlopen(f"{url.rstrip('/')}/api/metrics/db?top={top}", timeout=10) as response:
+                payload = json.loads(response.read().decode('utf-8'))
+            if not payload.get('success'):
+                print(f"❌ 获取统计失败: {payload.get('message')}")
+                return False
+            metrics = payload['data']
+        else:
+            metrics = db_manager.get_metrics(top)
+        
+        print(f"统计起始时间: {metrics['since']}")
+        print(f"慢查询阈值: {metrics['slow_query_threshold_ms']}ms, 语句指纹数: {metrics['statement_count']}")
+        for pool in metrics.get('pools', []):
+            print(f"连接池 {pool['name']}: 容量 {pool['size']}, 使用中 {pool['in_use']}, "
+                  f"空闲 {pool['idle']}, 等待 {pool['waiting']}")
+        
+        print("-" * 100)
+        print(f"{'调用':>8} {'行数':>10} {'总耗时ms':>12} {'p50':>8} {'p95':>8} {'p99':>8} {'慢':>5}  语句")
+        print("-" * 100)
+        for item in metrics['statements']:
+            print(f"{item['calls']:>8} {item['rows']:>10} {item['total_ms']:>12.1f} "
+                  f"{item['p50_ms']:>8.1f} {item['p95_ms']:>8.1f} {item['p99_ms']:>8.1f} "
+                  f"{item['slow_calls']:>5}  {item['fingerprint'][:80]}")
+        return True
+    
+    def export_data(self, format='ndjson', status=None, start=None, end=None, prefix=None, output=None):
+        """批量导出草莓及其记录（流式写出，不指定输出文件时写到标准输出）"""
+        try:
+            filters = bulk_exporter.build_filters(status, start, end, prefix)
+            chunks = bulk_exporter.stream(format, filters)
+        except ValueError as e:
+            print(f"❌ {e}", file=sys.stderr)
+            return False
+        
+        if not output:
+            for chunk in chunks:
+                sys.stdout.write(chunk)
+            sys.stdout.flush()
+            return True
+        
+        size = 0
+        with open(output, 'w', encoding='utf-8', newline='') as f:
+            for chunk in chunks:
+                f.write(chunk)
+                size += len(chunk)
+        print(f"✅ 已导出到 {output}（{size} 字符）")
+        return True
+    
+    def export_bundle(self, format='zip', ids=None, status=None, start=None, end=None, prefix=None, output=None):
+        """导出溯源包（元数据及图片、二维码文件），不指定输出文件时写到标准输出"""
+        try:
+            filters = bulk_exporter.build_filters(status, start, end, prefix, ids)
+            chunks = bundle_exporter.stream(format, filters)
+        except ValueError as e:
+            print(f"❌ {e}", file=sys.stderr)
+            return False
+        
+        if not output:
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+            return True
+        
+        size = 0
+        with open(output, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+                size += len(chunk)
+        print(f"✅ 溯源包已导出到 {output}（{size / 1024 / 1024:.1f} MB）")
+        return True
+    
+    def backfill_image_metadata(self, batch_size=200):
+        """为已有记录回填图片元数据"""
+        result = self.service.backfill_image_metadata(batch_size)
+        print(f"✅ 已检查 {result['scanned']} 条记录，回填图片元数据 {result['updated']} 条")
+        if result['unreadable']:
+            print(f"⚠️  {result['unreadable']} 条记录的图片缺失或无法读取，未回填")
+        return True
+    
+    def run_integrity_scan(self, full=False, delete_orphans=False, regenerate_thumbnails=False):
+        """比对数据库引用的文件与存储目录，可选删除孤立文件、重新生成缺失的缩略图"""
+        result = self.service.validate_system_integrity(full, delete_orphans, regenerate_thumbnails)
+        scan = result.get('scan')
+        if scan:
+            mode = "全量" if scan['mode'] == 'full' else "增量"
+            print(f"{mode}检查：重新列出 {scan['directories_rescanned']} 个目录，"
+                  f"stat {scan['files_statted']} 个文件，耗时 {scan['elapsed_seconds']} 秒")
+        
+        if result['valid'] and not result['issues']:
+            print("✅ 系统完整性检查通过")
+        else:
+            print("✅ 原图和二维码文件完整" if result['valid'] else "❌ 存在缺失的原图或二维码文件")
+            for issue in result['issues']:
+                print(f"  - {issue}")
+        
+        for kind, references in result.get('missing', {}).items():
+            for reference in references[:10]:
+                owner = f"记录 {reference['record_id']}" if 'record_id' in reference else f"草莓 {reference['strawberry_id']}"
+                print(f"    缺失 {kind}: {owner} {reference['path'] or '（按原图推定的缩略图）'}")
+        for orphan in result.get('orphans', [])[:10]:
+            print(f"    孤立 {orphan['kind']}: {orphan['path']}")
+        
+        for key, value in result.get('statistics', {}).items():
+            print(f"  {key}: {value}")
+        for key, value in result.get('repaired', {}).items():
+            print(f"  {key}: {value}")
+        return result['valid']
+    
+    def run_migrations(self, target=None, dry_run=False, status=False):
+        """执行表结构迁移"""
+        if status:
+            applied = migration_runner.applied_versions()
+            print(f"当前表结构版本: {max(applied) if applied else 0}")
+            for migration in migration_runner.migrations:
+                record = applied.get(migration.version)
+                state = f"已执行 {record['applied_at']}" if record else "未执行"
+                print(f"  {migration.version:03d}  {state:<28} {migration.description}")
+            return True
+        
+        try:
+            results = migration_runner.migrate(target=target, dry_run=dry_run)
+        except MigrationError as e:
+            print(f"❌ {e}")
+            return False
+        
+        if not results:
+            print("✅ 表结构已是最新版本")
+            return True
+        for result in results:
+            action = "将执行" if dry_run else f"已执行（{result['elapsed_ms']} 毫秒）"
+            print(f"{'📝' if dry_run else '✅'} 迁移 {result['version']:03d} {action}: {result['description']}")
+            for statement in result['statements']:
+                print(f"    {statement}")
+        return True
+    
+    def reconcile_counters(self):
+        """根据草莓表和记录表重建统计计数器"""
+        counters = self.service.dao.reconcile_counters()
+        print(f"✅ 统计计数器已重建，共 {len(counters)} 项")
+        print(f"草莓总数: {counters.get('strawberries', 0)}")
+        print(f"记录总数: {counters.get('records', 0)}")
+        return True
+    
+    def run_retention(self, dry_run=False):
+        """清理超出保留数量的旧记录及其图片"""
+        report = retention_engine.run(dry_run=dry_run)
+        if report is None:
+            print("❌ 记录清理正在执行")
+            return False
+        
+        action = "预计删除" if dry_run else "已删除"
+        print(f"保留数量: 每颗草莓 {report['keep']} 条")
+        print(f"{action}: {report['strawberries']} 颗草莓的 {report['records']} 条记录")
+        if not dry_run:
+            print(f"删除图片: {report['images_deleted']} 个，失败 {report['image_errors']} 个")
+        print(f"耗时: {report['elapsed_seconds']} 秒")
+        return True
+    
     def run_interactive_mode(self):
         """运行交互模式"""
         if not self.initialize_system():
@@ -504,6 +688,9 @@ class StrawberryTraceApp:
                     print("❌ 草莓创建失败")
                     return 1
             
+            elif args.command == 'batch_create':
+                return 0 if self.batch_create_strawberries(args.count, args.prefix, args.notes) else 1
+            
             elif args.command == 'add_record':
                 record = self.service.add_observation_record(
                     args.strawberry_id, args.image_path, args.description
@@ -517,10 +704,17 @@ class StrawberryTraceApp:
             
             elif args.command == 'query':
                 if args.qr_code:
-                    full_info = self.service.search_strawberry_by_qr(args.qr_code)
-                else:
-                    full_info = self.service.get_strawberry_full_info(args.strawberry_id)
+                    # 多个二维码一次批量解析
+                    result = self.service.lookup_strawberries_by_qr(args.qr_code)
+                    for full_info in result['found'].values():
+                        strawberry = full_info['strawberry']
+                        print(f"ID: {strawberry['id']}, QR: {strawberry['qr_code']}, "
+                              f"状态: {strawberry['status']}, 记录数: {len(full_info['records'])}")
+                    for qr_code in result['missing']:
+                        print(f"❌ 未找到草莓信息: {qr_code}")
+                    return 0 if result['found'] and not result['missing'] else 1
                 
+                full_info = self.service.get_strawberry_full_info(args.strawberry_id)
                 if full_info:
                     strawberry = full_info['strawberry']
                     print(f"ID: {strawberry['id']}, QR: {strawberry['qr_code']}, "
@@ -536,6 +730,33 @@ class StrawberryTraceApp:
                 print(f"记录总数: {stats.get('total_records', 0)}")
                 return 0
             
+            elif args.command == 'db_metrics':
+                return 0 if self.show_db_metrics(args.url, args.top) else 1
+            
+            elif args.command == 'export':
+                return 0 if self.export_data(args.format, args.status, args.start, args.end,
+                                             args.prefix, args.output) else 1
+            
+            elif args.command == 'bundle':
+                return 0 if self.export_bundle(args.format, args.ids, args.status, args.start, args.end,
+                                               args.prefix, args.output) else 1
+            
+            elif args.command == 'backfill_images':
+                return 0 if self.backfill_image_metadata(args.batch_size) else 1
+            
+            elif args.command == 'integrity':
+                return 0 if self.run_integrity_scan(args.full, args.delete_orphans,
+                                                    args.regenerate_thumbnails) else 1
+            
+            elif args.command == 'retention':
+                return 0 if self.run_retention(args.dry_run) else 1
+            
+            elif args.command == 'migrate':
+                return 0 if self.run_migrations(args.target, args.dry_run, args.status) else 1
+            
+            elif args.command == 'reconcile_counters':
+                return 0 if self.reconcile_counters() else 1
+            
             else:
                 print("❌ 未知命令")
                 return 1
@@ -558,6 +779,12 @@ def create_argument_parser():
     create_parser.add_argument('--notes', '-n', help='备注信息')
     create_parser.add_argument('--prefix', '-p', help='二维码前缀')
     
+    # 批量创建草莓
+    batch_parser = subparsers.add_parser('batch_create', help='批量创建草莓并并行生成二维码')
+    batch_parser.add_argument('count', type=int, help='创建数量')
+    batch_parser.add_argument('--prefix', '-p', help='二维码前缀（字母、数字和连字符）')
+    batch_parser.add_argument('--notes', '-n', help='备注信息')
+    
     # 添加记录
     add_parser = subparsers.add_parser('add_record', help='添加观察记录')
     add_parser.add_argument('strawberry_id', type=int, help='草莓ID')
@@ -568,11 +795,58 @@ def create_argument_parser():
     query_parser = subparsers.add_parser('query', help='查询草莓信息')
     query_group = query_parser.add_mutually_exclusive_group(required=True)
     query_group.add_argument('--strawberry_id', '-id', type=int, help='草莓ID')
-    query_group.add_argument('--qr_code', '-qr', help='二维码内容')
+    query_group.add_argument('--qr_code', '-qr', nargs='+', help='二维码内容（可传多个）')
     
     # 统计
     subparsers.add_parser('stats', help='显示统计信息')
     
+    # 数据库查询统计
+    metrics_parser = subparsers.add_parser('db_metrics', help='显示数据库查询统计')
+    metrics_parser.add_argument('--url', '-u', help='Web服务地址，例如 http://127.0.0.1:5000（不指定时显示本进程统计）')
+    metrics_parser.add_argument('--top', '-t', type=int, default=20, help='显示总耗时最高的前N条语句')
+    
+    # 批量导出
+    export_parser = subparsers.add_parser('export', help='批量导出草莓及其记录（NDJSON/CSV）')
+    export_parser.add_argument('--format', '-f', choices=['ndjson', 'csv'], default='ndjson', help='导出格式')
+    export_parser.add_argument('--status', '-s', help='只导出该状态的草莓')
+    export_parser.add_argument('--from', dest='start', help='创建日期下限 YYYY-MM-DD（含）')
+    export_parser.add_argument('--to', dest='end', help='创建日期上限 YYYY-MM-DD（含）')
+    export_parser.add_argument('--prefix', '-p', help='二维码前缀')
+    export_parser.add_argument('--output', '-o', help='输出文件，不指定时写到标准输出')
+    
+    # 溯源包导出
+    bundle_parser = subparsers.add_parser('bundle', help='导出溯源包（元数据及原图、缩略图、二维码图片的 ZIP/tar 归档）')
+    bundle_parser.add_argument('--format', '-f', choices=['zip', 'tar'], default='zip', help='归档格式')
+    bundle_parser.add_argument('--ids', type=int, nargs='+', help='草莓ID列表')
+    bundle_parser.add_argument('--status', '-s', help='只导出该状态的草莓')
+    bundle_parser.add_argument('--from', dest='start', help='创建日期下限 YYYY-MM-DD（含）')
+    bundle_parser.add_argument('--to', dest='end', help='创建日期上限 YYYY-MM-DD（含）')
+    bundle_parser.add_argument('--prefix', '-p', help='二维码前缀')
+    bundle_parser.add_argument('--output', '-o', help='输出文件，不指定时写到标准输出')
+    
+    # 图片元数据回填
+    images_parser = subparsers.add_parser('backfill_images', help='为已有记录回填图片元数据（尺寸、格式、EXIF、缩略图路径）')
+    images_parser.add_argument('--batch_size', '-b', type=int, default=200, help='每批处理的记录数')
+    
+    # 完整性检查
+    integrity_parser = subparsers.add_parser('integrity', help='检查图片、缩略图、二维码文件与数据库是否一致')
+    integrity_parser.add_argument('--full', action='store_true', help='忽略上次检查的检查点，重新检查全部文件')
+    integrity_parser.add_argument('--delete_orphans', action='store_true', help='删除数据库中没有引用的孤立文件')
+    integrity_parser.add_argument('--regenerate_thumbnails', action='store_true', help='为原图存在的记录重新生成缺失的缩略图')
+    
+    # 记录清理
+    retention_parser = subparsers.add_parser('retention', help='清理超出保留数量的旧记录及其图片')
+    retention_parser.add_argument('--dry_run', action='store_true', help='只统计将要删除的记录，不做修改')
+    
+    # 表结构迁移
+    migrate_parser = subparsers.add_parser('migrate', help='执行表结构迁移')
+    migrate_parser.add_argument('--target', '-t', type=int, help='只迁移到指定版本')
+    migrate_parser.add_argument('--dry_run', action='store_true', help='只列出将要执行的语句，不修改数据库')
+    migrate_parser.add_argument('--status', action='store_true', help='显示各迁移的执行状态')
+    
+    # 统计计数器重建
+    subparsers.add_parser('reconcile_counters', help='根据草莓表和记录表重建统计计数器')
+    
     return parser
 
 def main():
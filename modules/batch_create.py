@@ -0,0 +1,129 @@
+"""
+批量创建草莓模块
+一次创建成百上千颗草莓（如新一季定植）：
+- 二维码内容一次性批量生成；草莓行按 Config.DB_BULK_INSERT_SIZE 多行 INSERT 写入，
+  二维码路径和统计计数器在同一事务中更新，整批全部创建或全部回滚
+- 写入时即分配草莓ID，二维码图片随后在进程池中并行渲染，直接保存为最终文件名 qr_<内容>_id<ID>.png，不再重命名
+- 渲染失败的草莓清空二维码路径并在结果中列出
+"""
+import os
+import re
+import time
+import logging
+from typing import Dict, Optional
+from config import Config
+from modules.strawberry_dao import strawberry_dao
+from modules.qr_code import qr_manager
+from modules.jobs import job_registry, Job
+
+logger = logging.getLogger(__name__)
+
+# 二维码前缀只允许字母、数字和连字符（下划线是二维码内容的分隔符）
+PREFIX_PATTERN = re.compile(r'^[A-Za-z0-9-]{1,32}$')
+
+
+class BatchCreator:
+    """批量创建草莓服务"""
+
+    def __init__(self, max_count: Optional[int] = None):
+        """
+        初始化批量创建服务
+
+        Args:
+            max_count: 一次最多创建的草莓数，默认 Config.BATCH_CREATE_MAX_COUNT
+        """
+        self.dao = strawberry_dao
+        self.qr_manager = qr_manager
+        self.max_count = max_count or Config.BATCH_CREATE_MAX_COUNT
+
+    def validate(self, count, prefix: Optional[str] = None) -> Dict:
+        """
+        校验批量创建参数
+
+        Returns:
+            {'count': 数量, 'prefix': 二维码前缀}
+
+        Raises:
+            ValueError: 数量或前缀无效
+        """
+        try:
+            count = int(count)
+        except (TypeError, ValueError):
+            raise ValueError(f"无效的数量: {count}")
+        if count <= 0 or count > self.max_count:
+            raise ValueError(f"数量必须在1-{self.max_count}之间")
+        prefix = prefix or "SB"
+        if not PREFIX_PATTERN.match(prefix):
+            raise ValueError("二维码前缀只能包含字母、数字和连字符，最长32个字符")
+        return {'count': count, 'prefix': prefix}
+
+    def create(self, count: int, prefix: Optional[str] = None, notes: Optional[str] = None,
+               workers: Optional[int] = None, job: Optional[Job] = None) -> Dict:
+        """
+        批量创建草莓并生成二维码图片
+
+        Args:
+            count: 创建数量
+            prefix: 二维码前缀，默认 SB
+            notes: 备注信息
+            workers: 渲染二维码的进程数，默认 Config.QR_RENDER_WORKERS
+            job: 后台任务，提供时按渲染完成的二维码报告进度
+
+        Returns:
+            {'created': 创建的草莓数, 'ids': 草莓ID列表, 'rendered': 成功生成的二维码图片数,
+             'failed': [{'id', 'qr_code', 'error'}], 'elapsed_seconds': 耗时}
+
+        Raises:
+            ValueError: 参数无效
+        """
+        params = self.validate(count, prefix)
+        started = time.perf_counter()
+
+        qr_codes = self.qr_manager.generate_unique_codes(params['count'], params['prefix'])
+        # 路径前缀与 create_strawberries 中拼接的二维码路径一致
+        path_prefix = os.path.join(self.qr_manager.storage_path, 'qr_')
+        ids = self.dao.create_strawberries(qr_codes, notes, path_prefix)
+        inserted = time.perf_counter()
+
+        items = [(qr_code, f"{path_prefix}{qr_code}_id{strawberry_id}.png")
+                 for qr_code, strawberry_id in zip(qr_codes, ids)]
+        progress = (lambda success: job.advance(errors=0 if success else 1)) if job else None
+        errors = self.qr_manager.render_batch(items, workers, progress)
+
+        failed = [{'id': strawberry_id, 'qr_code': qr_code, 'error': error}
+                  for strawberry_id, qr_code, error in zip(ids, qr_codes, errors) if error is not None]
+        for item in failed:
+            self.dao.update_qr_code_path(item['id'], None)
+
+        result = {
+            'created': len(ids),
+            'ids': ids,
+            'rendered': len(ids) - len(failed),
+            'failed': failed,
+            'elapsed_seconds': round(time.perf_counter() - started, 3)
+        }
+        logger.info(
+            f"批量创建草莓完成：{result['created']} 颗（写入 {inserted - started:.2f} 秒），"
+            f"生成二维码 {result['rendered']} 个，失败 {len(failed)} 个，共耗时 {result['elapsed_seconds']} 秒"
+        )
+        return result
+
+    def submit(self, count, prefix: Optional[str] = None, notes: Optional[str] = None) -> Job:
+        """
+        校验参数后提交为后台任务，进度为已渲染的二维码数
+
+        Raises:
+            ValueError: 参数无效
+        """
+        params = self.validate(count, prefix)
+        return job_registry.submit(
+            'batch_create', self._run, params['count'], params['prefix'], notes,
+            total=params['count'], description=f"批量创建 {params['count']} 颗草莓（前缀 {params['prefix']}）"
+        )
+
+    def _run(self, job: Job, count: int, prefix: str, notes: Optional[str]) -> Dict:
+        return self.create(count, prefix, notes, job=job)
+
+
+# 全局批量创建服务实例
+batch_creator = BatchCreator()
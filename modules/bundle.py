@@ -0,0 +1,242 @@
+"""
+溯源包导出模块
+把一批草莓的元数据和原图、缩略图、二维码图片打包为 ZIP 或 tar 归档，边读取边输出：
+- 草莓及记录经非缓冲游标逐行读取（与批量导出共用查询），文件按块读取并立即写出，
+  不在内存或临时目录中暂存整个归档
+- 每颗草莓一个目录，其中 strawberry.json 记录元数据及各文件在包内的路径、大小和 SHA-256；
+  归档最后写入 manifest.json 汇总
+- 只打包位于图片存储目录和二维码目录中的文件，缺失的文件记录在 strawberry.json 的 missing_files 中
+"""
+import io
+import os
+import re
+import json
+import time
+import tarfile
+import zipfile
+import hashlib
+import logging
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from modules.strawberry_dao import STRAWBERRY_FIELDS, EXPORT_RECORD_FIELDS
+from modules.exporter import iter_grouped, json_default
+from modules.image_manager import image_manager
+from modules.qr_code import qr_manager
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_FORMATS = {
+    'zip': {'mimetype': 'application/zip', 'extension': 'zip'},
+    'tar': {'mimetype': 'application/x-tar', 'extension': 'tar'},
+}
+# 读取文件和输出归档的块大小（字节）
+FILE_CHUNK_SIZE = 256 * 1024
+
+
+class _StreamBuffer(io.RawIOBase):
+    """只追加、不可定位的输出缓冲区，归档写入后由生成器取走已写出的字节"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._offset = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._offset
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class _ZipArchive:
+    """流式 ZIP 写入（不可定位输出，使用数据描述符；图片已压缩，按存储方式写入）"""
+
+    def __init__(self):
+        self.buffer = _StreamBuffer()
+        self.zip = zipfile.ZipFile(self.buffer, 'w', allowZip64=True)
+
+    def add_file(self, name: str, size: int, mtime: float, chunks: Iterator[bytes]) -> Iterator[bytes]:
+        info = zipfile.ZipInfo(name, date_time=time.localtime(max(mtime, 315532800))[:6])
+        info.compress_type = zipfile.ZIP_STORED
+        info.file_size = size
+        with self.zip.open(info, 'w', force_zip64=size >= zipfile.ZIP64_LIMIT) as member:
+            for chunk in chunks:
+                member.write(chunk)
+                yield self.buffer.drain()
+        yield self.buffer.drain()
+
+    def add_bytes(self, name: str, data: bytes) -> Iterator[bytes]:
+        info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+        info.compress_type = zipfile.ZIP_DEFLATED
+        self.zip.writestr(info, data)
+        yield self.buffer.drain()
+
+    def close(self) -> Iterator[bytes]:
+        self.zip.close()
+        yield self.buffer.drain()
+
+
+class _TarArchive:
+    """流式 tar 写入（PAX 格式，直接输出成员头和按块读取的文件内容）"""
+
+    def add_file(self, name: str, size: int, mtime: float, chunks: Iterator[bytes]) -> Iterator[bytes]:
+        info = tarfile.TarInfo(name)
+        info.size = size
+        info.mtime = int(mtime)
+        info.mode = 0o644
+        yield info.tobuf(tarfile.PAX_FORMAT, 'utf-8', 'surrogateescape')
+        yield from chunks
+        remainder = size % tarfile.BLOCKSIZE
+        if remainder:
+            yield tarfile.NUL * (tarfile.BLOCKSIZE - remainder)
+
+    def add_bytes(self, name: str, data: bytes) -> Iterator[bytes]:
+        return self.add_file(name, len(data), time.time(), iter([data]))
+
+    def close(self) -> Iterator[bytes]:
+        yield tarfile.NUL * (tarfile.BLOCKSIZE * 2)
+
+
+def _safe_name(value: str) -> str:
+    """归档内的目录名只保留字母、数字、点、下划线和连字符"""
+    return re.sub(r'[^\w.-]', '_', value)
+
+
+class BundleExporter:
+    """溯源包导出服务"""
+
+    def __init__(self):
+        """初始化溯源包导出服务"""
+        self.image_manager = image_manager
+        self.qr_manager = qr_manager
+
+    def _storage_roots(self) -> Tuple[str, ...]:
+        return tuple(os.path.realpath(path) for path in (self.image_manager.storage_path,
+                                                         self.qr_manager.storage_path))
+
+    @staticmethod
+    def _resolve(path: Optional[str], roots: Tuple[str, ...]) -> Optional[str]:
+        """位于存储目录中且存在的文件返回其真实路径，否则返回None"""
+        if not path:
+            return None
+        real_path = os.path.realpath(path)
+        if not any(real_path.startswith(root + os.sep) for root in roots):
+            logger.warning(f"文件不在存储目录中，不打包: {path}")
+            return None
+        return real_path if os.path.isfile(real_path) else None
+
+    def stream(self, format: str = 'zip', filters: Optional[Dict] = None) -> Iterator[bytes]:
+        """
+        按块产出溯源包
+
+        Args:
+            format: 归档格式 zip 或 tar
+            filters: BulkExporter.build_filters 的返回值
+
+        Raises:
+            ValueError: 未知的归档格式
+        """
+        if format not in BUNDLE_FORMATS:
+            raise ValueError(f"未知的归档格式: {format}，可选: {', '.join(BUNDLE_FORMATS)}")
+        return self._coalesce(self._stream(format, filters or {}))
+    
+    @staticmethod
+    def _coalesce(chunks: Iterator[bytes]) -> Iterator[bytes]:
+        """合并小块（成员头、JSON等），每次至少输出 FILE_CHUNK_SIZE 字节，不输出空块"""
+        buffer: List[bytes] = []
+        size = 0
+        try:
+            for chunk in chunks:
+                if not chunk:
+                    continue
+                buffer.append(chunk)
+                size += len(chunk)
+                if size >= FILE_CHUNK_SIZE:
+                    yield b''.join(buffer)
+                    buffer, size = [], 0
+            if buffer:
+                yield b''.join(buffer)
+        finally:
+            # 客户端提前断开时及时关闭流式查询和正在读取的文件
+            chunks.close()  # type: ignore
+
+    def _stream(self, format: str, filters: Dict) -> Iterator[bytes]:
+        archive = _ZipArchive() if format == 'zip' else _TarArchive()
+        root = f"traceability_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        roots = self._storage_roots()
+        summary = {'strawberry_count': 0, 'record_count': 0, 'file_count': 0, 'total_bytes': 0,
+                   'missing_file_count': 0}
+
+        for strawberry_row, record_rows in iter_grouped(filters):
+            strawberry = dict(zip(STRAWBERRY_FIELDS, strawberry_row))
+            directory = f"{root}/{strawberry['id']}_{_safe_name(strawberry['qr_code'] or '')}"
+            missing: List[str] = []
+
+            def add(path: Optional[str], folder: str, entry: Dict, key: str) -> Iterator[bytes]:
+                """打包一个文件，并把包内路径、大小和校验值记录到 entry[key]"""
+                if not path:
+                    return
+                real_path = self._resolve(path, roots)
+                if not real_path:
+                    missing.append(path)
+                    return
+                stat = os.stat(real_path)
+                name = f"{folder}/{os.path.basename(real_path)}"
+                digest = hashlib.sha256()
+                yield from archive.add_file(f"{directory}/{name}", stat.st_size, stat.st_mtime,
+                                            self._read_chunks(real_path, stat.st_size, digest.update))
+                entry[key] = {'path': name, 'size_bytes': stat.st_size, 'sha256': digest.hexdigest()}
+                summary['file_count'] += 1
+                summary['total_bytes'] += stat.st_size
+
+            files: Dict = {}
+            yield from add(strawberry['qr_code_path'], 'qr_code', files, 'qr_code')
+            records = []
+            for record_row in record_rows:
+                record = dict(zip(EXPORT_RECORD_FIELDS, record_row))
+                record['files'] = {}
+                yield from add(record['image_path'], 'images', record['files'], 'image')
+                yield from add(record['thumbnail_path'], 'thumbnails', record['files'], 'thumbnail')
+                records.append(record)
+
+            metadata = dict(strawberry, files=files, records=records, missing_files=missing)
+            yield from archive.add_bytes(f"{directory}/strawberry.json", self._to_json(metadata))
+            summary['strawberry_count'] += 1
+            summary['record_count'] += len(records)
+            summary['missing_file_count'] += len(missing)
+
+        manifest = dict(summary, format=format, generated_at=datetime.now(), filters=filters)
+        yield from archive.add_bytes(f"{root}/manifest.json", self._to_json(manifest))
+        yield from archive.close()
+        logger.info(f"溯源包导出完成，共 {summary['strawberry_count']} 颗草莓、{summary['file_count']} 个文件")
+
+    @staticmethod
+    def _read_chunks(path: str, size: int, update: Callable[[bytes], None]) -> Iterator[bytes]:
+        """按块读取文件的前 size 字节（与归档成员头中声明的大小一致）"""
+        with open(path, 'rb') as f:
+            remaining = size
+            while remaining > 0:
+                chunk = f.read(min(FILE_CHUNK_SIZE, remaining))
+                if not chunk:
+                    raise IOError(f"文件在打包期间被截断: {path}")
+                remaining -= len(chunk)
+                update(chunk)
+                yield chunk
+
+    @staticmethod
+    def _to_json(data: Dict) -> bytes:
+        return json.dumps(data, ensure_ascii=False, indent=2, default=json_default).encode('utf-8')
+
+
+# 全局溯源包导出服务实例
+bundle_exporter = BundleExporter()
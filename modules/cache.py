@@ -0,0 +1,251 @@
+"""
+查询结果缓存模块
+进程内的读穿透缓存：按TTL过期、超出容量时淘汰最久未使用的条目，并统计命中率。
+写入方在事务提交后按键失效（见 StrawberryDAO）；多进程部署时各进程的缓存独立，
+其他进程的写入最多在TTL后可见。
+SnapshotCache 用于统计等聚合结果，按TTL加宽限期后台刷新，不做写入失效。
+"""
+import time
+import threading
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Hashable
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class TTLCache:
+    """带TTL的LRU缓存（线程安全）"""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 30.0):
+        """
+        初始化缓存
+
+        Args:
+            max_entries: 最大条目数，超出时淘汰最久未使用的条目
+            ttl: 条目有效秒数，0表示关闭缓存
+        """
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        # 每次失效递增；加载期间发生过失效的结果不写入缓存，避免把失效前读到的旧数据放回去
+        self._epoch = 0
+        self._reset_counters()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def _reset_counters(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self._since = datetime.now()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """读取未过期的条目"""
+        if not self.enabled:
+            return default
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def _store(self, key: Hashable, value: Any, epoch: int):
+        with self._lock:
+            if epoch != self._epoch:
+                return
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def put(self, key: Hashable, value: Any):
+        """直接写入条目"""
+        if self.enabled:
+            self._store(key, value, self._epoch)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        读穿透：命中时直接返回，否则调用 loader 加载并写入缓存
+
+        loader 返回 None 时不缓存（例如草莓不存在），之后的创建无需失效缓存。
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        epoch = self._epoch
+        value = loader()
+        if value is not None and self.enabled:
+            self._store(key, value, epoch)
+        return value
+
+    def invalidate(self, *keys: Hashable):
+        """删除指定条目"""
+        with self._lock:
+            self._epoch += 1
+            for key in keys:
+                if self._entries.pop(key, None) is not None:
+                    self.invalidations += 1
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+
+    def stats(self, reset: bool = False) -> Dict:
+        """命中率等统计；reset 为True时读取后清零计数"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            snapshot = {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'since': self._since
+            }
+            if reset:
+                self._reset_counters()
+        return snapshot
+
+
+class SnapshotCache:
+    """
+    计算结果快照缓存（线程安全，stale-while-revalidate）
+
+    快照在TTL内直接返回；过期后的宽限期内先返回旧快照，同时在后台线程重新计算
+    （同一个键同时只有一个后台计算）；超过宽限期或不存在时同步计算。
+    适用于允许短暂滞后、计算代价较高的聚合结果，不做写入失效。
+    """
+
+    def __init__(self, ttl: float = 30.0, stale_ttl: float = 300.0, max_entries: int = 64):
+        """
+        初始化快照缓存
+
+        Args:
+            ttl: 快照有效秒数，0表示关闭缓存
+            stale_ttl: 过期后仍可返回旧快照的宽限秒数
+            max_entries: 最大快照数，超出时淘汰最久未使用的快照
+        """
+        self.ttl = ttl
+        self.stale_ttl = max(0.0, stale_ttl)
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._refreshing = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refresh_errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """返回键对应的快照，按需同步或在后台重新计算"""
+        if not self.enabled:
+            return compute()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, computed_at = entry
+                age = time.monotonic() - computed_at
+                if age < self.ttl + self.stale_ttl:
+                    self._entries.move_to_end(key)
+                    if age < self.ttl:
+                        self.hits += 1
+                    else:
+                        self.stale_hits += 1
+                        self._start_refresh(key, compute)
+                    return value
+            self.misses += 1
+        value = compute()
+        self._store(key, value)
+        return value
+
+    def _start_refresh(self, key: Hashable, compute: Callable[[], Any]):
+        """后台重新计算（调用方持有锁）"""
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+        threading.Thread(target=self._refresh, args=(key, compute),
+                         name='snapshot-refresh', daemon=True).start()
+
+    def _refresh(self, key: Hashable, compute: Callable[[], Any]):
+        try:
+            self._store(key, compute())
+        except Exception as e:
+            # 保留旧快照，宽限期内下次读取时重试
+            with self._lock:
+                self.refresh_errors += 1
+            logger.warning(f"后台刷新快照失败: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _store(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """清空快照"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """命中、旧快照命中和后台刷新失败次数"""
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._entries),
+                'ttl_seconds': self.ttl,
+                'stale_seconds': self.stale_ttl,
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'refreshing': len(self._refreshing),
+                'refresh_errors': self.refresh_errors
+            }
+
+
+def strawberry_key(strawberry_id: int) -> tuple:
+    """草莓完整信息（基本信息+最近记录+图片信息）的缓存键"""
+    return ('strawberry', int(strawberry_id))
+
+
+def qr_key(qr_code: str) -> tuple:
+    """二维码到草莓ID的缓存键"""
+    return ('qr', qr_code)
+
+
+# 全局草莓查询缓存实例（扫码查询路径）
+strawberry_cache = TTLCache(Config.STRAWBERRY_CACHE_SIZE, Config.STRAWBERRY_CACHE_TTL)
@@ -0,0 +1,170 @@
+"""
+数据库连接池模块
+为多线程的Web请求提供独立的数据库会话，负责连接的借出、归还、空闲回收和借出前探活
+"""
+import threading
+import time
+import logging
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PoolExhaustedError(Exception):
+    """连接池在等待超时后仍无可用连接"""
+
+
+class ConnectionPool:
+    """固定容量的线程安全连接池"""
+
+    def __init__(self, creator: Callable[[], Any], size: int = 5, timeout: float = 10.0,
+                 recycle: int = 1800, pre_ping: bool = True,
+                 ping: Optional[Callable[[Any], None]] = None, name: str = 'primary'):
+        """
+        初始化连接池
+
+        Args:
+            creator: 创建新连接的函数
+            size: 连接池容量（同时打开的最大连接数）
+            timeout: 借出连接时的最长等待秒数
+            recycle: 连接空闲超过该秒数后在下次借出时重建，0表示不回收
+            pre_ping: 借出前是否探测连接可用性
+            ping: 探活函数，连接不可用时应抛出异常
+            name: 连接池名称（用于日志）
+        """
+        self._creator = creator
+        self._ping = ping
+        self.size = max(1, int(size))
+        self.timeout = timeout
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+        self.name = name
+
+        self._idle = deque()  # (连接, 最近归还时间)，后进先出以保持热连接
+        self._cond = threading.Condition()
+        self._in_use = 0
+        self._waiting = 0
+        self._created_total = 0
+        self._recycled_total = 0
+        self._closed = False
+
+    def acquire(self, timeout: Optional[float] = None) -> Any:
+        """
+        借出一个连接，池满时最多等待 timeout 秒
+
+        Args:
+            timeout: 本次最长等待秒数，默认使用连接池的 timeout
+        """
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    # 关闭后再次使用时重新开放（例如 disconnect 之后又发起查询）
+                    self._closed = False
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._in_use + len(self._idle) < self.size:
+                    conn, last_used = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolExhaustedError(
+                        f"连接池[{self.name}]已耗尽（容量 {self.size}），等待 {timeout} 秒后仍无可用连接"
+                    )
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            self._in_use += 1
+
+        try:
+            if conn is not None:
+                conn = self._validate(conn, last_used)
+            if conn is None:
+                conn = self._creator()
+                with self._cond:
+                    self._created_total += 1
+            return conn
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+    def _validate(self, conn: Any, last_used: float) -> Optional[Any]:
+        """检查空闲连接是否需要回收或已失效，失效时返回None"""
+        if self.recycle and time.monotonic() - last_used > self.recycle:
+            logger.info(f"连接池[{self.name}]回收空闲超过 {self.recycle} 秒的连接")
+            self._close_quietly(conn)
+            with self._cond:
+                self._recycled_total += 1
+            return None
+        if self.pre_ping and self._ping is not None:
+            try:
+                self._ping(conn)
+            except Exception as e:
+                logger.warning(f"连接池[{self.name}]探活失败，重建连接: {e}")
+                self._close_quietly(conn)
+                with self._cond:
+                    self._recycled_total += 1
+                return None
+        return conn
+
+    def release(self, conn: Any, discard: bool = False):
+        """
+        归还连接
+
+        Args:
+            conn: 借出的连接
+            discard: 为True时直接关闭该连接而不放回池中
+        """
+        if not discard:
+            try:
+                # 结束借出期间隐式开启的事务，避免下一个使用者读到旧快照
+                if getattr(conn, 'in_transaction', True):
+                    conn.rollback()
+            except Exception as e:
+                logger.warning(f"连接池[{self.name}]归还连接时回滚失败，丢弃该连接: {e}")
+                discard = True
+
+        with self._cond:
+            self._in_use -= 1
+            if discard or self._closed:
+                self._close_quietly(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def close_all(self):
+        """关闭所有空闲连接，借出中的连接在归还时关闭"""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._close_quietly(conn)
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        """获取连接池使用情况"""
+        with self._cond:
+            return {
+                'name': self.name,
+                'size': self.size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'waiting': self._waiting,
+                'created_total': self._created_total,
+                'recycled_total': self._recycled_total
+            }
+
+    @staticmethod
+    def _close_quietly(conn: Any):
+        """关闭连接并忽略错误"""
+        try:
+            conn.close()
+        except Exception:
+            pass
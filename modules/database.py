@@ -1,159 +1,531 @@
 """
 数据库连接管理模块
-负责MySQL数据库的连接、关闭和基础操作
+负责数据库的连接池、读写分离、关闭和基础操作，具体存储（MySQL/SQLite）由 db_backends 提供
 """
-import mysql.connector
-from mysql.connector import Error
 from contextlib import contextmanager
+from itertools import cycle
+from typing import List, Optional
+import threading
+import time
 import logging
 from config import Config
+from .connection_pool import ConnectionPool
+from .db_backends import DB_ERRORS, create_backend
+from .query_stats import QueryStats
+
+# 两种后端驱动的异常基类
+Error = DB_ERRORS
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class TransactionRolledBack(Exception):
+    """事务中有操作失败，整个事务已回滚"""
+
+class _TransactionState:
+    """当前线程进行中的事务"""
+    
+    def __init__(self, pool, connection):
+        self.pool = pool
+        self.connection = connection
+        self.depth = 0
+        self.rollback_only = False
+        self.after_commit = []
+
 class DatabaseManager:
     """数据库管理器"""
     
-    def __init__(self):
-        """初始化数据库管理器"""
-        self.config = {
-            'host': Config.DB_HOST,
-            'port': Config.DB_PORT,
-            'user': Config.DB_USER,
-            'password': Config.DB_PASSWORD,
-            'database': Config.DB_NAME,
-            'charset': 'utf8mb4',
-            'autocommit': False
-        }
-        self.connection = None
+    def __init__(self, backend=None, read_replicas: Optional[List[str]] = None):
+        """
+        初始化数据库管理器
+        
+        Args:
+            backend: 存储后端实例，默认按 Config.DB_BACKEND 创建
+            read_replicas: 只读从库地址列表（"host" 或 "host:port"），默认读取 Config.DB_READ_REPLICAS
+        """
+        self.backend = backend or create_backend()
+        # 每次 get_cursor() 从连接池借出独立连接，避免并发请求共用同一个会话和事务
+        self.pool = self._create_pool(self.backend, 'primary')
+        
+        # 只读从库连接池，execute_query 轮询分发到这些连接池
+        if read_replicas is None:
+            read_replicas = Config.DB_READ_REPLICAS
+        self.replica_pools = []
+        if read_replicas and not self.backend.remote:
+            logger.warning(f"{self.backend.name} 后端不支持只读从库，忽略 DB_READ_REPLICAS")
+            read_replicas = []
+        for index, endpoint in enumerate(read_replicas):
+            replica = self.backend.for_replica(endpoint)
+            self.replica_pools.append(self._create_pool(replica, f'replica-{index + 1}'))
+        self._replica_cycle = cycle(self.replica_pools) if self.replica_pools else None
+        self._replica_lock = threading.Lock()
+        
+        # SQL执行统计与慢查询日志
+        self.stats = QueryStats(
+            slow_query_ms=Config.DB_SLOW_QUERY_MS,
+            sample_size=Config.DB_METRICS_SAMPLE_SIZE,
+            enabled=Config.DB_METRICS_ENABLED
+        )
+        
+        # 线程级状态：本次请求内写过主库后，后续读取也走主库以保证读到自己的写入
+        self._local = threading.local()
+    
+    @staticmethod
+    def _create_pool(backend, name):
+        """为指定后端创建连接池"""
+        return ConnectionPool(
+            backend.connect,
+            size=Config.DB_POOL_SIZE,
+            timeout=Config.DB_POOL_TIMEOUT,
+            recycle=Config.DB_POOL_RECYCLE,
+            # 进程内的SQLite无需借出前探活
+            pre_ping=Config.DB_POOL_PRE_PING and backend.remote,
+            ping=backend.ping,
+            name=name
+        )
     
     def connect(self):
-        """建立数据库连接"""
+        """建立数据库连接（预热连接池）"""
         try:
-            self.connection = mysql.connector.connect(**self.config)
-            if self.connection.is_connected():
-                logger.info("成功连接到MySQL数据库")
-                # 设置会话时区为本地时区，避免TIMESTAMP隐式转换导致的时间偏差
-                try:
-                    from datetime import datetime
-                    local_offset = datetime.now().astimezone().utcoffset()
-                    if local_offset is not None:
-                        total_seconds = int(local_offset.total_seconds())
-                        sign = '+' if total_seconds >= 0 else '-'
-                        abs_seconds = abs(total_seconds)
-                        hours = abs_seconds // 3600
-                        minutes = (abs_seconds % 3600) // 60
-                        offset_str = f"{sign}{hours:02d}:{minutes:02d}"
-                        cur = self.connection.cursor()
-                        cur.execute("SET time_zone = %s", (offset_str,))
-                        cur.close()
-                        logger.info(f"会话时区已设置为: {offset_str}")
-                except Exception as tz_err:
-                    logger.warning(f"设置会话时区失败: {tz_err}")
-                return True
-        except Error as e:
+            connection = self.pool.acquire()
+            self.pool.release(connection)
+            return True
+        except Exception as e:
             logger.error(f"数据库连接失败: {e}")
             return False
-        return False
     
     def disconnect(self):
-        """关闭数据库连接"""
-        if self.connection and self.connection.is_connected():
-            self.connection.close()
-            logger.info("数据库连接已关闭")
+        """关闭连接池中的所有连接"""
+        for pool in [self.pool] + self.replica_pools:
+            pool.close_all()
+        logger.info("数据库连接已关闭")
     
     def is_connected(self):
-        """检查数据库连接状态"""
-        return self.connection and self.connection.is_connected()
+        """检查连接池中是否有已建立的连接"""
+        stats = self.pool.stats()
+        return stats['in_use'] + stats['idle'] > 0
+    
+    def mark_primary_read(self):
+        """标记当前线程后续的读取走主库（写入后自动调用）"""
+        self._local.read_primary = True
+    
+    def end_request(self):
+        """请求结束时清理线程级路由状态，之后的读取重新分发到从库"""
+        self._local.read_primary = False
+    
+    def _select_pool(self, read_only):
+        """根据读写类型和当前线程状态选择连接池"""
+        if not read_only or not self.replica_pools or getattr(self._local, 'read_primary', False):
+            return self.pool
+        with self._replica_lock:
+            return next(self._replica_cycle)
+    
+    def _acquire(self, read_only, timeout=None):
+        """借出连接，从库不可用时回退到主库"""
+        pool = self._select_pool(read_only)
+        if pool is self.pool:
+            return pool, pool.acquire(timeout)
+        try:
+            return pool, pool.acquire(timeout)
+        except Exception as e:
+            logger.warning(f"从库[{pool.name}]不可用，读取回退到主库: {e}")
+            return self.pool, self.pool.acquire(timeout)
+    
+    def in_transaction(self):
+        """当前线程是否处于 transaction() 代码块中"""
+        return getattr(self._local, 'transaction', None) is not None
     
     @contextmanager
-    def get_cursor(self, dictionary=True):
-        """获取游标的上下文管理器"""
-        if not self.is_connected():
-            if not self.connect():
-                raise Exception("无法建立数据库连接")
+    def transaction(self):
+        """
+        工作单元事务的上下文管理器
+        
+        代码块内所有 execute_* 及 DAO 方法共用同一个主库连接，不再各自提交，
+        代码块正常结束时统一提交一次；出现异常或其中任一语句失败时整体回滚。
+        嵌套使用时内层加入外层事务。
         
-        cursor = self.connection.cursor(dictionary=dictionary)
+        Raises:
+            TransactionRolledBack: 代码块内有语句失败（即使异常已被DAO吞掉）
+        """
+        state = getattr(self._local, 'transaction', None)
+        if state is not None:
+            state.depth += 1
+            try:
+                yield
+            except Exception:
+                state.rollback_only = True
+                raise
+            finally:
+                state.depth -= 1
+            return
+        
+        connection = self.pool.acquire()
+        state = _TransactionState(self.pool, connection)
+        self._local.transaction = state
+        discard = False
         try:
-            yield cursor
-        except Exception as e:
-            self.connection.rollback()
-            logger.error(f"数据库操作失败，已回滚: {e}")
+            if self.backend.begin_statement:
+                cursor = self.backend.cursor(connection, dictionary=False)
+                try:
+                    cursor.execute(self.backend.begin_statement)
+                finally:
+                    cursor.close()
+            yield
+            if state.rollback_only:
+                raise TransactionRolledBack("事务中有操作失败，已整体回滚")
+            connection.commit()
+            self.mark_primary_read()
+            self._run_after_commit(state.after_commit)
+        except Exception:
+            try:
+                connection.rollback()
+            except Error as rollback_err:
+                logger.warning(f"事务回滚失败: {rollback_err}")
+                discard = True
             raise
+        finally:
+            self._local.transaction = None
+            self.pool.release(connection, discard=discard)
+    
+    def after_commit(self, callback):
+        """
+        在当前事务提交后执行回调（例如失效缓存）；不在事务中时立即执行
+        
+        事务回滚时回调不执行。
+        """
+        state = getattr(self._local, 'transaction', None)
+        if state is None:
+            self._run_after_commit([callback])
+        else:
+            state.after_commit.append(callback)
+    
+    @staticmethod
+    def _run_after_commit(callbacks):
+        """执行提交后回调，单个回调失败不影响其他回调和已提交的事务"""
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"事务提交后回调执行失败: {e}")
+    
+    @contextmanager
+    def savepoint(self, name='sp'):
+        """
+        事务内的保存点：代码块失败时只回滚到保存点，外层事务可以继续并正常提交
+        
+        Args:
+            name: 保存点名称
+        
+        Raises:
+            RuntimeError: 不在 transaction() 中调用
+        """
+        state = getattr(self._local, 'transaction', None)
+        if state is None:
+            raise RuntimeError("savepoint() 只能在 transaction() 中使用")
+        
+        rollback_only = state.rollback_only
+        cursor = self.backend.cursor(state.connection, dictionary=False)
+        try:
+            # 保存点必须位于已开启的事务中，否则释放保存点会直接提交
+            if not getattr(state.connection, 'in_transaction', True):
+                cursor.execute("BEGIN")
+            cursor.execute(f"SAVEPOINT {name}")
+            try:
+                yield
+            except Exception:
+                cursor.execute(f"ROLLBACK TO SAVEPOINT {name}")
+                # 保存点之后的失败已回滚，不再影响外层事务
+                state.rollback_only = rollback_only
+                raise
+            cursor.execute(f"RELEASE SAVEPOINT {name}")
         finally:
             cursor.close()
     
-    def execute_query(self, query, params=None, fetch_one=False, fetch_all=True):
-        """执行查询操作"""
+    @contextmanager
+    def get_connection(self, read_only=False, timeout=None):
+        """
+        从连接池借出连接的上下文管理器，退出时归还
+        
+        处于 transaction() 中时直接使用事务连接（读取也走主库，以看到未提交的写入）。
+        
+        Args:
+            read_only: 为True时优先使用只读从库
+            timeout: 借出连接的最长等待秒数，默认 Config.DB_POOL_TIMEOUT
+        """
+        state = getattr(self._local, 'transaction', None)
+        if state is not None:
+            yield state.connection
+            return
+        
+        pool, connection = self._acquire(read_only, timeout)
+        discard = False
+        try:
+            yield connection
+        except Error:
+            # 连接级错误（断线等）时不再放回池中
+            discard = not self.backend.is_usable(connection)
+            raise
+        finally:
+            pool.release(connection, discard=discard)
+    
+    @contextmanager
+    def get_cursor(self, dictionary=True, commit=False, read_only=False):
+        """
+        获取游标的上下文管理器
+        
+        Args:
+            dictionary: 是否以字典形式返回行
+            commit: 代码块正常结束后是否提交事务
+            read_only: 为True时优先使用只读从库
+        """
+        with self.get_connection(read_only=read_only) as connection:
+            state = getattr(self._local, 'transaction', None)
+            cursor = self.backend.cursor(connection, dictionary=dictionary)
+            try:
+                yield cursor
+                if commit and state is None:
+                    connection.commit()
+                    self.mark_primary_read()
+            except Exception as e:
+                if state is not None:
+                    # 事务内的失败由 transaction() 统一回滚
+                    state.rollback_only = True
+                    logger.error(f"事务内数据库操作失败，事务将回滚: {e}")
+                    raise
+                try:
+                    connection.rollback()
+                except Error as rollback_err:
+                    logger.warning(f"回滚失败: {rollback_err}")
+                logger.error(f"数据库操作失败，已回滚: {e}")
+                raise
+            finally:
+                cursor.close()
+    
+    def execute_query(self, query, params=None, fetch_one=False, fetch_all=True, dictionary=True):
+        """执行查询操作（配置了从库时读取从库）；dictionary 为False时返回元组行"""
+        started = time.perf_counter()
         try:
-            with self.get_cursor() as cursor:
+            with self.get_cursor(dictionary=dictionary, read_only=True) as cursor:
                 cursor.execute(query, params or ())
                 
                 if fetch_one:
-                    return cursor.fetchone()
+                    result = cursor.fetchone()
+                    rows = 1 if result else 0
                 elif fetch_all:
-                    return cursor.fetchall()
+                    result = cursor.fetchall()
+                    rows = len(result)
                 else:
-                    return cursor.rowcount
+                    result = rows = cursor.rowcount
+                self.stats.record(query, params, time.perf_counter() - started, rows)
+                return result
         except Error as e:
+            self.stats.record(query, params, time.perf_counter() - started, error=True)
             logger.error(f"查询执行失败: {e}")
             raise
     
+    def iter_query(self, query, params=None, batch_size=None, dictionary=True):
+        """
+        流式查询：使用非缓冲游标按批读取结果并逐行产出，内存占用与结果集大小无关
+        
+        迭代期间占用一个连接；提前中断迭代时该连接会被丢弃而不是读完剩余结果。
+        
+        Args:
+            query: 查询语句
+            params: 查询参数
+            batch_size: 每次从服务器读取的行数，默认 Config.DB_STREAM_BATCH_SIZE
+            dictionary: 是否以字典形式返回行
+        
+        Yields:
+            查询结果行
+        """
+        batch_size = batch_size or Config.DB_STREAM_BATCH_SIZE
+        if self.in_transaction():
+            # 事务连接还要执行后续语句，不能被非缓冲结果占住
+            with self.get_cursor(dictionary=dictionary) as cursor:
+                started = time.perf_counter()
+                cursor.execute(query, params or ())
+                result = cursor.fetchall()
+                self.stats.record(query, params, time.perf_counter() - started, len(result))
+            for row in result:
+                yield row
+            return
+        
+        pool, connection = self._acquire(read_only=True)
+        cursor = None
+        finished = False
+        # 只统计数据库侧耗时（执行与取数），不包含调用方处理每行的时间
+        elapsed = 0.0
+        row_count = 0
+        try:
+            started = time.perf_counter()
+            cursor = self.backend.cursor(connection, dictionary=dictionary, buffered=False)
+            cursor.execute(query, params or ())
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                elapsed += time.perf_counter() - started
+                if not rows:
+                    break
+                row_count += len(rows)
+                for row in rows:
+                    yield row
+                started = time.perf_counter()
+            finished = True
+        except Error as e:
+            self.stats.record(query, params, elapsed, row_count, error=True)
+            logger.error(f"流式查询失败: {e}")
+            raise
+        finally:
+            if finished:
+                self.stats.record(query, params, elapsed, row_count)
+                cursor.close()
+            # 未读完的非缓冲结果会阻塞该会话，直接关闭连接代价更低
+            pool.release(connection, discard=not finished)
+    
     def execute_insert(self, query, params=None):
         """执行插入操作"""
+        started = time.perf_counter()
         try:
-            with self.get_cursor() as cursor:
+            with self.get_cursor(commit=True) as cursor:
                 cursor.execute(query, params or ())
-                self.connection.commit()
-                return cursor.lastrowid
+                result, rows = cursor.lastrowid, cursor.rowcount
+            # 耗时包含提交
+            self.stats.record(query, params, time.perf_counter() - started, rows)
+            return result
         except Error as e:
+            self.stats.record(query, params, time.perf_counter() - started, error=True)
             logger.error(f"插入操作失败: {e}")
             raise
     
+    def execute_insert_rows(self, query, row_placeholder, rows):
+        """
+        多行插入：一条 INSERT ... VALUES (...), (...) 语句写入多行
+        
+        后端不保证同一语句的自增ID连续时（见 backend.consecutive_insert_ids）改为逐行插入，
+        返回的ID均为数据库实际分配的ID。
+        
+        Args:
+            query: 以 VALUES 结尾的插入语句，例如 "INSERT INTO t (a, b) VALUES"
+            row_placeholder: 单行占位符，例如 "(%s, %s)"
+            rows: 每行的参数元组列表
+        
+        Returns:
+            与 rows 顺序对应的自增ID列表
+        
+        Raises:
+            RuntimeError: 写入的行数与 rows 不一致
+        """
+        if not rows:
+            return []
+        full_query = f"{query} {', '.join([row_placeholder] * len(rows))}"
+        params = tuple(value for row in rows for value in row)
+        started = time.perf_counter()
+        try:
+            with self.get_cursor(commit=True) as cursor:
+                if self.backend.consecutive_insert_ids(cursor):
+                    cursor.execute(full_query, params)
+                    if cursor.rowcount != len(rows):
+                        raise RuntimeError(f"多行插入写入 {cursor.rowcount} 行，应为 {len(rows)} 行")
+                    first_id = self.backend.first_insert_id(cursor, len(rows))
+                    ids = list(range(first_id, first_id + len(rows)))
+                else:
+                    full_query, params = f"{query} {row_placeholder}", rows[0]
+                    ids = []
+                    for row in rows:
+                        cursor.execute(full_query, row)
+                        ids.append(cursor.lastrowid)
+            # 耗时包含提交
+            self.stats.record(full_query, params, time.perf_counter() - started, len(rows))
+            return ids
+        except Error as e:
+            self.stats.record(full_query, params, time.perf_counter() - started, error=True)
+            logger.error(f"批量插入操作失败: {e}")
+            raise
+    
     def execute_update(self, query, params=None):
         """执行更新操作"""
+        started = time.perf_counter()
         try:
-            with self.get_cursor() as cursor:
+            with self.get_cursor(commit=True) as cursor:
                 cursor.execute(query, params or ())
-                self.connection.commit()
-                return cursor.rowcount
+                rows = cursor.rowcount
+            # 耗时包含提交
+            self.stats.record(query, params, time.perf_counter() - started, rows)
+            return rows
         except Error as e:
+            self.stats.record(query, params, time.perf_counter() - started, error=True)
             logger.error(f"更新操作失败: {e}")
             raise
     
     def execute_delete(self, query, params=None):
         """执行删除操作"""
+        started = time.perf_counter()
         try:
-            with self.get_cursor() as cursor:
+            with self.get_cursor(commit=True) as cursor:
                 cursor.execute(query, params or ())
-                self.connection.commit()
-                return cursor.rowcount
+                rows = cursor.rowcount
+            # 耗时包含提交
+            self.stats.record(query, params, time.perf_counter() - started, rows)
+            return rows
         except Error as e:
+            self.stats.record(query, params, time.perf_counter() - started, error=True)
             logger.error(f"删除操作失败: {e}")
             raise
     
     def execute_many(self, query, params_list):
         """批量执行操作"""
+        params_list = list(params_list)
+        # 统计中的参数个数按单组计算，组数单独记录
+        first_params = params_list[0] if params_list else None
+        started = time.perf_counter()
         try:
-            with self.get_cursor() as cursor:
+            with self.get_cursor(commit=True) as cursor:
                 cursor.executemany(query, params_list)
-                self.connection.commit()
-                return cursor.rowcount
+                rows = cursor.rowcount
+            # 耗时包含提交
+            self.stats.record(query, first_params, time.perf_counter() - started, rows,
+                              batch_size=len(params_list))
+            return rows
         except Error as e:
+            self.stats.record(query, first_params, time.perf_counter() - started, error=True,
+                              batch_size=len(params_list))
             logger.error(f"批量操作失败: {e}")
             raise
     
+    def get_pool_stats(self):
+        """获取主库和各从库连接池的使用情况"""
+        return [pool.stats() for pool in [self.pool] + self.replica_pools]
+    
+    def get_metrics(self, top=None):
+        """获取SQL执行统计快照和连接池使用情况"""
+        snapshot = self.stats.snapshot(top)
+        snapshot['pools'] = self.get_pool_stats()
+        return snapshot
+    
+    def ping(self, timeout=None):
+        """
+        借用连接池中的主库连接做轻量探活（不新建连接）
+        
+        Args:
+            timeout: 借出连接的最长等待秒数，默认 Config.DB_POOL_TIMEOUT；连接池饱和时超时后抛出 PoolExhaustedError
+        
+        Returns:
+            探活往返耗时（秒）
+        """
+        started = time.perf_counter()
+        with self.get_connection(timeout=timeout) as connection:
+            self.backend.ping(connection)
+        return time.perf_counter() - started
+    
     def test_connection(self):
         """测试数据库连接"""
         try:
-            if self.connect():
-                result = self.execute_query("SELECT VERSION()", fetch_one=True)
-                logger.info(f"数据库版本: {result}")
-                return True
+            result = self.execute_query(self.backend.version_query, fetch_one=True)
+            logger.info(f"数据库版本: {result}")
+            return True
         except Exception as e:
             logger.error(f"数据库连接测试失败: {e}")
         return False
 
 # 全局数据库管理器实例
-db_manager = DatabaseManager()
\ No newline at end of file
+db_manager = DatabaseManager()
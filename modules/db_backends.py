@@ -0,0 +1,345 @@
+"""
+数据库存储后端模块
+把MySQL与嵌入式SQLite的连接、游标和方言差异封装在统一接口之后，
+DatabaseManager 与 DAO 使用同一套 %s 占位符的SQL即可在两种后端上运行
+"""
+import os
+import re
+import sqlite3
+import threading
+import logging
+from datetime import datetime, date
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import mysql.connector
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# 两种后端驱动的异常基类，供 except 子句统一捕获
+DB_ERRORS = (mysql.connector.Error, sqlite3.Error)
+
+SQLITE_SCHEMA_FILE = Path(__file__).resolve().parent.parent / 'database_schema_sqlite.sql'
+
+
+class MySQLBackend:
+    """MySQL 后端"""
+
+    name = 'mysql'
+    remote = True  # 每次查询都有网络往返，借出连接前值得探活
+    version_query = "SELECT VERSION()"
+    begin_statement = None        # 关闭自动提交后首条语句隐式开启事务
+    for_update = " FOR UPDATE"    # 事务内读取后要据此写入时使用加锁读
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        """
+        初始化MySQL后端
+
+        Args:
+            config: mysql.connector 连接参数，默认读取 Config
+        """
+        self.config = config or {
+            'host': Config.DB_HOST,
+            'port': Config.DB_PORT,
+            'user': Config.DB_USER,
+            'password': Config.DB_PASSWORD,
+            'database': Config.DB_NAME,
+            'charset': 'utf8mb4',
+            'autocommit': False
+        }
+        self._consecutive_ids: Optional[bool] = None
+
+    @property
+    def endpoint(self) -> str:
+        """连接地址描述"""
+        return f"{self.config['host']}:{self.config['port']}"
+
+    def for_replica(self, endpoint: str) -> 'MySQLBackend':
+        """
+        创建指向只读从库的后端（账号与库名同主库）
+
+        Args:
+            endpoint: "host" 或 "host:port"
+        """
+        host, _, port = endpoint.strip().partition(':')
+        return MySQLBackend(dict(self.config, host=host, port=int(port) if port else self.config['port']))
+
+    def connect(self):
+        """创建一个新的MySQL连接"""
+        connection = mysql.connector.connect(**self.config)
+        logger.info(f"成功连接到MySQL数据库: {self.endpoint}")
+        # 设置会话时区为本地时区，避免TIMESTAMP隐式转换导致的时间偏差
+        try:
+            local_offset = datetime.now().astimezone().utcoffset()
+            if local_offset is not None:
+                total_seconds = int(local_offset.total_seconds())
+                sign = '+' if total_seconds >= 0 else '-'
+                abs_seconds = abs(total_seconds)
+                hours = abs_seconds // 3600
+                minutes = (abs_seconds % 3600) // 60
+                offset_str = f"{sign}{hours:02d}:{minutes:02d}"
+                cur = connection.cursor()
+                cur.execute("SET time_zone = %s", (offset_str,))
+                cur.close()
+                logger.info(f"会话时区已设置为: {offset_str}")
+        except Exception as tz_err:
+            logger.warning(f"设置会话时区失败: {tz_err}")
+        return connection
+
+    @staticmethod
+    def ping(connection):
+        """探测连接是否可用，不可用时抛出异常"""
+        connection.ping(reconnect=False)
+
+    @staticmethod
+    def is_usable(connection) -> bool:
+        """判断连接在出错后是否仍可复用"""
+        try:
+            return connection.is_connected()
+        except Exception:
+            return False
+
+    def consecutive_insert_ids(self, cursor) -> bool:
+        """
+        同一条多行 INSERT 分配的自增ID是否保证连续
+        
+        只有 auto_increment_increment 为1且 innodb_autoinc_lock_mode 不是2（交错模式，MySQL 8 默认）时
+        InnoDB 才为一条语句分配连续的ID。结果按后端缓存，不满足时 execute_insert_rows 改为逐行插入。
+        """
+        if self._consecutive_ids is None:
+            cursor.execute("SELECT @@auto_increment_increment AS increment, @@innodb_autoinc_lock_mode AS lock_mode")
+            row = cursor.fetchone()
+            increment, lock_mode = (row['increment'], row['lock_mode']) if isinstance(row, dict) else row
+            self._consecutive_ids = int(increment) == 1 and int(lock_mode) != 2
+            if not self._consecutive_ids:
+                logger.info(f"自增ID不保证连续（auto_increment_increment={increment}, "
+                            f"innodb_autoinc_lock_mode={lock_mode}），多行插入改为逐行插入")
+        return self._consecutive_ids
+    
+    @staticmethod
+    def first_insert_id(cursor, row_count: int) -> int:
+        """多行 INSERT 后第一行的自增ID（ID连续时 lastrowid 即第一行）"""
+        return cursor.lastrowid
+    
+    @staticmethod
+    def concat(*expressions: str) -> str:
+        """字符串拼接表达式"""
+        return f"CONCAT({', '.join(expressions)})"
+    
+    @staticmethod
+    def upsert_add(table: str, key_column: str, value_column: str) -> str:
+        """按主键累加数值的插入语句：行不存在时插入，存在时把数值加到原值上"""
+        return (f"INSERT INTO {table} ({key_column}, {value_column}) VALUES (%s, %s) "
+                f"ON DUPLICATE KEY UPDATE {value_column} = {value_column} + VALUES({value_column})")
+    
+    @staticmethod
+    def cursor(connection, dictionary: bool = True, buffered: Optional[bool] = None):
+        """创建游标，buffered=False 时为流式（非缓冲）游标"""
+        if buffered is None:
+            return connection.cursor(dictionary=dictionary)
+        return connection.cursor(dictionary=dictionary, buffered=buffered)
+
+
+@lru_cache(maxsize=1024)
+def translate_placeholders(query: str) -> str:
+    """把 mysql.connector 风格的 %s 占位符和 %% 转义翻译为 sqlite3 的 ? 风格"""
+    return re.sub(r'%([s%])', lambda m: '?' if m.group(1) == 's' else '%', query)
+
+
+def _dict_row_factory(cursor, row):
+    """sqlite3 行工厂：以字典形式返回行"""
+    return {column[0]: value for column, value in zip(cursor.description, row)}
+
+
+def _adapt_datetime(value: datetime) -> str:
+    """datetime 按 MySQL TIMESTAMP 的文本格式存储，保证字符串比较与时间顺序一致"""
+    return value.isoformat(' ', timespec='seconds' if not value.microsecond else 'microseconds')
+
+
+def _convert_timestamp(value: bytes):
+    """读取 TIMESTAMP/DATETIME 列时还原为 datetime"""
+    text = value.decode()
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        return text
+
+
+sqlite3.register_adapter(datetime, _adapt_datetime)
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+sqlite3.register_converter('TIMESTAMP', _convert_timestamp)
+sqlite3.register_converter('DATETIME', _convert_timestamp)
+
+
+class SQLiteCursor:
+    """sqlite3 游标包装：执行前翻译占位符，其余接口与 mysql.connector 游标一致"""
+
+    __slots__ = ('_cursor',)
+
+    def __init__(self, cursor: sqlite3.Cursor):
+        self._cursor = cursor
+
+    def execute(self, query, params=()):
+        return self._cursor.execute(translate_placeholders(query), params or ())
+
+    def executemany(self, query, params_list):
+        return self._cursor.executemany(translate_placeholders(query), params_list)
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size=None):
+        return self._cursor.fetchmany(size) if size else self._cursor.fetchmany()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def close(self):
+        self._cursor.close()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+
+class SQLiteBackend:
+    """嵌入式 SQLite 后端（WAL 模式，适用于单机部署、基准测试和测试）"""
+
+    name = 'sqlite'
+    remote = False  # 进程内调用，无需借出前探活
+    version_query = "SELECT sqlite_version()"
+    begin_statement = "BEGIN IMMEDIATE"  # 事务开始即取得写锁，事务内的读取与随后的写入一致
+    for_update = ""                      # 写事务已串行执行，无需加锁读
+
+    def __init__(self, path: Optional[str] = None, mmap_size: Optional[int] = None,
+                 busy_timeout_ms: Optional[int] = None):
+        """
+        初始化SQLite后端
+
+        Args:
+            path: 数据库文件路径，默认 Config.SQLITE_PATH
+            mmap_size: 内存映射读取的字节数，默认 Config.SQLITE_MMAP_SIZE
+            busy_timeout_ms: 写锁等待毫秒数，默认 Config.SQLITE_BUSY_TIMEOUT_MS
+        """
+        self.path = path or Config.SQLITE_PATH
+        self.mmap_size = Config.SQLITE_MMAP_SIZE if mmap_size is None else mmap_size
+        self.busy_timeout_ms = Config.SQLITE_BUSY_TIMEOUT_MS if busy_timeout_ms is None else busy_timeout_ms
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    @property
+    def endpoint(self) -> str:
+        """连接地址描述"""
+        return self.path
+
+    def for_replica(self, endpoint: str):
+        """SQLite 没有从库"""
+        raise ValueError("SQLite 后端不支持只读从库")
+
+    def connect(self):
+        """打开数据库文件并设置连接参数，首次连接时创建表结构"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+
+        connection = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout_ms / 1000,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            check_same_thread=False  # 连接由连接池在线程间借出，同一时刻只有一个线程使用
+        )
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("PRAGMA synchronous = NORMAL")
+        connection.execute("PRAGMA foreign_keys = ON")
+        connection.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        connection.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        self._ensure_schema(connection)
+        logger.info(f"成功打开SQLite数据库: {self.path}")
+        return connection
+
+    def _ensure_schema(self, connection):
+        """数据库中还没有表时执行 SQLite 建表脚本"""
+        if self._schema_ready:
+            return
+        with self._schema_lock:
+            if self._schema_ready:
+                return
+            exists = connection.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'strawberries'"
+            ).fetchone()
+            if not exists:
+                with open(SQLITE_SCHEMA_FILE, 'r', encoding='utf-8') as f:
+                    connection.executescript(f.read())
+                connection.commit()
+                logger.info(f"已创建SQLite表结构: {SQLITE_SCHEMA_FILE.name}")
+            self._schema_ready = True
+
+    @staticmethod
+    def ping(connection):
+        """探测连接是否可用，不可用时抛出异常"""
+        connection.execute("SELECT 1")
+
+    @staticmethod
+    def is_usable(connection) -> bool:
+        """判断连接在出错后是否仍可复用"""
+        try:
+            connection.execute("SELECT 1")
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def consecutive_insert_ids(cursor) -> bool:
+        """同一条多行 INSERT 分配的自增ID是否保证连续（写入串行执行，始终连续）"""
+        return True
+    
+    @staticmethod
+    def first_insert_id(cursor, row_count: int) -> int:
+        """多行 INSERT 后第一行的自增ID（写入串行执行，lastrowid 为最后一行）"""
+        return cursor.lastrowid - row_count + 1
+    
+    @staticmethod
+    def concat(*expressions: str) -> str:
+        """字符串拼接表达式（SQLite 3.44 之前没有 CONCAT 函数）"""
+        return f"({' || '.join(expressions)})"
+    
+    @staticmethod
+    def upsert_add(table: str, key_column: str, value_column: str) -> str:
+        """按主键累加数值的插入语句：行不存在时插入，存在时把数值加到原值上"""
+        return (f"INSERT INTO {table} ({key_column}, {value_column}) VALUES (%s, %s) "
+                f"ON CONFLICT ({key_column}) DO UPDATE SET {value_column} = {value_column} + excluded.{value_column}")
+    
+    @staticmethod
+    def cursor(connection, dictionary: bool = True, buffered: Optional[bool] = None):
+        """创建游标；sqlite3 游标本身按需逐行读取，buffered 参数无需区分"""
+        cursor = connection.cursor()
+        if dictionary:
+            cursor.row_factory = _dict_row_factory
+        return SQLiteCursor(cursor)
+
+
+def create_backend(name: Optional[str] = None):
+    """
+    按名称创建存储后端
+
+    Args:
+        name: 'mysql' 或 'sqlite'，默认 Config.DB_BACKEND
+    """
+    name = (name or Config.DB_BACKEND).lower()
+    if name == 'mysql':
+        return MySQLBackend()
+    if name == 'sqlite':
+        return SQLiteBackend()
+    raise ValueError(f"不支持的数据库后端: {name}")
@@ -0,0 +1,176 @@
+"""
+批量导出模块
+按状态、创建日期范围和二维码前缀筛选，把草莓及其观察记录流式导出为 NDJSON 或 CSV：
+- 数据经非缓冲游标逐行读取，输出按块产出，内存占用与数据量无关
+- NDJSON 每行一颗草莓（records 为其记录列表）；CSV 每行一条记录，草莓字段在每行重复
+- 同一个生成器既用于 HTTP 分块响应，也用于 python main.py export 写入文件
+"""
+import io
+import csv
+import json
+import logging
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from modules.strawberry_dao import strawberry_dao, STRAWBERRY_FIELDS, EXPORT_RECORD_FIELDS
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = {
+    'ndjson': {'mimetype': 'application/x-ndjson', 'extension': 'ndjson'},
+    'csv': {'mimetype': 'text/csv', 'extension': 'csv'},
+}
+# 输出块大小（字符数），累计到该大小后产出一块
+CHUNK_SIZE = 64 * 1024
+# 按ID列表导出时的最大ID数
+MAX_EXPORT_IDS = 5000
+CSV_COLUMNS = list(STRAWBERRY_FIELDS) + [f"record_{field}" for field in EXPORT_RECORD_FIELDS]
+
+_STRAWBERRY_COUNT = len(STRAWBERRY_FIELDS)
+
+
+def json_default(value):
+    """json.dumps 的 default：日期时间输出ISO格式"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"无法序列化的类型: {type(value).__name__}")
+
+
+def _csv_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return '' if value is None else value
+
+
+def _parse_day(value: str, name: str) -> date:
+    try:
+        return datetime.fromisoformat(value).date()
+    except ValueError as e:
+        raise ValueError(f"无效的{name}日期: {value}，格式应为 YYYY-MM-DD") from e
+
+
+def iter_grouped(filters: Dict) -> Iterator[Tuple[Tuple, List[Tuple]]]:
+    """按草莓分组读取导出行，产出 (草莓字段, [记录字段])"""
+    rows = strawberry_dao.iter_export_rows(**filters)
+    try:
+        current: Optional[Tuple] = None
+        records: List[Tuple] = []
+        for row in rows:
+            strawberry, record = tuple(row[:_STRAWBERRY_COUNT]), tuple(row[_STRAWBERRY_COUNT:])
+            if current is not None and strawberry[0] != current[0]:
+                yield current, records
+                records = []
+            current = strawberry
+            # LEFT JOIN 没有匹配到记录时，记录字段（含记录ID）为空
+            if record[0] is not None:
+                records.append(record)
+        if current is not None:
+            yield current, records
+    finally:
+        rows.close()  # type: ignore
+
+
+class BulkExporter:
+    """批量导出服务"""
+
+    @staticmethod
+    def build_filters(status: Optional[str] = None, start: Optional[str] = None, end: Optional[str] = None,
+                      prefix: Optional[str] = None, ids: Optional[Sequence[int]] = None) -> Dict:
+        """
+        解析筛选条件
+
+        Args:
+            status: 草莓状态
+            start: 创建日期下限 YYYY-MM-DD（含）
+            end: 创建日期上限 YYYY-MM-DD（含）
+            prefix: 二维码前缀
+            ids: 草莓ID列表，为None时不按ID筛选
+
+        Returns:
+            iter_export_rows 的参数
+
+        Raises:
+            ValueError: 日期无效或ID过多
+        """
+        if ids is not None and len(ids) > MAX_EXPORT_IDS:
+            raise ValueError(f"一次最多按 {MAX_EXPORT_IDS} 个草莓ID导出")
+        created_from = _parse_day(start, '开始') if start else None
+        created_to = _parse_day(end, '结束') if end else None
+        if created_from and created_to and created_from > created_to:
+            raise ValueError("开始日期不能晚于结束日期")
+        return {
+            'status': status or None,
+            'created_from': datetime.combine(created_from, datetime.min.time()) if created_from else None,
+            'created_before': datetime.combine(created_to + timedelta(days=1), datetime.min.time())
+            if created_to else None,
+            'qr_prefix': prefix or None,
+            'strawberry_ids': list(ids) if ids is not None else None
+        }
+
+    def stream(self, format: str = 'ndjson', filters: Optional[Dict] = None) -> Iterator[str]:
+        """
+        按块产出导出内容
+
+        Args:
+            format: 导出格式 ndjson 或 csv
+            filters: build_filters 的返回值
+
+        Raises:
+            ValueError: 未知的导出格式
+        """
+        if format not in EXPORT_FORMATS:
+            raise ValueError(f"未知的导出格式: {format}，可选: {', '.join(EXPORT_FORMATS)}")
+        lines = self._ndjson_lines if format == 'ndjson' else self._csv_lines
+        return self._chunked(lines(filters or {}))
+
+    @staticmethod
+    def _chunked(lines: Iterator[str]) -> Iterator[str]:
+        """把逐行输出合并为较大的块，减少分块响应和写文件的次数"""
+        buffer: List[str] = []
+        size = 0
+        try:
+            for line in lines:
+                buffer.append(line)
+                size += len(line)
+                if size >= CHUNK_SIZE:
+                    yield ''.join(buffer)
+                    buffer, size = [], 0
+            if buffer:
+                yield ''.join(buffer)
+        finally:
+            # 客户端提前断开时及时释放流式查询占用的连接
+            lines.close()  # type: ignore
+
+    def _ndjson_lines(self, filters: Dict) -> Iterator[str]:
+        count = 0
+        for strawberry, records in iter_grouped(filters):
+            item = dict(zip(STRAWBERRY_FIELDS, strawberry))
+            item['records'] = [dict(zip(EXPORT_RECORD_FIELDS, record)) for record in records]
+            count += 1
+            yield json.dumps(item, ensure_ascii=False, default=json_default) + '\n'
+        logger.info(f"NDJSON 导出完成，共 {count} 颗草莓")
+
+    def _csv_lines(self, filters: Dict) -> Iterator[str]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        def flush() -> str:
+            text = buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            return text
+
+        # 带BOM，便于 Excel 按 UTF-8 打开中文内容
+        writer.writerow(CSV_COLUMNS)
+        yield '\ufeff' + flush()
+        count = 0
+        empty_record = (None,) * len(EXPORT_RECORD_FIELDS)
+        for strawberry, records in iter_grouped(filters):
+            for record in records or [empty_record]:
+                writer.writerow([_csv_value(value) for value in strawberry + record])
+                count += 1
+                yield flush()
+        logger.info(f"CSV 导出完成，共 {count} 行")
+
+
+# 全局批量导出服务实例
+bulk_exporter = BulkExporter()
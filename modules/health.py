@@ -0,0 +1,121 @@
+"""
+健康检查模块
+为负载均衡探针提供存活/就绪检查：复用连接池连接做轻量探活，结果按TTL缓存，
+分别报告数据库延迟、连接池饱和度和图片存储可写性
+"""
+import os
+import time
+import uuid
+import threading
+import logging
+from datetime import datetime
+from typing import Callable, Dict, Optional
+from config import Config
+from modules.database import db_manager
+from modules.connection_pool import PoolExhaustedError
+from modules.image_manager import image_manager
+
+logger = logging.getLogger(__name__)
+
+
+class _CachedCheck:
+    """按TTL缓存的单项检查；并发探针只触发一次真实检查"""
+
+    def __init__(self, check: Callable[[], Dict], ttl: float):
+        self._check = check
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._result: Optional[Dict] = None
+        self._expires_at = 0.0
+
+    def get(self) -> Dict:
+        """返回缓存结果，过期时重新检查"""
+        if self._result is not None and time.monotonic() < self._expires_at:
+            return self._result
+        with self._lock:
+            if self._result is None or time.monotonic() >= self._expires_at:
+                self._result = self._check()
+                self._result['checked_at'] = datetime.now()
+                self._expires_at = time.monotonic() + self.ttl
+            return self._result
+
+
+class HealthMonitor:
+    """健康检查服务"""
+
+    def __init__(self, ttl: Optional[float] = None):
+        """
+        初始化健康检查服务
+
+        Args:
+            ttl: 检查结果缓存秒数，默认 Config.HEALTH_CACHE_TTL
+        """
+        self.db = db_manager
+        self.image_manager = image_manager
+        self.started_at = datetime.now()
+        ttl = Config.HEALTH_CACHE_TTL if ttl is None else ttl
+        self._database = _CachedCheck(self._check_database, ttl)
+        self._storage = _CachedCheck(self._check_storage, ttl)
+
+    def _check_database(self) -> Dict:
+        """
+        用连接池中的连接探活并测量往返延迟
+
+        借出连接最多等待 Config.HEALTH_DB_TIMEOUT 秒，连接池饱和时探针很快返回未就绪，
+        而不是等满 DB_POOL_TIMEOUT。
+        """
+        try:
+            latency = self.db.ping(Config.HEALTH_DB_TIMEOUT)
+            return {'ok': True, 'backend': self.db.backend.name, 'latency_ms': round(latency * 1000, 3)}
+        except PoolExhaustedError as e:
+            logger.warning(f"数据库健康检查未能借出连接: {e}")
+            return {'ok': False, 'backend': self.db.backend.name, 'saturated': True, 'error': str(e)}
+        except Exception as e:
+            logger.warning(f"数据库健康检查失败: {e}")
+            return {'ok': False, 'backend': self.db.backend.name, 'error': str(e)}
+
+    def _check_storage(self) -> Dict:
+        """在图片存储目录写入并删除一个临时文件，确认可写"""
+        path = self.image_manager.storage_path
+        probe = os.path.join(path, f".health_{uuid.uuid4().hex}")
+        try:
+            with open(probe, 'wb') as f:
+                f.write(b'ok')
+            os.remove(probe)
+            return {'ok': True, 'path': path}
+        except Exception as e:
+            logger.warning(f"图片存储不可写: {e}")
+            return {'ok': False, 'path': path, 'error': str(e)}
+
+    def check_pool(self) -> Dict:
+        """连接池饱和度（实时计算，无需缓存）"""
+        pools = []
+        saturated = False
+        for stats in self.db.get_pool_stats():
+            usage = stats['in_use'] / stats['size'] if stats['size'] else 0.0
+            pool_saturated = usage >= Config.HEALTH_POOL_SATURATION and stats['waiting'] > 0
+            saturated = saturated or (pool_saturated and stats['name'] == 'primary')
+            pools.append(dict(stats, usage=round(usage, 3), saturated=pool_saturated))
+        return {'ok': not saturated, 'pools': pools}
+
+    def liveness(self) -> Dict:
+        """存活检查：进程能响应即为存活，不访问数据库"""
+        return {
+            'status': 'alive',
+            'started_at': self.started_at,
+            'uptime_seconds': int((datetime.now() - self.started_at).total_seconds())
+        }
+
+    def readiness(self) -> Dict:
+        """就绪检查：数据库可用、连接池未饱和且图片存储可写"""
+        checks = {
+            'database': self._database.get(),
+            'pool': self.check_pool(),
+            'storage': self._storage.get()
+        }
+        ready = all(check['ok'] for check in checks.values())
+        return {'ready': ready, 'checks': checks}
+
+
+# 全局健康检查实例
+health_monitor = HealthMonitor()
@@ -122,6 +122,26 @@ class ImageManager:
         Returns:
             保存后的图片路径，失败返回None
         """
+        metadata = self.save_image_with_metadata(source_path, strawberry_id, resize, create_thumbnail)
+        return metadata['image_path'] if metadata else None
+    
+    def save_image_with_metadata(self, source_path: str, strawberry_id: int,
+                                 resize: bool = True, create_thumbnail: bool = True) -> Optional[Dict]:
+        """
+        保存图片文件，并返回保存时读取到的图片元数据
+        
+        元数据随记录写入数据库（strawberry_records 的同名字段），读取记录时无需再打开图片文件。
+        
+        Args:
+            source_path: 源图片路径
+            strawberry_id: 草莓ID
+            resize: 是否调整图片大小
+            create_thumbnail: 是否创建缩略图
+        
+        Returns:
+            {'image_path', 'image_width', 'image_height', 'image_format', 'image_size_bytes',
+             'image_has_exif', 'image_taken_at', 'thumbnail_path'}，失败返回None
+        """
         try:
             # 验证源文件
             if not self.validate_image_file(source_path):
@@ -131,9 +151,13 @@ class ImageManager:
             original_filename = os.path.basename(source_path)
             new_filename = self.generate_image_filename(strawberry_id, original_filename)
             dest_path = os.path.join(self.storage_path, new_filename)
+            thumbnail_path = None
             
             # 处理图片
             with Image.open(source_path) as img:
+                # 拍摄信息取自原图（保存后的图片不保留EXIF）
+                has_exif, taken_at = self._read_exif(img)
+                
                 # 修正图片方向（基于EXIF数据）
                 img = self._fix_image_orientation(img)
                 
@@ -144,18 +168,86 @@ class ImageManager:
                 
                 # 保存图片
                 img.save(dest_path, quality=85, optimize=True)
+                width, height = img.size
                 
                 # 创建缩略图
                 if create_thumbnail:
-                    self._create_thumbnail(img, new_filename)
+                    thumbnail_path = self._create_thumbnail(img, new_filename)
             
             logger.info(f"图片保存成功: {dest_path}")
-            return dest_path
+            return {
+                'image_path': dest_path,
+                'image_width': width,
+                'image_height': height,
+                'image_format': Image.registered_extensions().get(os.path.splitext(dest_path)[1].lower()),
+                'image_size_bytes': os.path.getsize(dest_path),
+                'image_has_exif': has_exif,
+                'image_taken_at': taken_at,
+                'thumbnail_path': thumbnail_path
+            }
             
         except Exception as e:
             logger.error(f"保存图片失败: {e}")
             return None
     
+    def read_image_metadata(self, image_path: str) -> Optional[Dict]:
+        """
+        读取已保存图片的元数据（用于回填保存元数据之前的记录）
+        
+        Args:
+            image_path: 图片路径
+        
+        Returns:
+            字段同 save_image_with_metadata 的返回值，图片不存在或无法读取时返回None
+        """
+        try:
+            if not os.path.exists(image_path):
+                return None
+            
+            size_bytes = os.path.getsize(image_path)
+            with Image.open(image_path) as img:
+                has_exif, taken_at = self._read_exif(img)
+                return {
+                    'image_path': image_path,
+                    'image_width': img.width,
+                    'image_height': img.height,
+                    'image_format': img.format,
+                    'image_size_bytes': size_bytes,
+                    'image_has_exif': has_exif,
+                    'image_taken_at': taken_at,
+                    'thumbnail_path': self.get_thumbnail_path(image_path)
+                }
+                
+        except Exception as e:
+            logger.error(f"读取图片元数据失败: {e}")
+            return None
+    
+    @staticmethod
+    def _read_exif(img: Image.Image) -> Tuple[bool, Optional[datetime]]:
+        """
+        读取EXIF信息
+        
+        Returns:
+            (是否带EXIF信息, 拍摄时间)，拍摄时间取 DateTimeOriginal，没有时取 DateTime
+        """
+        try:
+            exif = img.getexif()
+            if not exif:
+                return False, None
+            value = exif.get_ifd(0x8769).get(0x9003) or exif.get(0x0132)
+            if isinstance(value, bytes):
+                value = value.decode('ascii', 'ignore')
+            taken_at = None
+            if value:
+                try:
+                    taken_at = datetime.strptime(str(value).strip('\x00 '), '%Y:%m:%d %H:%M:%S')
+                except ValueError:
+                    # 拍摄时间格式不规范，跳过
+                    pass
+            return True, taken_at
+        except Exception:
+            return False, None
+    
     def copy_image(self, source_path: str, strawberry_id: int) -> Optional[str]:
         """
         复制图片文件（不进行处理）
@@ -350,6 +442,24 @@ class ImageManager:
             logger.error(f"获取缩略图路径失败: {e}")
             return None
     
+    def regenerate_thumbnail(self, image_path: str) -> Optional[str]:
+        """
+        根据原图重新生成缩略图
+        
+        Args:
+            image_path: 原图片路径
+        
+        Returns:
+            缩略图路径，原图无法读取或生成失败返回None
+        """
+        try:
+            with Image.open(image_path) as img:
+                img.load()
+                return self._create_thumbnail(img, os.path.basename(image_path))
+        except Exception as e:
+            logger.error(f"重新生成缩略图失败: {e}")
+            return None
+    
     def list_images(self, strawberry_id: int = None) -> List[str]:
         """
         列出图片文件
@@ -0,0 +1,150 @@
+"""
+观察记录上传处理模块
+上传图片后的处理（AI生成描述、缩放图片并生成缩略图、写入记录）可以在请求中同步完成，
+也可以先保存上传文件、返回任务ID，交给有界的后台线程池处理：
+- 后台处理使用独立的 ingest 线程池（Config.INGEST_WORKERS 个线程），不与文件清理、批量创建等任务争用；
+  排队及处理中的上传达到 Config.INGEST_MAX_PENDING 时拒绝新的上传
+- 两种方式的处理过程和结果相同，处理结束（无论成功与否）后删除上传的临时文件
+- 任务状态和结果通过 /api/jobs/<id> 查询
+"""
+import os
+import logging
+from typing import Dict, Optional, Tuple
+from config import Config
+from modules.trace_service import trace_service
+from modules.ai_service import ai_service
+from modules.jobs import job_registry, Job, JobQueueFull
+
+logger = logging.getLogger(__name__)
+
+INGEST_MODES = ('sync', 'async')
+INGEST_POOL = 'ingest'
+# 上传表单中的记录字段及默认值
+RECORD_FORM_FIELDS = {
+    'growth_stage': '观察期',
+    'health_status': 'healthy',
+    'size_estimate': '',
+    'color_description': '',
+    'environment_conditions': '',
+    'location': '',
+    'ai_description': '',
+    'notes': ''
+}
+
+
+class IngestionPipeline:
+    """观察记录上传处理服务"""
+
+    def __init__(self, workers: Optional[int] = None, max_pending: Optional[int] = None):
+        """
+        初始化上传处理服务
+
+        Args:
+            workers: 后台处理线程数，默认 Config.INGEST_WORKERS
+            max_pending: 排队及处理中的上传数上限，默认 Config.INGEST_MAX_PENDING
+        """
+        self.service = trace_service
+        self.ai_service = ai_service
+        job_registry.configure_pool(
+            INGEST_POOL, workers or Config.INGEST_WORKERS,
+            Config.INGEST_MAX_PENDING if max_pending is None else max_pending
+        )
+
+    def _describe(self, upload_path: str, fields: Dict) -> Tuple[str, bool]:
+        """
+        生成记录描述：优先使用AI，失败时使用手动输入的描述或备注，并附加环境和位置信息
+
+        Returns:
+            (描述, 是否由AI生成)
+        """
+        description = fields.get('ai_description') or fields.get('notes') or '无描述'
+        generated = None
+        if self.ai_service.is_enabled():
+            logger.info(f"尝试使用AI生成描述: {upload_path}")
+            generated = self.ai_service.generate_description(upload_path)
+            if generated:
+                logger.info("AI描述生成成功")
+                description = generated
+            else:
+                logger.warning("AI描述生成失败，使用备用描述")
+        else:
+            logger.info("AI服务未启用，使用手动输入的描述")
+
+        additional_info = []
+        if fields.get('environment_conditions'):
+            additional_info.append(f"环境条件: {fields['environment_conditions']}")
+        if fields.get('location'):
+            additional_info.append(f"位置: {fields['location']}")
+        if additional_info:
+            additional_text = "; ".join(additional_info)
+            description = description + "\n" + additional_text if description else additional_text
+        return description, bool(generated)
+
+    def process(self, strawberry_id: int, upload_path: str, fields: Dict,
+                job: Optional[Job] = None) -> Optional[Dict]:
+        """
+        处理一次上传：生成描述、保存图片并写入记录，结束后删除上传文件
+
+        Args:
+            strawberry_id: 草莓ID
+            upload_path: 上传的临时文件路径
+            fields: 表单中的记录字段（见 RECORD_FORM_FIELDS）
+            job: 后台任务，提供时在生成描述和写入记录后各报告一次进度
+
+        Returns:
+            记录信息（附带 ai_enabled、ai_generated、ai_description_used），失败返回None
+        """
+        try:
+            description, generated = self._describe(upload_path, fields)
+            if job:
+                job.advance()
+
+            record = self.service.add_observation_record(
+                strawberry_id, upload_path, description, fields.get('growth_stage'),
+                fields.get('health_status') or 'healthy', fields.get('size_estimate'),
+                fields.get('color_description')
+            )
+            if not record:
+                return None
+            if job:
+                job.advance()
+
+            response_data = record.copy()
+            response_data['ai_enabled'] = self.ai_service.is_enabled()
+            response_data['ai_generated'] = generated
+            response_data['ai_description_used'] = description
+            return response_data
+        finally:
+            try:
+                os.remove(upload_path)
+            except OSError:
+                pass
+
+    def submit(self, strawberry_id: int, upload_path: str, fields: Dict) -> Job:
+        """
+        提交后台处理（上传文件须已保存），进度分为生成描述和写入记录两步
+
+        Raises:
+            JobQueueFull: 排队及处理中的上传已达上限（此时删除上传文件）
+        """
+        try:
+            return job_registry.submit(
+                'ingest_record', self._run, strawberry_id, upload_path, fields,
+                total=2, description=f"草莓 {strawberry_id} 的观察记录", pool=INGEST_POOL
+            )
+        except JobQueueFull:
+            try:
+                os.remove(upload_path)
+            except OSError:
+                pass
+            raise
+
+    def _run(self, job: Job, strawberry_id: int, upload_path: str, fields: Dict) -> Dict:
+        result = self.process(strawberry_id, upload_path, fields, job)
+        if result is None:
+            raise RuntimeError("添加观察记录失败")
+        return result
+
+
+# 全局上传处理服务实例
+ingestion_pipeline = IngestionPipeline()
@@ -0,0 +1,340 @@
+"""
+系统完整性检查模块
+比对数据库引用的文件（记录原图、缩略图、草莓二维码）与图片、缩略图、二维码存储目录：
+- 路径统一规范化为真实绝对路径后放入集合，孤立文件和缺失文件都由集合运算得出
+- 存储目录用 os.scandir 列出，需要 stat 的文件和位于存储目录之外的引用在线程池中并行检查
+- 每次检查后保存检查点（各目录的修改时间和文件清单），再次检查时未变化的目录直接复用清单，
+  变化的目录只 stat 新出现的文件；指定 full 时忽略检查点重新检查全部文件
+- 可选修复：删除孤立文件、为原图存在的记录重新生成缺失的缩略图
+"""
+import os
+import json
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+from config import Config
+from modules.strawberry_dao import strawberry_dao
+from modules.image_manager import image_manager
+from modules.qr_code import qr_manager
+
+logger = logging.getLogger(__name__)
+
+KIND_LABELS = {'image': '图片', 'thumbnail': '缩略图', 'qr_code': '二维码图片'}
+_PLURALS = {'image': 'images', 'thumbnail': 'thumbnails', 'qr_code': 'qr_codes'}
+CHECKPOINT_VERSION = 1
+# 报告中每类问题最多列出的文件数
+REPORT_SAMPLE_SIZE = 100
+# 修改时间晚于检查开始前该秒数的孤立文件不删除（可能是尚未写入数据库的新上传）
+ORPHAN_GRACE_SECONDS = 600
+# 修改时间距检查开始不足该纳秒数的目录不记入检查点（同一时间粒度内可能还有写入）
+_RACY_WINDOW_NS = 2_000_000_000
+
+
+class _PathNormalizer:
+    """把数据库中的相对或绝对路径统一为真实绝对路径，每个目录只解析一次"""
+
+    def __init__(self):
+        self._directories: Dict[str, str] = {}
+
+    def __call__(self, path: str) -> str:
+        directory, name = os.path.split(os.path.abspath(path))
+        real_directory = self._directories.get(directory)
+        if real_directory is None:
+            real_directory = self._directories[directory] = os.path.normcase(os.path.realpath(directory))
+        return os.path.join(real_directory, os.path.normcase(name))
+
+
+def _stat_entry(entry: os.DirEntry) -> Optional[List[int]]:
+    """[大小, 修改时间纳秒]，文件在列出后被删除时返回None"""
+    try:
+        stat = entry.stat()
+        return [stat.st_size, stat.st_mtime_ns]
+    except OSError:
+        return None
+
+
+class IntegrityScanner:
+    """系统完整性检查服务"""
+
+    def __init__(self, workers: Optional[int] = None, checkpoint_path: Optional[str] = None):
+        """
+        初始化系统完整性检查服务
+
+        Args:
+            workers: 并行检查文件的线程数，默认 Config.INTEGRITY_SCAN_WORKERS
+            checkpoint_path: 检查点文件路径，默认 Config.INTEGRITY_CHECKPOINT_PATH
+        """
+        self.dao = strawberry_dao
+        self.image_manager = image_manager
+        self.qr_manager = qr_manager
+        self.workers = max(1, workers or Config.INTEGRITY_SCAN_WORKERS)
+        self.checkpoint_path = checkpoint_path or Config.INTEGRITY_CHECKPOINT_PATH
+        self._lock = threading.Lock()
+
+    def _directories(self) -> Dict[str, str]:
+        """各类文件的存储目录（规范化的真实路径）"""
+        directories = {
+            'image': self.image_manager.storage_path,
+            'thumbnail': os.path.join(self.image_manager.storage_path, 'thumbnails'),
+            'qr_code': self.qr_manager.storage_path
+        }
+        return {kind: os.path.normcase(os.path.realpath(path)) for kind, path in directories.items()}
+
+    def _extensions(self, kind: str) -> Set[str]:
+        return {'.png'} if kind == 'qr_code' else set(self.image_manager.allowed_extensions)
+
+    def load_checkpoint(self) -> Dict:
+        """读取检查点，不存在或无法解析时返回空字典（即全量检查）"""
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+            if checkpoint.get('version') != CHECKPOINT_VERSION:
+                return {}
+            return checkpoint
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"读取完整性检查点失败，将全量检查: {e}")
+            return {}
+
+    def _save_checkpoint(self, checkpoint: Dict):
+        """先写临时文件再替换，避免中断时留下不完整的检查点"""
+        try:
+            directory = os.path.dirname(self.checkpoint_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temp_path = f"{self.checkpoint_path}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(checkpoint, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(temp_path, self.checkpoint_path)
+        except Exception as e:
+            logger.error(f"保存完整性检查点失败: {e}")
+
+    def _list_directory(self, kind: str, directory: str, previous: Optional[Dict],
+                        started_ns: int) -> Tuple[Dict, List[os.DirEntry], bool]:
+        """
+        列出存储目录
+
+        Returns:
+            (检查点条目, 需要 stat 的目录项, 是否重新列出了目录)；
+            目录修改时间与检查点一致时直接复用上次的文件清单
+        """
+        try:
+            mtime_ns = os.stat(directory).st_mtime_ns
+        except FileNotFoundError:
+            return {'mtime_ns': None, 'files': {}}, [], True
+
+        # 目录修改时间在检查开始前不久时，同一时间粒度内的后续写入不会改变它，下次仍需重新列出
+        recorded_mtime = mtime_ns if mtime_ns < started_ns - _RACY_WINDOW_NS else None
+        known = previous.get('files', {}) if previous else {}
+        if previous and previous.get('mtime_ns') is not None and previous['mtime_ns'] == mtime_ns:
+            return {'mtime_ns': recorded_mtime, 'files': known}, [], False
+
+        extensions = self._extensions(kind)
+        files: Dict[str, List[int]] = {}
+        pending: List[os.DirEntry] = []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name.startswith('.') or os.path.splitext(entry.name)[1].lower() not in extensions:
+                    continue
+                if not entry.is_file():
+                    continue
+                if entry.name in known:
+                    files[entry.name] = known[entry.name]
+                else:
+                    pending.append(entry)
+        return {'mtime_ns': recorded_mtime, 'files': files}, pending, True
+
+    def scan(self, full: bool = False, delete_orphans: bool = False,
+             regenerate_thumbnails: bool = False) -> Optional[Dict]:
+        """
+        执行完整性检查
+
+        Args:
+            full: 是否忽略检查点，重新 stat 全部文件
+            delete_orphans: 是否删除孤立文件（修改时间在 ORPHAN_GRACE_SECONDS 内的除外）
+            regenerate_thumbnails: 是否为原图存在的记录重新生成缺失的缩略图
+
+        Returns:
+            {'valid', 'issues', 'statistics', 'orphans', 'missing', 'empty_files', 'scan', 'repaired'}，
+            已有检查在执行时返回None
+        """
+        if not self._lock.acquire(blocking=False):
+            logger.warning("完整性检查正在执行，跳过本次检查")
+            return None
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='integrity-scan') as pool:
+                return self._scan(pool, full, delete_orphans, regenerate_thumbnails)
+        finally:
+            self._lock.release()
+
+    def _scan(self, pool: ThreadPoolExecutor, full: bool, delete_orphans: bool,
+              regenerate_thumbnails: bool) -> Dict:
+        started = time.time()
+        started_ns = time.time_ns()
+        checkpoint = {} if full else self.load_checkpoint()
+        previous_directories = checkpoint.get('directories', {})
+        directories = self._directories()
+
+        # 1. 列出存储目录，新出现（或全量检查时全部）的文件在线程池中 stat
+        listings: Dict[str, Dict] = {}
+        pending: List[Tuple[str, os.DirEntry]] = []
+        rescanned = 0
+        for kind, directory in directories.items():
+            entry, entries, relisted = self._list_directory(kind, directory, previous_directories.get(directory),
+                                                            started_ns)
+            listings[kind] = entry
+            pending.extend((kind, item) for item in entries)
+            rescanned += relisted
+        for (kind, item), stat in zip(pending, pool.map(lambda job: _stat_entry(job[1]), pending)):
+            if stat is not None:
+                listings[kind]['files'][item.name] = stat
+
+        disk: Dict[str, Tuple[str, int, int]] = {}
+        for kind, directory in directories.items():
+            for name, (size, mtime_ns) in listings[kind]['files'].items():
+                disk[os.path.join(directory, os.path.normcase(name))] = (kind, size, mtime_ns)
+
+        self._save_checkpoint({
+            'version': CHECKPOINT_VERSION,
+            'scanned_at': datetime.now().isoformat(timespec='seconds'),
+            'directories': {directories[kind]: listings[kind] for kind in directories}
+        })
+
+        # 2. 读取数据库引用的文件；存储目录内的引用直接查集合，目录外的稍后并行 stat
+        normalize = _PathNormalizer()
+        scanned_directories = set(directories.values())
+        referenced: Set[str] = set()
+        missing: Dict[str, List[Dict]] = {kind: [] for kind in KIND_LABELS}
+        outside: List[Tuple[str, str, Dict]] = []
+        counts = {'records': 0, 'strawberries': 0}
+
+        def check(kind: str, key: str, reference: Dict):
+            referenced.add(key)
+            if os.path.dirname(key) not in scanned_directories:
+                outside.append((kind, key, reference))
+            elif key not in disk:
+                missing[kind].append(reference)
+
+        for record_id, strawberry_id, image_path, thumbnail_path in self.dao.iter_record_files():
+            counts['records'] += 1
+            reference = {'record_id': record_id, 'strawberry_id': strawberry_id, 'image_path': image_path}
+            image_key = normalize(image_path) if image_path else None
+            if image_key:
+                check('image', image_key, dict(reference, path=image_path))
+            # 回填缩略图路径之前的记录按原图文件名推定缩略图
+            if thumbnail_path:
+                check('thumbnail', normalize(thumbnail_path), dict(reference, path=thumbnail_path))
+            elif image_key:
+                expected = os.path.join(directories['thumbnail'], os.path.basename(image_key))
+                check('thumbnail', expected, dict(reference, path=None))
+
+        for strawberry_id, qr_code_path in self.dao.iter_qr_code_paths():
+            counts['strawberries'] += 1
+            check('qr_code', normalize(qr_code_path), {'strawberry_id': strawberry_id, 'path': qr_code_path})
+
+        for (kind, key, reference), exists in zip(outside, pool.map(os.path.isfile, [item[1] for item in outside])):
+            if not exists:
+                missing[kind].append(reference)
+
+        # 3. 孤立文件与空文件
+        orphans: List[Dict] = []
+        empty_files: List[Dict] = []
+        total_bytes = 0
+        for key, (kind, size, mtime_ns) in disk.items():
+            total_bytes += size
+            if key not in referenced:
+                orphans.append({'kind': kind, 'path': key, 'size_bytes': size, 'mtime_ns': mtime_ns})
+            elif size == 0:
+                empty_files.append({'kind': kind, 'path': key})
+
+        statistics = dict(counts, files=len(disk), total_bytes=total_bytes, empty_files=len(empty_files))
+        issues: List[str] = []
+        for kind, label in KIND_LABELS.items():
+            kind_orphans = sum(1 for orphan in orphans if orphan['kind'] == kind)
+            statistics[f"orphaned_{_PLURALS[kind]}"] = kind_orphans
+            statistics[f"missing_{_PLURALS[kind]}"] = len(missing[kind])
+            if kind_orphans:
+                issues.append(f"发现 {kind_orphans} 个孤立{label}文件")
+            if missing[kind]:
+                issues.append(f"发现 {len(missing[kind])} 个缺失的{label}文件")
+        if empty_files:
+            issues.append(f"发现 {len(empty_files)} 个空文件")
+
+        report = {
+            # 缩略图可以重新生成，只有原图或二维码缺失时判定为不完整
+            'valid': not missing['image'] and not missing['qr_code'],
+            'issues': issues,
+            'statistics': statistics,
+            'orphans': [{key: value for key, value in orphan.items() if key != 'mtime_ns'}
+                        for orphan in orphans[:REPORT_SAMPLE_SIZE]],
+            'missing': {kind: references[:REPORT_SAMPLE_SIZE] for kind, references in missing.items()},
+            'empty_files': empty_files[:REPORT_SAMPLE_SIZE],
+            'scan': {
+                'mode': 'full' if full or not checkpoint else 'incremental',
+                'directories_rescanned': rescanned,
+                'files_statted': len(pending) + len(outside),
+                'elapsed_seconds': 0
+            },
+            'repaired': {}
+        }
+
+        # 4. 可选修复
+        if delete_orphans:
+            report['repaired'].update(self._delete_orphans(orphans, started))
+        if regenerate_thumbnails:
+            missing_images = {reference['record_id'] for reference in missing['image']}
+            candidates = [reference for reference in missing['thumbnail']
+                          if reference['image_path'] and reference['record_id'] not in missing_images]
+            report['repaired'].update(self._regenerate_thumbnails(pool, candidates))
+
+        report['scan']['elapsed_seconds'] = round(time.time() - started, 3)
+        logger.info(f"完整性检查完成（{report['scan']['mode']}），{len(disk)} 个文件，"
+                    f"重新列出 {rescanned} 个目录，stat {report['scan']['files_statted']} 次，"
+                    f"发现 {len(issues)} 类问题")
+        return report
+
+    @staticmethod
+    def _delete_orphans(orphans: List[Dict], started: float) -> Dict:
+        """删除孤立文件，跳过检查开始前 ORPHAN_GRACE_SECONDS 内修改过的文件"""
+        result = {'orphans_deleted': 0, 'orphans_skipped': 0, 'orphan_errors': 0}
+        threshold_ns = int((started - ORPHAN_GRACE_SECONDS) * 1e9)
+        for orphan in orphans:
+            if orphan['mtime_ns'] > threshold_ns:
+                result['orphans_skipped'] += 1
+                continue
+            try:
+                os.remove(orphan['path'])
+                result['orphans_deleted'] += 1
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.error(f"删除孤立文件失败: {orphan['path']}: {e}")
+                result['orphan_errors'] += 1
+        logger.info(f"已删除 {result['orphans_deleted']} 个孤立文件")
+        return result
+
+    def _regenerate_thumbnails(self, pool: ThreadPoolExecutor, references: List[Dict]) -> Dict:
+        """并行重新生成缩略图，并把新路径写回记录"""
+        result = {'thumbnails_regenerated': 0, 'thumbnail_errors': 0}
+        updates = []
+        paths = pool.map(lambda reference: self.image_manager.regenerate_thumbnail(reference['image_path']),
+                         references)
+        for reference, thumbnail_path in zip(references, paths):
+            if not thumbnail_path:
+                result['thumbnail_errors'] += 1
+                continue
+            result['thumbnails_regenerated'] += 1
+            if thumbnail_path != reference['path']:
+                updates.append({'id': reference['record_id'], 'strawberry_id': reference['strawberry_id'],
+                                'thumbnail_path': thumbnail_path})
+        self.dao.update_thumbnail_paths(updates)
+        logger.info(f"已重新生成 {result['thumbnails_regenerated']} 个缩略图")
+        return result
+
+
+# 全局完整性检查服务实例
+integrity_scanner = IntegrityScanner()
@@ -0,0 +1,190 @@
+"""
+后台任务模块
+在进程内的工作线程中执行耗时操作（如批量删除草莓后的文件清理），并记录进度供 /api/jobs/<id> 查询：
+- 任务状态依次为 pending、running，结束时为 completed 或 failed
+- 任务函数的第一个参数是 Job 本身，通过 advance() 报告进度
+- 任务按线程池执行：默认线程池有 Config.JOB_WORKERS 个线程，也可以为某类任务配置独立的线程池
+  并限制未结束的任务数（如上传处理），互不占用线程
+- 任务记录只保存在内存中，保留最近 Config.JOB_HISTORY_SIZE 个已结束的任务，服务重启后丢失
+"""
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Optional
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL = 'default'
+
+
+class JobQueueFull(Exception):
+    """线程池中未结束的任务数已达上限"""
+
+
+class Job:
+    """后台任务及其进度"""
+
+    def __init__(self, kind: str, total: int = 0, description: str = '', pool: str = DEFAULT_POOL):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.pool = pool
+        self.description = description
+        self.status = 'pending'
+        self.total = total
+        self.processed = 0
+        self.errors = 0
+        self.result = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ('completed', 'failed')
+
+    def advance(self, processed: int = 1, errors: int = 0):
+        """报告进度：processed 为新处理的数量，errors 为其中失败的数量"""
+        with self._lock:
+            self.processed += processed
+            self.errors += errors
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待任务结束，超时返回False"""
+        return self._done.wait(timeout)
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            processed, errors = self.processed, self.errors
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'description': self.description,
+            'status': self.status,
+            'total': self.total,
+            'processed': processed,
+            'errors': errors,
+            'progress': round(processed / self.total, 4) if self.total else (1.0 if self.finished else 0.0),
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+
+
+class JobRegistry:
+    """后台任务登记与执行"""
+
+    def __init__(self, workers: Optional[int] = None, history_size: Optional[int] = None):
+        """
+        初始化后台任务登记
+
+        Args:
+            workers: 工作线程数，默认 Config.JOB_WORKERS
+            history_size: 保留的已结束任务数，默认 Config.JOB_HISTORY_SIZE
+        """
+        self.workers = max(1, workers or Config.JOB_WORKERS)
+        self.history_size = history_size or Config.JOB_HISTORY_SIZE
+        self._jobs: 'OrderedDict[str, Job]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._pools: Dict[str, Dict] = {DEFAULT_POOL: {'workers': self.workers, 'max_pending': None}}
+        self._executors: Dict[str, ThreadPoolExecutor] = {}
+
+    def configure_pool(self, name: str, workers: int, max_pending: Optional[int] = None):
+        """
+        配置独立的线程池（在首次向该线程池提交任务前调用）
+
+        Args:
+            name: 线程池名称
+            workers: 工作线程数
+            max_pending: 未结束（排队及执行中）的任务数上限，None 表示不限制
+        """
+        with self._lock:
+            self._pools[name] = {'workers': max(1, workers), 'max_pending': max_pending}
+
+    def pending_count(self, pool: str = DEFAULT_POOL) -> int:
+        """线程池中未结束的任务数"""
+        with self._lock:
+            return self._pending_count(pool)
+
+    def _pending_count(self, pool: str) -> int:
+        return sum(1 for job in self._jobs.values() if job.pool == pool and not job.finished)
+
+    def submit(self, kind: str, func: Callable, *args, total: int = 0, description: str = '',
+               pool: str = DEFAULT_POOL, **kwargs) -> Job:
+        """
+        提交后台任务
+
+        Args:
+            kind: 任务类型
+            func: 任务函数，调用方式为 func(job, *args, **kwargs)，返回值记为任务结果
+            total: 需要处理的总数（用于计算进度）
+            description: 任务说明
+            pool: 执行任务的线程池名称
+
+        Returns:
+            已登记的任务
+
+        Raises:
+            JobQueueFull: 线程池中未结束的任务数已达上限
+        """
+        job = Job(kind, total, description, pool)
+        with self._lock:
+            settings = self._pools[pool]
+            if settings['max_pending'] and self._pending_count(pool) >= settings['max_pending']:
+                raise JobQueueFull(f"{pool} 任务队列已满（{settings['max_pending']} 个未完成的任务），请稍后重试")
+            self._jobs[job.id] = job
+            self._evict()
+            executor = self._executors.get(pool)
+            if executor is None:
+                executor = self._executors[pool] = ThreadPoolExecutor(
+                    max_workers=settings['workers'], thread_name_prefix=f"{pool}-job"
+                )
+        executor.submit(self._run, job, func, args, kwargs)
+        logger.info(f"后台任务已提交: {kind} {job.id}")
+        return job
+
+    def _evict(self):
+        """只保留最近 history_size 个已结束的任务（未结束的任务不淘汰）"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.history_size)]:
+            del self._jobs[job_id]
+
+    @staticmethod
+    def _run(job: Job, func: Callable, args, kwargs):
+        job.status = 'running'
+        job.started_at = datetime.now()
+        try:
+            job.result = func(job, *args, **kwargs)
+            job.status = 'completed'
+            logger.info(f"后台任务完成: {job.kind} {job.id}，处理 {job.processed} 项，失败 {job.errors} 项")
+        except Exception as e:
+            job.error = str(e)
+            job.status = 'failed'
+            logger.error(f"后台任务执行失败（{job.kind} {job.id}）: {e}")
+        finally:
+            job.finished_at = datetime.now()
+            job._done.set()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """按ID获取任务，不存在（或已被淘汰）时返回None"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def shutdown(self, wait: bool = True):
+        """停止所有线程池（wait 为True时等待已提交的任务执行完）"""
+        with self._lock:
+            executors, self._executors = list(self._executors.values()), {}
+        for executor in executors:
+            executor.shutdown(wait=wait)
+
+
+# 全局后台任务登记实例
+job_registry = JobRegistry()
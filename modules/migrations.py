@@ -0,0 +1,334 @@
+"""
+表结构迁移模块
+按版本号顺序执行表结构变更，已执行的版本记录在 schema_version 表中：
+- 每个迁移的步骤先检查索引/字段是否已存在，中途失败后可直接重新执行；
+  回填、重建计数器等数据步骤按当前数据重新计算，同样可以重复执行
+- MySQL 上的 ALTER 默认以 ALGORITHM=INPLACE, LOCK=NONE 在线执行，不阻塞读写；
+  SQLite 的 DDL 支持事务，整个迁移在同一事务中完成
+- 建表脚本（database_schema.sql / database_schema_sqlite.sql）始终对应最新版本，
+  新增迁移时需同步修改建表脚本及其中写入的版本号
+"""
+import time
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence
+from config import Config
+from modules.database import db_manager
+from modules.strawberry_dao import strawberry_dao, latest_view_statements, LATEST_COLUMN_DDL, COUNTERS_DDL
+
+logger = logging.getLogger(__name__)
+
+VERSION_TABLE = "schema_version"
+_VERSION_DDL = {
+    'mysql': f"""
+        CREATE TABLE IF NOT EXISTS {VERSION_TABLE} (
+            version INT PRIMARY KEY COMMENT '迁移版本号',
+            description VARCHAR(255) NOT NULL COMMENT '迁移说明',
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '执行时间',
+            execution_ms INT COMMENT '执行耗时（毫秒）'
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='表结构版本表'
+    """,
+    'sqlite': f"""
+        CREATE TABLE IF NOT EXISTS {VERSION_TABLE} (
+            version INTEGER PRIMARY KEY,
+            description VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+            execution_ms INTEGER
+        )
+    """
+}
+_LOCK_NAME = "strawberry_trace_schema_migration"
+
+
+class MigrationError(Exception):
+    """迁移执行失败或无法获取迁移锁"""
+
+
+class Migration:
+    """单个版本的表结构变更"""
+
+    def __init__(self, version: int, description: str, upgrade: Callable[['MigrationRunner'], None]):
+        self.version = version
+        self.description = description
+        self.upgrade = upgrade
+
+
+class MigrationRunner:
+    """表结构迁移执行器"""
+
+    def __init__(self, migrations: Sequence[Migration], online_ddl: Optional[bool] = None):
+        """
+        初始化迁移执行器
+
+        Args:
+            migrations: 全部迁移，版本号不能重复
+            online_ddl: MySQL 上是否在线执行 ALTER，默认 Config.DB_ONLINE_DDL
+        """
+        versions = [migration.version for migration in migrations]
+        if len(set(versions)) != len(versions):
+            raise ValueError("迁移版本号重复")
+        self.db = db_manager
+        self.migrations = sorted(migrations, key=lambda migration: migration.version)
+        self.online_ddl = Config.DB_ONLINE_DDL if online_ddl is None else online_ddl
+        self._lock = threading.Lock()
+        self._planned: Optional[List[str]] = None
+        self._dry_run = False
+
+    @property
+    def dialect(self) -> str:
+        return self.db.backend.name
+
+    # ---- 版本记录 ----
+
+    def ensure_version_table(self):
+        """创建版本表"""
+        self.db.execute_update(_VERSION_DDL[self.dialect])
+
+    def applied_versions(self) -> Dict[int, Dict]:
+        """已执行的迁移 {版本号: 版本记录}"""
+        self.ensure_version_table()
+        rows = self.db.execute_query(
+            f"SELECT version, description, applied_at, execution_ms FROM {VERSION_TABLE} ORDER BY version"
+        )
+        return {row['version']: row for row in rows}  # type: ignore
+
+    def current_version(self) -> int:
+        """当前表结构版本，未执行过迁移时为0"""
+        applied = self.applied_versions()
+        return max(applied) if applied else 0
+
+    def pending(self, target: Optional[int] = None) -> List[Migration]:
+        """尚未执行的迁移（不超过目标版本）"""
+        applied = self.applied_versions()
+        return [migration for migration in self.migrations
+                if migration.version not in applied and (target is None or migration.version <= target)]
+
+    # ---- 执行 ----
+
+    @contextmanager
+    def _migration_lock(self):
+        """同一时间只允许一个进程执行迁移（MySQL 使用 GET_LOCK，SQLite 由写事务串行化）"""
+        with self._lock:
+            if self.dialect != 'mysql':
+                yield
+                return
+            # 锁与连接绑定，迁移期间一直占用这条连接
+            with self.db.get_cursor(dictionary=False) as cursor:
+                cursor.execute("SELECT GET_LOCK(%s, %s)", (_LOCK_NAME, Config.MIGRATION_LOCK_TIMEOUT))
+                acquired = cursor.fetchone()
+                if not acquired or acquired[0] != 1:
+                    raise MigrationError(f"{Config.MIGRATION_LOCK_TIMEOUT} 秒内未能获取迁移锁，可能有其他迁移正在执行")
+                try:
+                    yield
+                finally:
+                    cursor.execute("SELECT RELEASE_LOCK(%s)", (_LOCK_NAME,))
+                    cursor.fetchone()
+
+    def migrate(self, target: Optional[int] = None, dry_run: bool = False) -> List[Dict]:
+        """
+        按版本顺序执行尚未执行的迁移
+
+        Args:
+            target: 只执行到该版本，默认执行全部
+            dry_run: 为True时只列出将要执行的语句，不修改数据库
+
+        Returns:
+            每个迁移的执行结果 [{'version', 'description', 'statements', 'elapsed_ms'}]
+
+        Raises:
+            MigrationError: 迁移执行失败（之前已完成的迁移保留）
+        """
+        self.ensure_version_table()
+        results = []
+        with self._migration_lock():
+            for migration in self.pending(target):
+                results.append(self._apply(migration, dry_run))
+        return results
+
+    def _apply(self, migration: Migration, dry_run: bool) -> Dict:
+        """执行单个迁移并记录版本"""
+        label = f"迁移 {migration.version:03d} {migration.description}"
+        self._planned = []
+        self._dry_run = dry_run
+        started = time.perf_counter()
+        try:
+            if dry_run:
+                migration.upgrade(self)
+            elif self.dialect == 'sqlite':
+                with self.db.transaction():
+                    migration.upgrade(self)
+                    self._record(migration, started)
+            else:
+                # MySQL 的 DDL 会隐式提交，各步骤可重复执行，全部完成后再记录版本
+                migration.upgrade(self)
+                self._record(migration, started)
+        except Exception as e:
+            logger.error(f"{label}失败: {e}")
+            raise MigrationError(f"{label}失败: {e}") from e
+        finally:
+            statements, self._planned = self._planned, None
+            self._dry_run = False
+
+        elapsed_ms = int((time.perf_counter() - started) * 1000)
+        if not dry_run:
+            logger.info(f"{label}完成，执行 {len(statements)} 条语句，耗时 {elapsed_ms} 毫秒")
+        return {
+            'version': migration.version,
+            'description': migration.description,
+            'statements': statements,
+            'elapsed_ms': elapsed_ms
+        }
+
+    def _record(self, migration: Migration, started: float):
+        self.db.execute_update(
+            f"INSERT INTO {VERSION_TABLE} (version, description, execution_ms) VALUES (%s, %s, %s)",
+            (migration.version, migration.description, int((time.perf_counter() - started) * 1000))
+        )
+
+    def execute(self, statement: str):
+        """执行一条 DDL（试运行时只记录）"""
+        self._planned.append(statement)  # type: ignore
+        if not self._dry_run:
+            self.db.execute_update(statement)
+
+    def run_step(self, description: str, step: Callable[[], object]):
+        """执行一个数据步骤（如回填数据，试运行时只记录说明）"""
+        self._planned.append(f"-- {description}")  # type: ignore
+        if not self._dry_run:
+            step()
+
+    # ---- 迁移步骤使用的 DDL 工具 ----
+
+    def index_exists(self, table: str, index: str) -> bool:
+        """索引是否存在（SQLite 的索引名在库内唯一，不区分表）"""
+        if self.dialect == 'mysql':
+            row = self.db.execute_query("""
+                SELECT 1 FROM information_schema.statistics
+                WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+                LIMIT 1
+            """, (table, index), fetch_one=True)
+        else:
+            row = self.db.execute_query(
+                "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = %s", (index,), fetch_one=True
+            )
+        return bool(row)
+
+    def column_exists(self, table: str, column: str) -> bool:
+        """字段是否存在"""
+        with self.db.get_cursor() as cursor:
+            cursor.execute(f"SELECT * FROM {table} WHERE 1 = 0")
+            cursor.fetchall()
+            return column in {description[0] for description in cursor.description}
+
+    def alter_table(self, table: str, clause: str):
+        """执行 MySQL 的 ALTER TABLE，开启在线DDL时附加 ALGORITHM=INPLACE, LOCK=NONE"""
+        online = ", ALGORITHM=INPLACE, LOCK=NONE" if self.online_ddl else ""
+        self.execute(f"ALTER TABLE {table} {clause}{online}")
+
+    def add_index(self, table: str, index: str, columns: Sequence[str]):
+        """添加索引（已存在时跳过）"""
+        if self.index_exists(table, index):
+            return
+        if self.dialect == 'mysql':
+            self.alter_table(table, f"ADD INDEX {index} ({', '.join(columns)})")
+        else:
+            self.execute(f"CREATE INDEX {index} ON {table} ({', '.join(columns)})")
+
+    def drop_index(self, table: str, index: str):
+        """删除索引（不存在时跳过）"""
+        if not self.index_exists(table, index):
+            return
+        if self.dialect == 'mysql':
+            self.alter_table(table, f"DROP INDEX {index}")
+        else:
+            self.execute(f"DROP INDEX {index}")
+
+    def add_column(self, table: str, column: str, definitions: Dict[str, str]):
+        """添加字段（已存在时跳过），definitions 为各数据库的字段定义"""
+        if self.column_exists(table, column):
+            return
+        if self.dialect == 'mysql':
+            self.alter_table(table, f"ADD COLUMN {column} {definitions['mysql']}")
+        else:
+            self.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definitions['sqlite']}")
+
+
+# ---- 迁移列表 ----
+
+def _001_index_pack(runner: MigrationRunner):
+    """
+    按查询方式调整索引：
+    - 记录表增加 (strawberry_id, recorded_at)，按草莓取最新N条记录时直接按索引顺序读取；
+      原 idx_strawberry_id 是它的前缀，删除
+    - 草莓表增加 (status, created_at, id)，按状态筛选的分页列表无需回表排序；
+      原 idx_status 是它的前缀，删除
+    - qr_code 上的 UNIQUE 约束本身就是索引，删除重复的 idx_qr_code
+    """
+    runner.add_index('strawberry_records', 'idx_strawberry_recorded', ('strawberry_id', 'recorded_at'))
+    runner.add_index('strawberries', 'idx_status_created', ('status', 'created_at', 'id'))
+    runner.drop_index('strawberry_records', 'idx_strawberry_id')
+    runner.drop_index('strawberries', 'idx_status')
+    runner.drop_index('strawberries', 'idx_qr_code')
+
+
+# 记录表的图片元数据字段，由 ImageManager.save_image_with_metadata 在保存图片时读取
+_IMAGE_METADATA_DDL = {
+    'image_width': {'mysql': "INT COMMENT '图片宽度（像素）'", 'sqlite': "INTEGER"},
+    'image_height': {'mysql': "INT COMMENT '图片高度（像素）'", 'sqlite': "INTEGER"},
+    'image_format': {'mysql': "VARCHAR(16) COMMENT '图片格式'", 'sqlite': "VARCHAR(16)"},
+    'image_size_bytes': {'mysql': "BIGINT COMMENT '图片文件大小（字节）'", 'sqlite': "INTEGER"},
+    'image_has_exif': {'mysql': "BOOLEAN COMMENT '原图是否带EXIF信息'", 'sqlite': "BOOLEAN"},
+    'image_taken_at': {'mysql': "DATETIME NULL COMMENT '拍摄时间（EXIF）'", 'sqlite': "TIMESTAMP"},
+    'thumbnail_path': {'mysql': "VARCHAR(500) COMMENT '缩略图路径'", 'sqlite': "VARCHAR(500)"},
+}
+
+
+def _002_image_metadata(runner: MigrationRunner):
+    """
+    记录表增加图片元数据字段（尺寸、格式、大小、EXIF、缩略图路径），读取记录时不再打开图片文件；
+    strawberry_latest_view 增加最新记录的缩略图路径。已有记录通过 python main.py backfill_images 回填
+    """
+    for column, definitions in _IMAGE_METADATA_DDL.items():
+        runner.add_column('strawberry_records', column, definitions)
+    # 尚未补充最新记录字段的旧库，视图由迁移 004 重建
+    if runner.column_exists('strawberries', 'latest_record_id'):
+        for statement in latest_view_statements(runner.dialect):
+            runner.execute(statement)
+
+
+def _003_statistics_counters(runner: MigrationRunner):
+    """增加统计计数器表（计数器在迁移 004 回填最新记录字段后重建）"""
+    runner.execute(COUNTERS_DDL[runner.dialect].strip())
+
+
+def _004_latest_record_columns(runner: MigrationRunner):
+    """
+    草莓表增加最新记录冗余字段（最新记录ID、生长阶段、健康状态、记录时间、记录数量），
+    strawberry_latest_view 改为按 latest_record_id 关联一条记录；
+    按ID分批回填已有草莓后，根据草莓表和记录表重建统计计数器
+    """
+    for column in LATEST_COLUMN_DDL['mysql']:
+        runner.add_column('strawberries', column,
+                          {dialect: columns[column] for dialect, columns in LATEST_COLUMN_DDL.items()})
+    for statement in latest_view_statements(runner.dialect):
+        runner.execute(statement)
+    runner.run_step("回填草莓的最新记录字段", strawberry_dao.backfill_latest_records)
+    runner.run_step("根据草莓表和记录表重建统计计数器", strawberry_dao.reconcile_counters)
+
+
+def _005_drop_record_trigger(runner: MigrationRunner):
+    """删除逐行清理旧记录的 clean_old_records 触发器，超出保留数量的记录改由清理任务删除"""
+    runner.execute("DROP TRIGGER IF EXISTS clean_old_records")
+
+
+MIGRATIONS = [
+    Migration(1, '索引调整：记录表(strawberry_id, recorded_at)、草莓表(status, created_at, id)，删除冗余索引', _001_index_pack),
+    Migration(2, '记录表增加图片元数据字段，视图增加最新记录缩略图路径', _002_image_metadata),
+    Migration(3, '增加统计计数器表', _003_statistics_counters),
+    Migration(4, '草莓表增加最新记录冗余字段并回填，视图改为按最新记录ID关联，重建统计计数器', _004_latest_record_columns),
+    Migration(5, '删除 clean_old_records 触发器，旧记录改由清理任务删除', _005_drop_record_trigger),
+]
+
+# 全局迁移执行器实例
+migration_runner = MigrationRunner(MIGRATIONS)
@@ -0,0 +1,155 @@
+"""
+数据行模型
+以 __slots__ 保存查询结果行，直接由元组游标的行构造：不为每行建立字典、不重复保存字段名，
+大列表占用的内存明显少于字典行。为兼容按字典读取行的代码，支持 row['字段'] 和 row.get('字段')。
+"""
+from datetime import date, datetime
+from operator import attrgetter
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+# 每组字段名对应一个 attrgetter，一次调用取出整行的值
+_GETTERS: Dict[Tuple[str, ...], Callable] = {}
+
+
+def _getter(columns: Tuple[str, ...]) -> Callable:
+    getter = _GETTERS.get(columns)
+    if getter is None:
+        if len(columns) == 1:
+            single = attrgetter(columns[0])
+            getter = lambda obj: (single(obj),)  # noqa: E731
+        else:
+            getter = attrgetter(*columns)
+        _GETTERS[columns] = getter
+    return getter
+
+
+def json_value(value: Any) -> Any:
+    """把日期时间（包括嵌套在字典、列表中的）转换为ISO格式字符串"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {key: json_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [json_value(item) for item in value]
+    return value
+
+
+class RowModel:
+    """数据行基类"""
+
+    __slots__ = ('_columns',)
+
+    # 由服务层补充的字段（例如图片信息），未设置时不出现在 to_dict()/to_json() 中
+    EXTRAS: Tuple[str, ...] = ()
+    # 日期时间字段，to_json() 只转换这些字段
+    DATETIME_FIELDS = frozenset()
+
+    @classmethod
+    def from_row(cls, row: Sequence, columns: Tuple[str, ...]) -> 'RowModel':
+        """
+        由元组游标的一行构造
+
+        Args:
+            row: 查询结果行，字段顺序与 columns 一致
+            columns: 字段名，同一查询的所有行共用同一个元组
+        """
+        obj = cls.__new__(cls)
+        obj._columns = columns
+        for name, value in zip(columns, row):
+            setattr(obj, name, value)
+        return obj
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Sequence], columns: Tuple[str, ...]) -> Iterator['RowModel']:
+        """逐行构造；提前关闭时一并关闭底层的流式结果"""
+        try:
+            for row in rows:
+                yield cls.from_row(row, columns)
+        finally:
+            close = getattr(rows, 'close', None)
+            if close:
+                close()
+
+    def keys(self) -> List[str]:
+        """已读取的字段和已设置的补充字段"""
+        return list(self._columns) + [name for name in self.EXTRAS if hasattr(self, name)]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典（保留原始值）"""
+        data = dict(zip(self._columns, _getter(self._columns)(self)))
+        for name in self.EXTRAS:
+            value = getattr(self, name, None)
+            if value is not None:
+                data[name] = value
+        return data
+
+    def to_json(self) -> Dict[str, Any]:
+        """转换为可直接序列化为JSON的字典（日期时间转为ISO格式字符串）"""
+        data = dict(zip(self._columns, _getter(self._columns)(self)))
+        for name in self.DATETIME_FIELDS:
+            value = data.get(name)
+            if value.__class__ is datetime or value.__class__ is date:
+                data[name] = value.isoformat()
+        for name in self.EXTRAS:
+            value = getattr(self, name, None)
+            if value is not None:
+                data[name] = json_value(value)
+        return data
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._columns or key in self.EXTRAS:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                pass
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any):
+        if key not in self._columns and key not in self.EXTRAS:
+            raise KeyError(f"{type(self).__name__} 没有字段: {key}")
+        setattr(self, key, value)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._columns or (key in self.EXTRAS and hasattr(self, key))
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __repr__(self) -> str:
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in self._columns[:3])
+        return f"{type(self).__name__}({fields}, ...)"
+
+
+class Strawberry(RowModel):
+    """草莓基本信息（strawberries 表的一行）"""
+
+    __slots__ = ('id', 'qr_code', 'qr_code_path', 'created_at', 'updated_at', 'status', 'notes',
+                 'latest_record_id', 'latest_growth_stage', 'latest_health_status',
+                 'latest_recorded_at', 'record_count')
+
+    DATETIME_FIELDS = frozenset({'created_at', 'updated_at', 'latest_recorded_at'})
+
+
+class GrowthRecord(RowModel):
+    """生长观察记录（strawberry_records 表的一行）"""
+
+    __slots__ = ('id', 'strawberry_id', 'image_path', 'image_url', 'ai_description', 'growth_stage',
+                 'health_status', 'size_estimate', 'color_description', 'recorded_at', 'created_at',
+                 'image_width', 'image_height', 'image_format', 'image_size_bytes', 'image_has_exif',
+                 'image_taken_at', 'thumbnail_path', 'image_info')
+
+    EXTRAS = ('image_info',)
+    DATETIME_FIELDS = frozenset({'recorded_at', 'created_at', 'image_taken_at'})
+
+
+class LatestSummary(RowModel):
+    """草莓及其最新记录（字段与 strawberry_latest_view 一致），用于列表展示"""
+
+    __slots__ = ('id', 'qr_code', 'qr_code_path', 'strawberry_status', 'notes', 'strawberry_created_at',
+                 'latest_record_id', 'latest_image_path', 'latest_ai_description', 'latest_growth_stage',
+                 'latest_health_status', 'latest_recorded_at', 'record_count', 'latest_thumbnail_path')
+
+    DATETIME_FIELDS = frozenset({'strawberry_created_at', 'latest_recorded_at'})
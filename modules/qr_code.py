@@ -6,14 +6,43 @@ import qrcode
 from qrcode import constants
 import os
 import uuid
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from typing import Optional, Tuple, List, Dict
+from typing import Optional, Tuple, List, Dict, Callable, Sequence
 import logging
 from PIL import Image
 from config import Config
 
 logger = logging.getLogger(__name__)
 
+# 少于该数量的二维码在当前进程中渲染，不启动进程池
+PARALLEL_RENDER_THRESHOLD = 32
+
+
+def render_qr_png(content: str, path: str, box_size: int, border: int):
+    """渲染二维码并保存为 PNG（模块级函数，可在进程池中执行）"""
+    qr = qrcode.QRCode(
+        version=1,  # 控制二维码的大小
+        error_correction=constants.ERROR_CORRECT_L,
+        box_size=box_size,
+        border=border,
+    )
+    qr.add_data(content)
+    qr.make(fit=True)
+    img = qr.make_image(fill_color="black", back_color="white")
+    with open(path, 'wb') as f:
+        img.save(f, 'PNG')
+
+
+def _render_task(task: Tuple[str, str, int, int]) -> Optional[str]:
+    """进程池任务：渲染一个二维码，成功返回None，失败返回错误信息"""
+    try:
+        render_qr_png(*task)
+        return None
+    except Exception as e:
+        return str(e)
+
+
 class QRCodeManager:
     """二维码管理器"""
     
@@ -56,21 +85,6 @@ class QRCodeManager:
             二维码图片的完整路径，失败返回None
         """
         try:
-            # 创建二维码对象
-            qr = qrcode.QRCode(
-                version=1,  # 控制二维码的大小
-                error_correction=constants.ERROR_CORRECT_L,
-                box_size=self.qr_size,
-                border=self.qr_border,
-            )
-            
-            # 添加数据
-            qr.add_data(content)
-            qr.make(fit=True)
-            
-            # 创建二维码图片
-            img = qr.make_image(fill_color="black", back_color="white")
-            
             # 生成文件名
             if not filename:
                 # 从内容中提取安全的文件名
@@ -84,9 +98,8 @@ class QRCodeManager:
             # 完整路径
             full_path = os.path.join(self.storage_path, filename)
             
-            # 保存图片
-            with open(full_path, 'wb') as f:
-                img.save(f, 'PNG')
+            # 生成并保存图片
+            render_qr_png(content, full_path, self.qr_size, self.qr_border)
             
             logger.info(f"二维码图片保存成功: {full_path}")
             return full_path
@@ -159,9 +172,72 @@ class QRCodeManager:
             logger.error(f"验证二维码格式失败: {e}")
             return False
     
+    def generate_unique_codes(self, count: int, prefix: str = "SB") -> List[str]:
+        """
+        批量生成互不重复的二维码内容（格式同 generate_unique_code，共用一个时间戳）
+        
+        Args:
+            count: 生成数量
+            prefix: 前缀
+        
+        Returns:
+            二维码内容列表
+        """
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        codes: Dict[str, None] = {}
+        while len(codes) < count:
+            codes[f"{prefix}_{timestamp}_{uuid.uuid4().hex[:8].upper()}"] = None
+        return list(codes)
+    
+    def render_batch(self, items: Sequence[Tuple[str, str]], workers: Optional[int] = None,
+                     progress: Optional[Callable[[bool], None]] = None) -> List[Optional[str]]:
+        """
+        在进程池中并行渲染一批二维码图片，直接保存到指定路径
+        
+        进程池中失败的二维码（包括进程池异常退出时未完成的）会在当前进程中再渲染一次。
+        
+        Args:
+            items: [(二维码内容, 图片路径), ...]
+            workers: 进程数，默认 Config.QR_RENDER_WORKERS（0表示CPU核数）
+            progress: 每个二维码渲染结束时调用，参数为是否成功（重试的二维码只在最终结果确定时调用）
+        
+        Returns:
+            与 items 对应的错误信息列表，成功的项为None
+        """
+        tasks = [(content, path, self.qr_size, self.qr_border) for content, path in items]
+        workers = max(1, workers or Config.QR_RENDER_WORKERS or os.cpu_count() or 1)
+        errors: List[Optional[str]] = []
+        
+        if workers == 1 or len(tasks) < PARALLEL_RENDER_THRESHOLD:
+            for task in tasks:
+                errors.append(_render_task(task))
+                if progress:
+                    progress(errors[-1] is None)
+            return errors
+        
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                chunksize = max(1, min(64, len(tasks) // (workers * 4)))
+                for error in pool.map(_render_task, tasks, chunksize=chunksize):
+                    errors.append(error)
+                    if progress and error is None:
+                        progress(True)
+        except Exception as e:
+            logger.error(f"二维码渲染进程池异常退出: {e}")
+            errors.extend(str(e) for _ in range(len(tasks) - len(errors)))
+        
+        for index, error in enumerate(errors):
+            if error is not None:
+                errors[index] = _render_task(tasks[index])
+                if errors[index] is not None:
+                    logger.error(f"渲染二维码失败: {tasks[index][1]}: {errors[index]}")
+                if progress:
+                    progress(errors[index] is None)
+        return errors
+    
     def create_batch_qr_codes(self, count: int, prefix: str = "SB") -> List[Tuple[str, str]]:
         """
-        批量生成二维码
+        批量生成二维码（内容批量生成，图片在进程池中并行渲染）
         
         Args:
             count: 生成数量
@@ -170,19 +246,10 @@ class QRCodeManager:
         Returns:
             [(二维码内容, 图片路径), ...] 的列表
         """
-        results = []
-        
-        for i in range(count):
-            try:
-                qr_content, qr_path = self.generate_strawberry_qr(prefix)
-                if qr_content and qr_path:
-                    results.append((qr_content, qr_path))
-                    logger.info(f"批量生成进度: {i+1}/{count}")
-                else:
-                    logger.warning(f"第{i+1}个二维码生成失败")
-                    
-            except Exception as e:
-                logger.error(f"批量生成第{i+1}个二维码时出错: {e}")
+        items = [(content, os.path.join(self.storage_path, f"qr_{content}.png"))
+                 for content in self.generate_unique_codes(count, prefix)]
+        errors = self.render_batch(items)
+        results = [item for item, error in zip(items, errors) if error is None]
         
         logger.info(f"批量生成完成，成功: {len(results)}/{count}")
         return results
@@ -0,0 +1,192 @@
+"""
+SQL执行统计模块
+按归一化的语句指纹统计调用次数、返回行数和延迟分布，并记录慢查询
+"""
+import re
+import threading
+import logging
+from collections import deque
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 延迟直方图的桶上界（毫秒），最后一个桶收纳超过最大上界的样本
+HISTOGRAM_BOUNDS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%s|%\(\w+\)s|\?")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_VALUES_LIST = re.compile(r"\bVALUES\s*(\([^()]*\))(?:\s*,\s*\([^()]*\))+", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(query: str) -> str:
+    """
+    生成SQL语句指纹：去掉字面量和多余空白，合并 IN 列表和多行 VALUES
+
+    Args:
+        query: SQL语句
+
+    Returns:
+        归一化后的语句，同一模板的语句得到相同指纹
+    """
+    normalized = _STRING_LITERAL.sub('?', query)
+    normalized = _PLACEHOLDER.sub('?', normalized)
+    normalized = _NUMBER_LITERAL.sub('?', normalized)
+    normalized = _WHITESPACE.sub(' ', normalized).strip()
+    normalized = _IN_LIST.sub('IN (...)', normalized)
+    normalized = _VALUES_LIST.sub(r'VALUES \1, ...', normalized)
+    return normalized
+
+
+def _percentile(sorted_samples: List[float], percent: float) -> float:
+    """从已排序的样本中取百分位数（最近秩法）"""
+    if not sorted_samples:
+        return 0.0
+    index = max(0, min(len(sorted_samples) - 1, int(round(percent / 100 * len(sorted_samples))) - 1))
+    return sorted_samples[index]
+
+
+class _StatementStats:
+    """单个语句指纹的累计统计"""
+
+    __slots__ = ('calls', 'errors', 'rows', 'total_ms', 'max_ms', 'slow', 'samples', 'histogram')
+
+    def __init__(self, sample_size: int):
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.slow = 0
+        self.samples = deque(maxlen=sample_size)  # 最近的延迟样本，用于计算百分位
+        self.histogram = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+
+
+class QueryStats:
+    """SQL执行统计收集器（线程安全）"""
+
+    def __init__(self, slow_query_ms: float = 200.0, sample_size: int = 1024, enabled: bool = True):
+        """
+        初始化统计收集器
+
+        Args:
+            slow_query_ms: 慢查询阈值（毫秒），0表示不记录慢查询
+            sample_size: 每个指纹保留的最近延迟样本数
+            enabled: 是否启用统计
+        """
+        self.slow_query_ms = slow_query_ms
+        self.sample_size = sample_size
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._statements: Dict[str, _StatementStats] = {}
+        self._since = datetime.now()
+
+    def record(self, query: str, params, elapsed: float, rows: int = 0, error: bool = False,
+               batch_size: Optional[int] = None):
+        """
+        记录一次语句执行
+
+        Args:
+            query: SQL语句
+            params: 绑定参数（只统计个数，不记录取值）；executemany 时为其中一组参数
+            elapsed: 耗时（秒）
+            rows: 返回或影响的行数
+            error: 是否执行失败
+            batch_size: executemany 执行的参数组数，单条执行时为None
+        """
+        if not self.enabled:
+            return
+        key = fingerprint(query)
+        elapsed_ms = elapsed * 1000
+        is_slow = bool(self.slow_query_ms) and elapsed_ms >= self.slow_query_ms
+
+        with self._lock:
+            stats = self._statements.get(key)
+            if stats is None:
+                stats = self._statements[key] = _StatementStats(self.sample_size)
+            stats.calls += 1
+            stats.rows += max(0, rows or 0)
+            stats.total_ms += elapsed_ms
+            stats.max_ms = max(stats.max_ms, elapsed_ms)
+            stats.samples.append(elapsed_ms)
+            stats.histogram[self._bucket_index(elapsed_ms)] += 1
+            if error:
+                stats.errors += 1
+            if is_slow:
+                stats.slow += 1
+
+        if is_slow:
+            param_count = len(params) if params else 0
+            batch = f" × {batch_size} 组" if batch_size is not None else ""
+            logger.warning(
+                f"慢查询 {elapsed_ms:.1f}ms (阈值 {self.slow_query_ms:.0f}ms), "
+                f"绑定参数 {param_count} 个{batch}, 行数 {rows}: {key[:500]}"
+            )
+
+    @staticmethod
+    def _bucket_index(elapsed_ms: float) -> int:
+        """返回延迟所属的直方图桶下标"""
+        for index, bound in enumerate(HISTOGRAM_BOUNDS_MS):
+            if elapsed_ms <= bound:
+                return index
+        return len(HISTOGRAM_BOUNDS_MS)
+
+    def snapshot(self, top: Optional[int] = None) -> Dict:
+        """
+        获取统计快照
+
+        Args:
+            top: 只返回总耗时最高的前N个语句
+
+        Returns:
+            统计信息字典，语句按总耗时倒序排列
+        """
+        statements = []
+        with self._lock:
+            since = self._since
+            for key, stats in self._statements.items():
+                samples = sorted(stats.samples)
+                statements.append({
+                    'fingerprint': key,
+                    'calls': stats.calls,
+                    'errors': stats.errors,
+                    'slow_calls': stats.slow,
+                    'rows': stats.rows,
+                    'total_ms': round(stats.total_ms, 3),
+                    'avg_ms': round(stats.total_ms / stats.calls, 3) if stats.calls else 0.0,
+                    'p50_ms': round(_percentile(samples, 50), 3),
+                    'p95_ms': round(_percentile(samples, 95), 3),
+                    'p99_ms': round(_percentile(samples, 99), 3),
+                    'max_ms': round(stats.max_ms, 3),
+                    'histogram': self._format_histogram(stats.histogram)
+                })
+        statement_count = len(statements)
+        statements.sort(key=lambda item: item['total_ms'], reverse=True)
+        if top:
+            statements = statements[:top]
+
+        return {
+            'since': since,
+            'slow_query_threshold_ms': self.slow_query_ms,
+            'statement_count': statement_count,
+            'statements': statements
+        }
+
+    @staticmethod
+    def _format_histogram(histogram: List[int]) -> Dict[str, int]:
+        """把直方图计数转换为以桶上界命名的字典"""
+        result = {f"le_{bound}ms": histogram[index] for index, bound in enumerate(HISTOGRAM_BOUNDS_MS)}
+        result[f"gt_{HISTOGRAM_BOUNDS_MS[-1]}ms"] = histogram[-1]
+        return result
+
+    def reset(self):
+        """清空统计"""
+        with self._lock:
+            self._statements.clear()
+            self._since = datetime.now()
+
@@ -0,0 +1,164 @@
+"""
+记录清理模块
+按 Config.MAX_RECORDS_PER_STRAWBERRY 保留每颗草莓最新的观察记录：
+分批（按草莓ID游标）删除更早的记录，并通过 ImageManager 删除对应的图片和缩略图。
+取代原先在每次插入时执行的 clean_old_records 触发器，写入路径不再承担清理开销。
+"""
+import os
+import time
+import threading
+import logging
+from datetime import datetime
+from typing import Dict, Optional
+from config import Config
+from modules.strawberry_dao import strawberry_dao
+from modules.image_manager import image_manager
+
+logger = logging.getLogger(__name__)
+
+
+class RetentionEngine:
+    """记录清理任务"""
+
+    def __init__(self, keep: Optional[int] = None, batch_size: Optional[int] = None,
+                 interval: Optional[int] = None):
+        """
+        初始化清理任务
+
+        Args:
+            keep: 每颗草莓保留的记录数，默认 Config.MAX_RECORDS_PER_STRAWBERRY
+            batch_size: 每批处理的草莓数，默认 Config.RETENTION_BATCH_SIZE
+            interval: 定时执行的间隔秒数，默认 Config.RETENTION_INTERVAL
+        """
+        self.dao = strawberry_dao
+        self.image_manager = image_manager
+        self.keep = Config.MAX_RECORDS_PER_STRAWBERRY if keep is None else keep
+        self.batch_size = batch_size or Config.RETENTION_BATCH_SIZE
+        self.interval = Config.RETENTION_INTERVAL if interval is None else interval
+
+        self._run_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started_pid: Optional[int] = None
+        self.last_report: Optional[Dict] = None
+
+    def run(self, dry_run: bool = False) -> Optional[Dict]:
+        """
+        执行一次清理
+
+        Args:
+            dry_run: 为True时只统计将要删除的记录和图片，不做任何修改
+
+        Returns:
+            清理报告；已有清理正在执行时返回None
+        """
+        if not self._run_lock.acquire(blocking=False):
+            logger.warning("记录清理正在执行，跳过本次清理")
+            return None
+        try:
+            return self._run(dry_run)
+        finally:
+            self._run_lock.release()
+
+    def _run(self, dry_run: bool) -> Dict:
+        """逐批清理，每批单独提交"""
+        started = time.perf_counter()
+        report = {
+            'dry_run': dry_run,
+            'keep': self.keep,
+            'batches': 0,
+            'strawberries': 0,
+            'records': 0,
+            'images_deleted': 0,
+            'image_errors': 0,
+            'started_at': datetime.now()
+        }
+
+        after_id = 0
+        while True:
+            strawberry_ids = self.dao.get_strawberry_ids_over_record_limit(self.keep, after_id, self.batch_size)
+            if not strawberry_ids:
+                break
+            after_id = strawberry_ids[-1]
+            report['batches'] += 1
+
+            excess = self.dao.get_excess_records(strawberry_ids, self.keep)
+            if not excess:
+                continue
+            report['strawberries'] += len({record['strawberry_id'] for record in excess})
+            report['records'] += len(excess)
+            if dry_run:
+                continue
+
+            # 删除记录与更新最新记录字段在同一事务中完成，提交后再删除图片文件
+            with self.dao.db.transaction():
+                self.dao.delete_records_by_ids(record['id'] for record in excess)
+                self.dao.refresh_latest_records(strawberry_ids)
+
+            for record in excess:
+                if not record.get('image_path'):
+                    continue
+                if self.image_manager.delete_image(record['image_path']):
+                    report['images_deleted'] += 1
+                else:
+                    report['image_errors'] += 1
+
+        report['elapsed_seconds'] = round(time.perf_counter() - started, 3)
+        action = "预计删除" if dry_run else "已删除"
+        logger.info(
+            f"记录清理完成（保留 {self.keep} 条）：{action} {report['strawberries']} 颗草莓的 "
+            f"{report['records']} 条记录，删除图片 {report['images_deleted']} 个，"
+            f"耗时 {report['elapsed_seconds']} 秒"
+        )
+        self.last_report = report
+        return report
+
+    def start(self) -> bool:
+        """启动定时清理线程（interval 为0时不启动）"""
+        if self.interval <= 0:
+            logger.info("未配置定时记录清理")
+            return False
+        if self._thread and self._thread.is_alive():
+            return True
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._loop, name='record-retention', daemon=True)
+        self._thread.start()
+        logger.info(f"定时记录清理已启动，间隔 {self.interval} 秒")
+        return True
+
+    def ensure_started(self) -> bool:
+        """
+        每个进程只启动一次定时清理线程
+
+        WSGI 服务器（gunicorn/uwsgi）导入 app 后 fork 出工作进程，父进程中的线程不会带到子进程，
+        因此按进程号判断，在每个工作进程处理第一个请求时启动。
+        """
+        pid = os.getpid()
+        if self._started_pid == pid:
+            return self._thread is not None
+        with self._start_lock:
+            if self._started_pid != pid:
+                self._thread = None
+                self.start()
+                self._started_pid = pid
+        return self._thread is not None
+
+    def stop(self):
+        """停止定时清理线程"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _loop(self):
+        """定时执行清理，单次失败不影响下一次"""
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.run()
+            except Exception as e:
+                logger.error(f"定时记录清理失败: {e}")
+
+
+# 全局清理任务实例
+retention_engine = RetentionEngine()
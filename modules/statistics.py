@@ -0,0 +1,180 @@
+"""
+统计报表模块
+按任意日期范围和时间粒度（天/周/月）统计新增草莓、新增记录以及生长阶段、健康状态的变化：
+- 新增草莓取自按天维护的创建日期计数器，不扫描草莓表
+- 新增记录和状态变化由一次聚合查询按天得出（窗口函数比较相邻记录），再在内存中汇总到各时间段
+- 报表按范围缓存快照，过期后在宽限期内先返回旧快照并在后台刷新（stale-while-revalidate）
+"""
+import logging
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from config import Config
+from modules.strawberry_dao import strawberry_dao
+from modules.cache import SnapshotCache
+
+logger = logging.getLogger(__name__)
+
+BUCKETS = ('day', 'week', 'month')
+DEFAULT_RANGE_DAYS = 30
+
+
+def bucket_start(day: date, bucket: str) -> date:
+    """日期所在时间段的第一天（周从星期一开始）"""
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket_start(start: date, bucket: str) -> date:
+    """下一个时间段的第一天"""
+    if bucket == 'week':
+        return start + timedelta(days=7)
+    if bucket == 'month':
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def _parse_day(value: str, name: str) -> date:
+    try:
+        return datetime.fromisoformat(value).date()
+    except ValueError as e:
+        raise ValueError(f"无效的{name}日期: {value}，格式应为 YYYY-MM-DD") from e
+
+
+class StatisticsEngine:
+    """统计报表服务"""
+
+    def __init__(self, ttl: Optional[float] = None, stale_ttl: Optional[float] = None,
+                 max_buckets: Optional[int] = None):
+        """
+        初始化统计报表服务
+
+        Args:
+            ttl: 报表快照有效秒数，默认 Config.STATISTICS_CACHE_TTL
+            stale_ttl: 过期后仍返回旧快照的宽限秒数，默认 Config.STATISTICS_STALE_TTL
+            max_buckets: 单次统计的最大时间段数，默认 Config.STATISTICS_MAX_BUCKETS
+        """
+        self.dao = strawberry_dao
+        self.max_buckets = max_buckets or Config.STATISTICS_MAX_BUCKETS
+        self.snapshots = SnapshotCache(
+            Config.STATISTICS_CACHE_TTL if ttl is None else ttl,
+            Config.STATISTICS_STALE_TTL if stale_ttl is None else stale_ttl
+        )
+
+    def parse_range(self, start: Optional[str] = None, end: Optional[str] = None,
+                    bucket: Optional[str] = None) -> Tuple[date, date, str]:
+        """
+        解析请求参数中的统计范围
+
+        Args:
+            start: 开始日期（含），默认结束日期前 DEFAULT_RANGE_DAYS 天
+            end: 结束日期（含），默认今天
+            bucket: 时间粒度 day/week/month，默认 day
+
+        Returns:
+            (开始日期, 结束日期, 时间粒度)
+
+        Raises:
+            ValueError: 参数无效或时间段数超出上限
+        """
+        bucket = bucket or 'day'
+        if bucket not in BUCKETS:
+            raise ValueError(f"未知的时间粒度: {bucket}，可选: {', '.join(BUCKETS)}")
+        end_day = _parse_day(end, '结束') if end else date.today()
+        start_day = _parse_day(start, '开始') if start else end_day - timedelta(days=DEFAULT_RANGE_DAYS - 1)
+        if start_day > end_day:
+            raise ValueError("开始日期不能晚于结束日期")
+
+        count = len(self._bucket_starts(start_day, end_day, bucket))
+        if count > self.max_buckets:
+            raise ValueError(f"统计范围包含 {count} 个时间段，超出上限 {self.max_buckets}，请缩小范围或使用更大的时间粒度")
+        return start_day, end_day, bucket
+
+    @staticmethod
+    def _bucket_starts(start: date, end: date, bucket: str) -> List[date]:
+        starts = []
+        current = bucket_start(start, bucket)
+        while current <= end:
+            starts.append(current)
+            current = next_bucket_start(current, bucket)
+        return starts
+
+    def report(self, start: date, end: date, bucket: str = 'day') -> Dict:
+        """
+        获取统计报表（经快照缓存）
+
+        Args:
+            start: 开始日期（含）
+            end: 结束日期（含）
+            bucket: 时间粒度 day/week/month
+
+        Returns:
+            {'from', 'to', 'bucket', 'generated_at', 'summary', 'series'}，
+            series 为各时间段的 new_strawberries、new_records、stage_transitions、health_transitions，
+            状态变化以 '原状态->新状态' 为键
+        """
+        return self.snapshots.get_or_compute(
+            ('report', start, end, bucket), lambda: self._compute(start, end, bucket)
+        )
+
+    def _compute(self, start: date, end: date, bucket: str) -> Dict:
+        """读取计数器和按天聚合结果，汇总到各时间段"""
+        starts = self._bucket_starts(start, end, bucket)
+        series = {
+            bucket_day: {
+                'start': max(bucket_day, start),
+                'end': min(next_bucket_start(bucket_day, bucket) - timedelta(days=1), end),
+                'new_strawberries': 0,
+                'new_records': 0,
+                'stage_transitions': Counter(),
+                'health_transitions': Counter()
+            }
+            for bucket_day in starts
+        }
+
+        for day, count in self.dao.get_created_counts(start, end).items():
+            series[bucket_start(date.fromisoformat(day), bucket)]['new_strawberries'] += count
+
+        activity = self.dao.get_record_activity(
+            datetime.combine(start, datetime.min.time()),
+            datetime.combine(end + timedelta(days=1), datetime.min.time())
+        )
+        for row in activity:
+            item = series[bucket_start(date.fromisoformat(str(row['day'])[:10]), bucket)]
+            item['new_records'] += row['count']
+            if row['prev_stage'] and row['growth_stage'] and row['prev_stage'] != row['growth_stage']:
+                item['stage_transitions'][f"{row['prev_stage']}->{row['growth_stage']}"] += row['count']
+            if row['prev_health'] and row['health_status'] and row['prev_health'] != row['health_status']:
+                item['health_transitions'][f"{row['prev_health']}->{row['health_status']}"] += row['count']
+
+        summary = {
+            'new_strawberries': 0,
+            'new_records': 0,
+            'stage_transitions': Counter(),
+            'health_transitions': Counter()
+        }
+        for item in series.values():
+            summary['new_strawberries'] += item['new_strawberries']
+            summary['new_records'] += item['new_records']
+            summary['stage_transitions'].update(item['stage_transitions'])
+            summary['health_transitions'].update(item['health_transitions'])
+            item['stage_transitions'] = dict(item['stage_transitions'])
+            item['health_transitions'] = dict(item['health_transitions'])
+        summary['stage_transitions'] = dict(summary['stage_transitions'])
+        summary['health_transitions'] = dict(summary['health_transitions'])
+
+        return {
+            'from': start,
+            'to': end,
+            'bucket': bucket,
+            'generated_at': datetime.now(),
+            'summary': summary,
+            'series': list(series.values())
+        }
+
+
+# 全局统计报表服务实例
+statistics_engine = StatisticsEngine()
@@ -2,13 +2,200 @@
 草莓数据访问对象 (DAO)
 提供对草莓相关数据的高级操作接口
 """
-from datetime import datetime
-from typing import List, Dict, Optional, Tuple
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import List, Dict, Optional, Tuple, Iterator, Iterable, Sequence
 import logging
+from config import Config
 from .database import db_manager
+from .cache import strawberry_cache, strawberry_key, qr_key
+from .models import Strawberry, GrowthRecord, LatestSummary
 
 logger = logging.getLogger(__name__)
 
+# 保存图片时读取的元数据字段（见 ImageManager.save_image_with_metadata），随记录写入
+IMAGE_METADATA_FIELDS = ('image_width', 'image_height', 'image_format', 'image_size_bytes',
+                         'image_has_exif', 'image_taken_at', 'thumbnail_path')
+
+# 生长记录多行插入语句（VALUES 之后按行数拼接占位符）
+_GROWTH_RECORD_INSERT = f"""
+    INSERT INTO strawberry_records 
+    (strawberry_id, image_path, ai_description, growth_stage, 
+     health_status, size_estimate, color_description, recorded_at,
+     {', '.join(IMAGE_METADATA_FIELDS)})
+    VALUES
+"""
+_GROWTH_RECORD_ROW = f"({', '.join(['%s'] * (8 + len(IMAGE_METADATA_FIELDS)))})"
+
+# 草莓表字段（读取时按此顺序构造 Strawberry 行模型）
+STRAWBERRY_FIELDS = ('id', 'qr_code', 'qr_code_path', 'created_at', 'updated_at', 'status', 'notes',
+                     'latest_record_id', 'latest_growth_stage', 'latest_health_status',
+                     'latest_recorded_at', 'record_count')
+_STRAWBERRY_COLUMNS = ', '.join(STRAWBERRY_FIELDS)
+# 草莓状态（与表结构中的取值一致）
+STRAWBERRY_STATUSES = ('active', 'inactive', 'harvested')
+
+# 读取字段集：summary 为列表展示所需的精简字段（不含 Markdown 格式的 AI 描述长文本），full 为全部字段
+RECORD_FIELDS = {
+    'summary': ('id', 'strawberry_id', 'image_path', 'image_url', 'growth_stage', 'health_status',
+                'size_estimate', 'color_description', 'recorded_at', 'created_at') + IMAGE_METADATA_FIELDS,
+    'full': ('id', 'strawberry_id', 'image_path', 'image_url', 'ai_description', 'growth_stage',
+             'health_status', 'size_estimate', 'color_description', 'recorded_at', 'created_at')
+            + IMAGE_METADATA_FIELDS
+}
+LATEST_VIEW_FIELDS = {
+    'summary': ('id', 'qr_code', 'qr_code_path', 'strawberry_status', 'notes', 'strawberry_created_at',
+                'latest_record_id', 'latest_image_path', 'latest_growth_stage', 'latest_health_status',
+                'latest_recorded_at', 'record_count', 'latest_thumbnail_path'),
+    'full': ('id', 'qr_code', 'qr_code_path', 'strawberry_status', 'notes', 'strawberry_created_at',
+             'latest_record_id', 'latest_image_path', 'latest_ai_description', 'latest_growth_stage',
+             'latest_health_status', 'latest_recorded_at', 'record_count', 'latest_thumbnail_path')
+}
+FIELD_SETS = tuple(RECORD_FIELDS)
+# 批量导出时每行记录的字段（草莓ID已在草莓字段中）
+EXPORT_RECORD_FIELDS = tuple(field for field in RECORD_FIELDS['full'] if field != 'strawberry_id')
+
+# 草莓及其最新记录：最新记录的字段冗余在 strawberries 上，图片和描述按主键关联一条记录
+_LATEST_FROM = "strawberries s LEFT JOIN strawberry_records r ON r.id = s.latest_record_id"
+_LATEST_COLUMNS = {
+    'id': 's.id',
+    'qr_code': 's.qr_code',
+    'qr_code_path': 's.qr_code_path',
+    'strawberry_status': 's.status',
+    'notes': 's.notes',
+    'strawberry_created_at': 's.created_at',
+    'latest_record_id': 's.latest_record_id',
+    'latest_image_path': 'r.image_path',
+    'latest_ai_description': 'r.ai_description',
+    'latest_growth_stage': 's.latest_growth_stage',
+    'latest_health_status': 's.latest_health_status',
+    'latest_recorded_at': 's.latest_recorded_at',
+    'record_count': 's.record_count',
+    'latest_thumbnail_path': 'r.thumbnail_path'
+}
+
+# 最新记录冗余字段的列定义，用于给已有数据库补充字段
+LATEST_COLUMN_DDL = {
+    'mysql': {
+        'latest_record_id': "BIGINT NULL COMMENT '最新记录ID'",
+        'latest_growth_stage': "ENUM('seedling', 'flowering', 'fruiting', 'ripening', 'mature') NULL COMMENT '最新生长阶段'",
+        'latest_health_status': "ENUM('healthy', 'warning', 'sick') NULL COMMENT '最新健康状态'",
+        'latest_recorded_at': "TIMESTAMP NULL DEFAULT NULL COMMENT '最新记录时间'",
+        'record_count': "INT NOT NULL DEFAULT 0 COMMENT '记录数量'"
+    },
+    'sqlite': {
+        'latest_record_id': "INTEGER",
+        'latest_growth_stage': "TEXT",
+        'latest_health_status': "TEXT",
+        'latest_recorded_at': "TIMESTAMP",
+        'record_count': "INTEGER NOT NULL DEFAULT 0"
+    }
+}
+
+# 统计计数器：与草莓、记录的写入在同一事务中增减，统计接口直接读取
+# 计数器名称：strawberries、records、status:<状态>、stage:<最新生长阶段>、health:<最新健康状态>、created:<创建日期>
+# created:<创建日期> 是该日创建且仍存在的草莓数，删除草莓时按其 created_at 扣减
+COUNTERS_TABLE = "statistics_counters"
+COUNTERS_DDL = {
+    'mysql': f"""
+        CREATE TABLE IF NOT EXISTS {COUNTERS_TABLE} (
+            name VARCHAR(100) PRIMARY KEY COMMENT '计数器名称',
+            value BIGINT NOT NULL DEFAULT 0 COMMENT '计数值',
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间'
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='统计计数器表'
+    """,
+    'sqlite': f"""
+        CREATE TABLE IF NOT EXISTS {COUNTERS_TABLE} (
+            name VARCHAR(100) PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+        )
+    """
+}
+_CREATED_PREFIX = 'created:'
+
+
+def _day_key(value) -> str:
+    """创建日期计数器名称（datetime/date 或 'YYYY-MM-DD HH:MM:SS' 字符串）"""
+    return f"{_CREATED_PREFIX}{str(value)[:10]}"
+
+
+def _latest_counter_deltas(row: Dict, sign: int) -> Counter:
+    """一颗草莓的记录数及最新生长阶段/健康状态对计数器的贡献"""
+    deltas = Counter()
+    deltas['records'] += sign * (row.get('record_count') or 0)
+    if row.get('latest_record_id') is not None:
+        if row.get('latest_growth_stage'):
+            deltas[f"stage:{row['latest_growth_stage']}"] += sign
+        if row.get('latest_health_status'):
+            deltas[f"health:{row['latest_health_status']}"] += sign
+    return deltas
+
+
+def _select_list(field_sets: Dict[str, Tuple[str, ...]], fields: str, alias: str = '') -> str:
+    """
+    生成字段集对应的 SELECT 列表
+    
+    Raises:
+        ValueError: 未知的字段集
+    """
+    if fields not in field_sets:
+        raise ValueError(f"未知的字段集: {fields}，可选: {', '.join(field_sets)}")
+    prefix = f"{alias}." if alias else ''
+    return ', '.join(f"{prefix}{column}" for column in field_sets[fields])
+
+
+def _latest_select_list(fields: str) -> str:
+    """生成草莓及其最新记录的 SELECT 列表（字段名与 strawberry_latest_view 一致）"""
+    if fields not in LATEST_VIEW_FIELDS:
+        raise ValueError(f"未知的字段集: {fields}，可选: {', '.join(LATEST_VIEW_FIELDS)}")
+    return ', '.join(f"{_LATEST_COLUMNS[column]} AS {column}" for column in LATEST_VIEW_FIELDS[fields])
+
+def latest_view_statements(dialect: str) -> List[str]:
+    """重建 strawberry_latest_view 的语句（视图字段与 LATEST_VIEW_FIELDS['full'] 一致）"""
+    view = f"SELECT {_latest_select_list('full')} FROM {_LATEST_FROM}"
+    if dialect == 'mysql':
+        return [f"CREATE OR REPLACE VIEW strawberry_latest_view AS {view}"]
+    return ["DROP VIEW IF EXISTS strawberry_latest_view", f"CREATE VIEW strawberry_latest_view AS {view}"]
+
+def _chunked(values: Sequence, size: int) -> Iterator[Sequence]:
+    """按固定大小切分参数列表，避免单条 IN (...) 语句参数过多"""
+    size = max(1, size)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _unique(values: Iterable) -> List:
+    """去除重复值和空值并保持原有顺序"""
+    return list(dict.fromkeys(value for value in values if value is not None and value != ''))
+
+
+def _strawberry_conditions(status: Optional[str] = None, created_from: Optional[datetime] = None,
+                           created_before: Optional[datetime] = None, qr_prefix: Optional[str] = None,
+                           strawberry_ids: Optional[Sequence[int]] = None) -> Tuple[List[str], List]:
+    """按状态、创建时间范围、二维码前缀和ID列表筛选草莓（表别名 s）的条件及参数"""
+    conditions = []
+    params: List = []
+    if strawberry_ids is not None:
+        ids = _unique(strawberry_ids) or [0]
+        conditions.append(f"s.id IN ({', '.join(['%s'] * len(ids))})")
+        params.extend(ids)
+    if status:
+        conditions.append("s.status = %s")
+        params.append(status)
+    if created_from:
+        conditions.append("s.created_at >= %s")
+        params.append(created_from)
+    if created_before:
+        conditions.append("s.created_at < %s")
+        params.append(created_before)
+    if qr_prefix:
+        # 按区间比较代替 LIKE，前缀中的 % 和 _ 无需转义，并可使用 qr_code 的唯一索引
+        conditions.append("s.qr_code >= %s AND s.qr_code < %s")
+        params.extend([qr_prefix, qr_prefix[:-1] + chr(ord(qr_prefix[-1]) + 1)])
+    return conditions, params
+
+
 class StrawberryDAO:
     """草莓数据访问对象"""
     
@@ -30,56 +217,175 @@ class StrawberryDAO:
         """
         try:
             query = """
-                INSERT INTO strawberries (qr_code, qr_code_path, notes)
-                VALUES (%s, %s, %s)
+                INSERT INTO strawberries (qr_code, qr_code_path, notes, created_at)
+                VALUES (%s, %s, %s, %s)
             """
-            strawberry_id = self.db.execute_insert(query, (qr_code, qr_code_path, notes))
+            # 创建日期计数器按写入的 created_at 计算，与删除时扣减的日期一致
+            created_at = datetime.now().replace(microsecond=0)
+            # 插入草莓与更新统计计数器在同一事务中完成（新草莓默认状态为 active）
+            with self.db.transaction():
+                strawberry_id = self.db.execute_insert(query, (qr_code, qr_code_path, notes, created_at))
+                self._apply_counter_deltas({
+                    'strawberries': 1,
+                    'status:active': 1,
+                    _day_key(created_at): 1
+                })
             logger.info(f"成功创建草莓记录，ID: {strawberry_id}")
             return strawberry_id
         except Exception as e:
             logger.error(f"创建草莓记录失败: {e}")
             return None
     
-    def get_strawberry_by_id(self, strawberry_id: int) -> Optional[Dict]:
+    def create_strawberries(self, qr_codes: Sequence[str], notes: Optional[str], qr_path_prefix: str,
+                            batch_size: Optional[int] = None) -> List[int]:
+        """
+        批量创建草莓：多行 INSERT 分批写入，二维码路径和统计计数器在同一事务中更新
+        
+        二维码路径为 qr_path_prefix + 二维码内容 + '_id' + 草莓ID + '.png'，写入后由调用方按此路径生成图片。
+        
+        Args:
+            qr_codes: 二维码内容列表
+            notes: 备注信息
+            qr_path_prefix: 二维码路径前缀，例如 ./qr_codes/qr_
+            batch_size: 每条 INSERT 的行数，默认 Config.DB_BULK_INSERT_SIZE
+        
+        Returns:
+            与 qr_codes 顺序对应的草莓ID列表
+        
+        Raises:
+            写入失败时整批回滚并抛出异常
+        """
+        qr_codes = list(qr_codes)
+        ids: List[int] = []
+        path_expression = self.db.backend.concat('%s', 'qr_code', "'_id'", 'id', "'.png'")
+        # 整批使用同一个 created_at，创建日期计数器按写入的值计算
+        created_at = datetime.now().replace(microsecond=0)
+        with self.db.transaction():
+            for chunk in _chunked(qr_codes, batch_size or Config.DB_BULK_INSERT_SIZE):
+                self.db.execute_insert_rows(
+                    "INSERT INTO strawberries (qr_code, notes, created_at) VALUES", "(%s, %s, %s)",
+                    [(qr_code, notes, created_at) for qr_code in chunk]
+                )
+                # 二维码唯一，按二维码定位本批写入的行，不依赖自增ID是否连续
+                placeholders = ', '.join(['%s'] * len(chunk))
+                self.db.execute_update(
+                    f"UPDATE strawberries SET qr_code_path = {path_expression} WHERE qr_code IN ({placeholders})",
+                    (qr_path_prefix, *chunk)
+                )
+                rows = self.db.execute_query(
+                    f"SELECT id, qr_code FROM strawberries WHERE qr_code IN ({placeholders})",
+                    tuple(chunk), dictionary=False
+                )
+                chunk_ids = {qr_code: strawberry_id for strawberry_id, qr_code in rows}  # type: ignore
+                ids.extend(chunk_ids[qr_code] for qr_code in chunk)
+            # 新草莓默认状态为 active
+            self._apply_counter_deltas({
+                'strawberries': len(ids),
+                'status:active': len(ids),
+                _day_key(created_at): len(ids)
+            })
+        logger.info(f"批量创建草莓 {len(ids)} 颗")
+        return ids
+    
+    def get_strawberry_by_id(self, strawberry_id: int) -> Optional[Strawberry]:
         """根据ID获取草莓信息"""
         try:
-            query = "SELECT * FROM strawberries WHERE id = %s"
-            result = self.db.execute_query(query, (strawberry_id,), fetch_one=True)  # type: ignore
-            return result if result else None  # type: ignore
+            query = f"SELECT {_STRAWBERRY_COLUMNS} FROM strawberries WHERE id = %s"
+            result = self.db.execute_query(query, (strawberry_id,), fetch_one=True, dictionary=False)
+            return Strawberry.from_row(result, STRAWBERRY_FIELDS) if result else None  # type: ignore
         except Exception as e:
             logger.error(f"获取草莓信息失败: {e}")
             return None
     
-    def get_strawberry_by_qr_code(self, qr_code: str) -> Optional[Dict]:
+    def get_strawberry_by_qr_code(self, qr_code: str) -> Optional[Strawberry]:
         """根据二维码获取草莓信息"""
         try:
-            query = "SELECT * FROM strawberries WHERE qr_code = %s"
-            result = self.db.execute_query(query, (qr_code,), fetch_one=True)  # type: ignore
-            return result if result else None  # type: ignore
+            query = f"SELECT {_STRAWBERRY_COLUMNS} FROM strawberries WHERE qr_code = %s"
+            result = self.db.execute_query(query, (qr_code,), fetch_one=True, dictionary=False)
+            return Strawberry.from_row(result, STRAWBERRY_FIELDS) if result else None  # type: ignore
         except Exception as e:
             logger.error(f"根据二维码获取草莓信息失败: {e}")
             return None
     
-    def get_all_strawberries(self, status: Optional[str] = None) -> List[Dict]:
+    def get_strawberries_by_ids(self, strawberry_ids: Iterable[int]) -> Dict[int, Strawberry]:
+        """
+        批量获取草莓信息
+        
+        Args:
+            strawberry_ids: 草莓ID列表
+        
+        Returns:
+            以草莓ID为键的字典，不存在的ID不在结果中
+        """
+        try:
+            result = {}
+            for chunk in _chunked(_unique(strawberry_ids), Config.DB_IN_CHUNK_SIZE):
+                placeholders = ', '.join(['%s'] * len(chunk))
+                query = f"SELECT {_STRAWBERRY_COLUMNS} FROM strawberries WHERE id IN ({placeholders})"
+                rows = self.db.execute_query(query, tuple(chunk), dictionary=False)
+                for strawberry in Strawberry.from_rows(rows, STRAWBERRY_FIELDS):  # type: ignore
+                    result[strawberry.id] = strawberry
+            return result
+        except Exception as e:
+            logger.error(f"批量获取草莓信息失败: {e}")
+            return {}
+    
+    def get_strawberries_by_qr_codes(self, qr_codes: Iterable[str]) -> Dict[str, Strawberry]:
+        """
+        根据二维码批量获取草莓信息
+        
+        Args:
+            qr_codes: 二维码内容列表
+        
+        Returns:
+            以二维码内容为键的字典，未匹配的二维码不在结果中
+        """
+        try:
+            result = {}
+            for chunk in _chunked(_unique(qr_codes), Config.DB_IN_CHUNK_SIZE):
+                placeholders = ', '.join(['%s'] * len(chunk))
+                query = f"SELECT {_STRAWBERRY_COLUMNS} FROM strawberries WHERE qr_code IN ({placeholders})"
+                rows = self.db.execute_query(query, tuple(chunk), dictionary=False)
+                for strawberry in Strawberry.from_rows(rows, STRAWBERRY_FIELDS):  # type: ignore
+                    result[strawberry.qr_code] = strawberry
+            return result
+        except Exception as e:
+            logger.error(f"根据二维码批量获取草莓信息失败: {e}")
+            return {}
+    
+    def get_all_strawberries(self, status: Optional[str] = None) -> List[Strawberry]:
         """获取所有草莓信息"""
         try:
-            if status:
-                query = "SELECT * FROM strawberries WHERE status = %s ORDER BY created_at DESC"
-                result = self.db.execute_query(query, (status,))  # type: ignore
-                return result if result else []  # type: ignore
-            else:
-                query = "SELECT * FROM strawberries ORDER BY created_at DESC"
-                result = self.db.execute_query(query)  # type: ignore
-                return result if result else []  # type: ignore
+            return list(self.iter_strawberries(status))
         except Exception as e:
             logger.error(f"获取草莓列表失败: {e}")
             return []
     
+    def iter_strawberries(self, status: Optional[str] = None) -> Iterator[Strawberry]:
+        """流式遍历草莓信息（按创建时间倒序），适用于大批量处理"""
+        if status:
+            query = f"SELECT {_STRAWBERRY_COLUMNS} FROM strawberries WHERE status = %s ORDER BY created_at DESC"
+            rows = self.db.iter_query(query, (status,), dictionary=False)
+        else:
+            query = f"SELECT {_STRAWBERRY_COLUMNS} FROM strawberries ORDER BY created_at DESC"
+            rows = self.db.iter_query(query, dictionary=False)
+        return Strawberry.from_rows(rows, STRAWBERRY_FIELDS)  # type: ignore
+    
     def update_strawberry_status(self, strawberry_id: int, status: str) -> bool:
         """更新草莓状态"""
         try:
-            query = "UPDATE strawberries SET status = %s WHERE id = %s"
-            affected_rows = self.db.execute_update(query, (status, strawberry_id))
+            with self.db.transaction():
+                current = self.db.execute_query(
+                    f"SELECT status FROM strawberries WHERE id = %s{self.db.backend.for_update}",
+                    (strawberry_id,), fetch_one=True
+                )
+                if not current:
+                    return False
+                query = "UPDATE strawberries SET status = %s WHERE id = %s"
+                affected_rows = self.db.execute_update(query, (status, strawberry_id))
+                if current['status'] != status:  # type: ignore
+                    self._apply_counter_deltas({f"status:{current['status']}": -1, f"status:{status}": 1})  # type: ignore
+                self._invalidate_cache([strawberry_id])
             return affected_rows > 0
         except Exception as e:
             logger.error(f"更新草莓状态失败: {e}")
@@ -90,6 +396,7 @@ class StrawberryDAO:
         try:
             query = "UPDATE strawberries SET qr_code_path = %s WHERE id = %s"
             affected_rows = self.db.execute_update(query, (qr_code_path, strawberry_id))
+            self._invalidate_cache([strawberry_id])
             logger.info(f"更新草莓二维码路径成功，ID: {strawberry_id}, 新路径: {qr_code_path}")
             return affected_rows > 0
         except Exception as e:
@@ -99,7 +406,8 @@ class StrawberryDAO:
     def add_growth_record(self, strawberry_id: int, image_path: str, 
                          ai_description: Optional[str] = None, growth_stage: Optional[str] = None,
                          health_status: str = 'healthy', size_estimate: Optional[str] = None,
-                         color_description: Optional[str] = None, recorded_at: Optional[datetime] = None) -> Optional[int]:
+                         color_description: Optional[str] = None, recorded_at: Optional[datetime] = None,
+                         image_metadata: Optional[Dict] = None) -> Optional[int]:
         """
         添加生长记录
         
@@ -112,45 +420,340 @@ class StrawberryDAO:
             size_estimate: 大小估计
             color_description: 颜色描述
             recorded_at: 记录时间
+            image_metadata: 保存图片时读取的元数据（IMAGE_METADATA_FIELDS 中的字段）
         
         Returns:
             记录ID，失败返回None
         """
         try:
-            if recorded_at is None:
-                recorded_at = datetime.now()
-            
-            query = """
-                INSERT INTO strawberry_records 
-                (strawberry_id, image_path, ai_description, growth_stage, 
-                 health_status, size_estimate, color_description, recorded_at)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """
-            record_id = self.db.execute_insert(query, (
-                strawberry_id, image_path, ai_description, growth_stage,
-                health_status, size_estimate, color_description, recorded_at
-            ))
+            record = dict(image_metadata or {}, strawberry_id=strawberry_id, image_path=image_path,
+                          ai_description=ai_description, growth_stage=growth_stage,
+                          health_status=health_status, size_estimate=size_estimate,
+                          color_description=color_description, recorded_at=recorded_at)
+            # 插入记录与更新草莓上的最新记录字段在同一事务中完成
+            with self.db.transaction():
+                record_id = self.db.execute_insert(
+                    f"{_GROWTH_RECORD_INSERT} {_GROWTH_RECORD_ROW}", self._growth_record_params(record)
+                )
+                self.refresh_latest_records([strawberry_id])
             logger.info(f"成功添加生长记录，ID: {record_id}")
             return record_id
         except Exception as e:
             logger.error(f"添加生长记录失败: {e}")
             return None
     
-    def get_strawberry_records(self, strawberry_id: int, limit: int = 10) -> List[Dict]:
-        """获取草莓的生长记录"""
+    def add_growth_records_bulk(self, records: List[Dict], batch_size: Optional[int] = None) -> Dict:
+        """
+        批量添加生长记录
+        
+        所有行在同一事务中以多行 INSERT 分批写入，只提交一次；某一批写入失败时
+        回滚到保存点后逐行重试，以定位出错的行，其余行照常写入。
+        超出保留数量的旧记录由清理任务（modules/retention.py）异步删除。
+        
+        Args:
+            records: 记录列表，每项字段同 add_growth_record 的参数，图片元数据直接作为记录的字段
+                     （strawberry_id、image_path 必填）
+            batch_size: 每条 INSERT 语句的行数，默认 Config.DB_BULK_INSERT_SIZE
+        
+        Returns:
+            {'ids': 与输入顺序对应的记录ID列表（失败为None）,
+             'failed': [{'index': 输入下标, 'error': 失败原因}]}
+        """
+        ids: List[Optional[int]] = [None] * len(records)
+        failed: List[Dict] = []
+        if not records:
+            return {'ids': ids, 'failed': failed}
+        
         try:
-            query = """
-                SELECT * FROM strawberry_records 
+            with self.db.transaction():
+                existing = self.get_strawberries_by_ids(record.get('strawberry_id') for record in records)
+                
+                rows = []
+                for index, record in enumerate(records):
+                    if record.get('strawberry_id') not in existing:
+                        failed.append({'index': index, 'error': f"草莓不存在，ID: {record.get('strawberry_id')}"})
+                    elif not record.get('image_path'):
+                        failed.append({'index': index, 'error': '缺少图片路径'})
+                    else:
+                        rows.append((index, self._growth_record_params(record)))
+                
+                for chunk in _chunked(rows, batch_size or Config.DB_BULK_INSERT_SIZE):
+                    self._insert_growth_record_chunk(chunk, ids, failed)
+                
+                inserted_ids = {records[index]['strawberry_id'] for index, _ in rows if ids[index]}
+                self.refresh_latest_records(inserted_ids)
+            
+            failed.sort(key=lambda item: item['index'])
+            logger.info(f"批量添加生长记录完成，成功 {len(records) - len(failed)} 条，失败 {len(failed)} 条")
+        except Exception as e:
+            logger.error(f"批量添加生长记录失败: {e}")
+            ids = [None] * len(records)
+            failed = [{'index': index, 'error': str(e)} for index in range(len(records))]
+        
+        return {'ids': ids, 'failed': failed}
+    
+    @staticmethod
+    def _growth_record_params(record: Dict) -> Tuple:
+        """把记录字典转换为插入参数"""
+        return (
+            record['strawberry_id'], record['image_path'], record.get('ai_description'),
+            record.get('growth_stage'), record.get('health_status') or 'healthy',
+            record.get('size_estimate'), record.get('color_description'),
+            # 与列默认值 CURRENT_TIMESTAMP 一致精确到秒
+            record.get('recorded_at') or datetime.now().replace(microsecond=0)
+        ) + tuple(record.get(field) for field in IMAGE_METADATA_FIELDS)
+    
+    def _insert_growth_record_chunk(self, chunk: Sequence[Tuple[int, Tuple]], ids: List[Optional[int]],
+                                    failed: List[Dict]):
+        """写入一批记录，整批失败时逐行重试并记录失败的行"""
+        try:
+            with self.db.savepoint('bulk_records'):
+                new_ids = self.db.execute_insert_rows(
+                    _GROWTH_RECORD_INSERT, _GROWTH_RECORD_ROW, [params for _, params in chunk]
+                )
+            for (index, _), record_id in zip(chunk, new_ids):
+                ids[index] = record_id
+        except Exception as e:
+            logger.warning(f"批量写入 {len(chunk)} 条记录失败，逐行重试: {e}")
+            for index, params in chunk:
+                try:
+                    with self.db.savepoint('bulk_record_row'):
+                        ids[index] = self.db.execute_insert(
+                            f"{_GROWTH_RECORD_INSERT} {_GROWTH_RECORD_ROW}", params
+                        )
+                except Exception as row_error:
+                    failed.append({'index': index, 'error': str(row_error)})
+    
+    def get_strawberry_ids_over_record_limit(self, keep: int, after_id: int = 0, limit: int = 200) -> List[int]:
+        """
+        按ID顺序分批查找记录数超过保留数量的草莓（基于 record_count 冗余字段）
+        
+        Args:
+            keep: 每颗草莓保留的记录数
+            after_id: 上一批最后一个草莓ID
+            limit: 每批数量
+        
+        Returns:
+            草莓ID列表
+        """
+        query = """
+            SELECT id FROM strawberries
+            WHERE id > %s AND record_count > %s
+            ORDER BY id
+            LIMIT %s
+        """
+        return [row['id'] for row in self.db.execute_query(query, (after_id, keep, limit))]  # type: ignore
+    
+    def get_excess_records(self, strawberry_ids: Iterable[int], keep: int) -> List[Dict]:
+        """
+        获取每颗草莓中超出保留数量的旧记录（按记录时间，保留最新的 keep 条）
+        
+        Args:
+            strawberry_ids: 草莓ID列表
+            keep: 每颗草莓保留的记录数
+        
+        Returns:
+            记录列表（id、strawberry_id、image_path、recorded_at）
+        """
+        records = []
+        for chunk in _chunked(_unique(strawberry_ids), Config.DB_IN_CHUNK_SIZE):
+            placeholders = ', '.join(['%s'] * len(chunk))
+            query = f"""
+                SELECT id, strawberry_id, image_path, recorded_at FROM (
+                    SELECT id, strawberry_id, image_path, recorded_at,
+                           ROW_NUMBER() OVER (PARTITION BY strawberry_id ORDER BY recorded_at DESC, id DESC) AS rn
+                    FROM strawberry_records
+                    WHERE strawberry_id IN ({placeholders})
+                ) ranked
+                WHERE rn > %s
+                ORDER BY strawberry_id, recorded_at
+            """
+            records.extend(self.db.execute_query(query, tuple(chunk) + (keep,)))  # type: ignore
+        return records
+    
+    def delete_records_by_ids(self, record_ids: Iterable[int]) -> int:
+        """
+        按ID批量删除记录（不更新最新记录字段，调用方需在同一事务中调用 refresh_latest_records）
+        
+        Returns:
+            删除的记录数
+        """
+        deleted = 0
+        for chunk in _chunked(_unique(record_ids), Config.DB_IN_CHUNK_SIZE):
+            placeholders = ', '.join(['%s'] * len(chunk))
+            deleted += self.db.execute_delete(
+                f"DELETE FROM strawberry_records WHERE id IN ({placeholders})", tuple(chunk)
+            )
+        return deleted
+    
+    def refresh_latest_records(self, strawberry_ids: Iterable[int]) -> int:
+        """
+        根据记录表重新计算草莓上的最新记录字段和记录数量
+        
+        写入或删除记录后在同一事务中调用；按记录时间（相同时取ID较大者）确定最新记录。
+        比较更新前后的字段，把记录数和最新生长阶段/健康状态的变化计入统计计数器。
+        
+        Args:
+            strawberry_ids: 需要更新的草莓ID
+        
+        Returns:
+            更新的草莓数
+        """
+        updated = 0
+        latest = """
+            SELECT r.{column} FROM strawberry_records r
+            WHERE r.strawberry_id = strawberries.id
+            ORDER BY r.recorded_at DESC, r.id DESC
+            LIMIT 1
+        """
+        update = f"""
+            UPDATE strawberries SET
+                latest_record_id = ({latest.format(column='id')}),
+                latest_growth_stage = ({latest.format(column='growth_stage')}),
+                latest_health_status = ({latest.format(column='health_status')}),
+                latest_recorded_at = ({latest.format(column='recorded_at')}),
+                record_count = (
+                    SELECT COUNT(*) FROM strawberry_records r
+                    WHERE r.strawberry_id = strawberries.id
+                )
+            WHERE id IN ({{placeholders}})
+        """
+        state = f"""
+            SELECT latest_record_id, latest_growth_stage, latest_health_status, record_count
+            FROM strawberries WHERE id IN ({{placeholders}}){self.db.backend.for_update}
+        """
+        with self.db.transaction():
+            for chunk in _chunked(_unique(strawberry_ids), Config.DB_IN_CHUNK_SIZE):
+                params = tuple(chunk)
+                placeholders = ', '.join(['%s'] * len(chunk))
+                deltas = Counter()
+                for row in self.db.execute_query(state.format(placeholders=placeholders), params):
+                    deltas.update(_latest_counter_deltas(row, -1))  # type: ignore
+                updated += self.db.execute_update(update.format(placeholders=placeholders), params)
+                for row in self.db.execute_query(state.format(placeholders=placeholders), params):
+                    deltas.update(_latest_counter_deltas(row, 1))  # type: ignore
+                self._apply_counter_deltas(deltas)
+                self._invalidate_cache(chunk)
+        return updated
+    
+    def backfill_latest_records(self, batch_size: int = 1000) -> int:
+        """
+        按ID分批回填所有草莓的最新记录字段
+        
+        Args:
+            batch_size: 每批处理的草莓数
+        
+        Returns:
+            处理的草莓数
+        """
+        total = 0
+        last_id = 0
+        while True:
+            rows = self.db.execute_query(
+                "SELECT id FROM strawberries WHERE id > %s ORDER BY id LIMIT %s",
+                (last_id, batch_size)
+            )
+            if not rows:
+                break
+            ids = [row['id'] for row in rows]  # type: ignore
+            # 每批单独提交，避免长事务
+            with self.db.transaction():
+                self.refresh_latest_records(ids)
+            total += len(ids)
+            last_id = ids[-1]
+            logger.info(f"已回填 {total} 颗草莓的最新记录字段")
+        return total
+    
+    def get_records_missing_image_metadata(self, after_id: int = 0, limit: int = 200) -> List[Dict]:
+        """
+        按ID顺序分批查找尚未保存图片元数据的记录
+        
+        Args:
+            after_id: 上一批最后一条记录的ID
+            limit: 每批数量
+        
+        Returns:
+            记录列表（id、strawberry_id、image_path）
+        """
+        query = """
+            SELECT id, strawberry_id, image_path FROM strawberry_records
+            WHERE id > %s AND image_width IS NULL
+            ORDER BY id
+            LIMIT %s
+        """
+        return self.db.execute_query(query, (after_id, limit))  # type: ignore
+    
+    def update_image_metadata(self, records: List[Dict]) -> int:
+        """
+        批量写入记录的图片元数据
+        
+        Args:
+            records: 每项包含 id、strawberry_id 以及 IMAGE_METADATA_FIELDS 中的字段
+        
+        Returns:
+            更新的记录数
+        """
+        if not records:
+            return 0
+        assignments = ', '.join(f"{field} = %s" for field in IMAGE_METADATA_FIELDS)
+        params = [tuple(record.get(field) for field in IMAGE_METADATA_FIELDS) + (record['id'],)
+                  for record in records]
+        with self.db.transaction():
+            self.db.execute_many(f"UPDATE strawberry_records SET {assignments} WHERE id = %s", params)
+            self._invalidate_cache({record['strawberry_id'] for record in records})
+        return len(records)
+    
+    def get_strawberry_records(self, strawberry_id: int, limit: int = 10, fields: str = 'full') -> List[GrowthRecord]:
+        """获取草莓的生长记录（fields 为 summary 时不读取AI描述）"""
+        try:
+            query = f"""
+                SELECT {_select_list(RECORD_FIELDS, fields)} FROM strawberry_records 
                 WHERE strawberry_id = %s 
                 ORDER BY recorded_at DESC 
                 LIMIT %s
             """
-            result = self.db.execute_query(query, (strawberry_id, limit))  # type: ignore
-            return result if result else []  # type: ignore
+            rows = self.db.execute_query(query, (strawberry_id, limit), dictionary=False)
+            return list(GrowthRecord.from_rows(rows, RECORD_FIELDS[fields]))  # type: ignore
         except Exception as e:
             logger.error(f"获取生长记录失败: {e}")
             return []
     
+    def get_records_for_strawberries(self, strawberry_ids: Iterable[int], limit: int = 10,
+                                     fields: str = 'full') -> Dict[int, List[GrowthRecord]]:
+        """
+        批量获取多颗草莓的生长记录
+        
+        Args:
+            strawberry_ids: 草莓ID列表
+            limit: 每颗草莓最多返回的记录数
+            fields: 字段集，summary 或 full
+        
+        Returns:
+            以草莓ID为键的字典，值为按记录时间倒序的记录列表；没有记录的草莓对应空列表
+        """
+        try:
+            ids = _unique(strawberry_ids)
+            result: Dict[int, List[GrowthRecord]] = {strawberry_id: [] for strawberry_id in ids}
+            for chunk in _chunked(ids, Config.DB_IN_CHUNK_SIZE):
+                placeholders = ', '.join(['%s'] * len(chunk))
+                query = f"""
+                    SELECT {_select_list(RECORD_FIELDS, fields)} FROM (
+                        SELECT {_select_list(RECORD_FIELDS, fields, 'sr')},
+                               ROW_NUMBER() OVER (PARTITION BY strawberry_id ORDER BY recorded_at DESC) AS rn
+                        FROM strawberry_records sr
+                        WHERE strawberry_id IN ({placeholders})
+                    ) ranked
+                    WHERE rn <= %s
+                    ORDER BY strawberry_id, recorded_at DESC
+                """
+                rows = self.db.execute_query(query, tuple(chunk) + (limit,), dictionary=False)
+                for record in GrowthRecord.from_rows(rows, RECORD_FIELDS[fields]):  # type: ignore
+                    result.setdefault(record.strawberry_id, []).append(record)
+            return result
+        except Exception as e:
+            logger.error(f"批量获取生长记录失败: {e}")
+            return {}
+    
     def get_latest_record(self, strawberry_id: int) -> Optional[Dict]:
         """获取草莓的最新记录"""
         try:
@@ -166,36 +769,277 @@ class StrawberryDAO:
             logger.error(f"获取最新记录失败: {e}")
             return None
     
-    def get_strawberry_with_latest_record(self, strawberry_id: Optional[int] = None) -> List[Dict]:
+    def get_strawberry_with_latest_record(self, strawberry_id: Optional[int] = None,
+                                          fields: str = 'full') -> List[LatestSummary]:
         """获取草莓及其最新记录"""
         try:
             if strawberry_id:
-                query = "SELECT * FROM strawberry_latest_view WHERE id = %s"
-                result = self.db.execute_query(query, (strawberry_id,))  # type: ignore
-                return result if result else []  # type: ignore
+                query = f"SELECT {_latest_select_list(fields)} FROM {_LATEST_FROM} WHERE s.id = %s"
+                rows = self.db.execute_query(query, (strawberry_id,), dictionary=False)
+                return list(LatestSummary.from_rows(rows, LATEST_VIEW_FIELDS[fields]))  # type: ignore
             else:
-                query = "SELECT * FROM strawberry_latest_view ORDER BY strawberry_created_at DESC"
-                result = self.db.execute_query(query)  # type: ignore
-                return result if result else []  # type: ignore
+                return list(self.iter_strawberries_with_latest_record(fields=fields))
         except Exception as e:
             logger.error(f"获取草莓和最新记录失败: {e}")
             return []
     
+    def iter_strawberries_with_latest_record(self, status: Optional[str] = None,
+                                             fields: str = 'full') -> Iterator[LatestSummary]:
+        """流式遍历草莓及其最新记录（按创建时间倒序）"""
+        columns = _latest_select_list(fields)
+        if status:
+            query = f"""
+                SELECT {columns} FROM {_LATEST_FROM}
+                WHERE s.status = %s
+                ORDER BY s.created_at DESC, s.id DESC
+            """
+            rows = self.db.iter_query(query, (status,), dictionary=False)
+        else:
+            query = f"SELECT {columns} FROM {_LATEST_FROM} ORDER BY s.created_at DESC, s.id DESC"
+            rows = self.db.iter_query(query, dictionary=False)
+        return LatestSummary.from_rows(rows, LATEST_VIEW_FIELDS[fields])  # type: ignore
+    
+    def get_strawberry_page(self, status: Optional[str] = None, after: Optional[Tuple[datetime, int]] = None,
+                            limit: int = 50, fields: str = 'summary') -> List[LatestSummary]:
+        """
+        按 (创建时间, ID) 倒序的游标分页获取草莓及其最新记录
+        
+        只扫描一页的草莓行，最新记录来自冗余字段并按主键关联，
+        每页的开销与草莓总数无关。返回的字段与 strawberry_latest_view 一致。
+        
+        Args:
+            status: 草莓状态过滤
+            after: 上一页最后一行的 (strawberry_created_at, id)，为None时从第一页开始
+            limit: 每页数量
+            fields: 字段集，summary 不含最新记录的AI描述，full 为全部字段
+        
+        Returns:
+            草莓列表
+        """
+        try:
+            conditions = []
+            params: List = []
+            if status:
+                conditions.append("s.status = %s")
+                params.append(status)
+            if after:
+                created_at, last_id = after
+                conditions.append("(s.created_at < %s OR (s.created_at = %s AND s.id < %s))")
+                params.extend([created_at, created_at, last_id])
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+            query = f"""
+                SELECT {_latest_select_list(fields)}
+                FROM {_LATEST_FROM}
+                {where}
+                ORDER BY s.created_at DESC, s.id DESC
+                LIMIT %s
+            """
+            params.append(limit)
+            rows = self.db.execute_query(query, tuple(params), dictionary=False)
+            return list(LatestSummary.from_rows(rows, LATEST_VIEW_FIELDS[fields]))  # type: ignore
+        except Exception as e:
+            logger.error(f"分页获取草莓列表失败: {e}")
+            return []
+    
+    def iter_export_rows(self, status: Optional[str] = None, created_from: Optional[datetime] = None,
+                         created_before: Optional[datetime] = None, qr_prefix: Optional[str] = None,
+                         strawberry_ids: Optional[Sequence[int]] = None) -> Iterator[Tuple]:
+        """
+        流式读取批量导出的数据（非缓冲游标，内存占用与数据量无关）
+        
+        每行为 STRAWBERRY_FIELDS 加上一条记录的 EXPORT_RECORD_FIELDS，按草莓ID、记录时间排序，
+        同一颗草莓的记录相邻；没有记录的草莓输出一行，记录字段为空。
+        
+        Args:
+            status: 草莓状态
+            created_from: 创建时间下限（含）
+            created_before: 创建时间上限（不含）
+            qr_prefix: 二维码前缀
+            strawberry_ids: 只导出这些草莓
+        """
+        conditions, params = _strawberry_conditions(status, created_from, created_before, qr_prefix, strawberry_ids)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        
+        query = f"""
+            SELECT {', '.join(f's.{field}' for field in STRAWBERRY_FIELDS)},
+                   {', '.join(f'r.{field}' for field in EXPORT_RECORD_FIELDS)}
+            FROM strawberries s
+            LEFT JOIN strawberry_records r ON r.strawberry_id = s.id
+            {where}
+            ORDER BY s.id, r.recorded_at, r.id
+        """
+        return self.db.iter_query(query, tuple(params), dictionary=False)  # type: ignore
+    
+    def iter_record_files(self) -> Iterator[Tuple]:
+        """流式遍历所有观察记录引用的文件，产出 (id, strawberry_id, image_path, thumbnail_path)"""
+        query = """
+            SELECT id, strawberry_id, image_path, thumbnail_path FROM strawberry_records
+            WHERE image_path IS NOT NULL OR thumbnail_path IS NOT NULL
+        """
+        return self.db.iter_query(query, dictionary=False)  # type: ignore
+    
+    def iter_qr_code_paths(self) -> Iterator[Tuple]:
+        """流式遍历所有草莓的二维码图片路径，产出 (id, qr_code_path)"""
+        query = "SELECT id, qr_code_path FROM strawberries WHERE qr_code_path IS NOT NULL"
+        return self.db.iter_query(query, dictionary=False)  # type: ignore
+    
+    def update_thumbnail_paths(self, records: List[Dict]) -> int:
+        """
+        批量更新记录的缩略图路径
+        
+        Args:
+            records: 每项包含 id、strawberry_id、thumbnail_path
+        
+        Returns:
+            更新的记录数
+        """
+        if not records:
+            return 0
+        params = [(record['thumbnail_path'], record['id']) for record in records]
+        with self.db.transaction():
+            self.db.execute_many("UPDATE strawberry_records SET thumbnail_path = %s WHERE id = %s", params)
+            self._invalidate_cache({record['strawberry_id'] for record in records})
+        return len(records)
+    
     def delete_strawberry(self, strawberry_id: int) -> bool:
         """删除草莓（会级联删除相关记录）"""
         try:
-            query = "DELETE FROM strawberries WHERE id = %s"
-            affected_rows = self.db.execute_delete(query, (strawberry_id,))
+            # 删除草莓（及级联删除的记录）与扣减统计计数器在同一事务中完成
+            with self.db.transaction():
+                row = self.db.execute_query(f"""
+                    SELECT qr_code, status, created_at, latest_record_id, latest_growth_stage,
+                           latest_health_status, record_count
+                    FROM strawberries WHERE id = %s{self.db.backend.for_update}
+                """, (strawberry_id,), fetch_one=True)
+                if not row:
+                    return False
+                query = "DELETE FROM strawberries WHERE id = %s"
+                affected_rows = self.db.execute_delete(query, (strawberry_id,))
+                deltas = _latest_counter_deltas(row, -1)  # type: ignore
+                deltas.update({
+                    'strawberries': -1,
+                    f"status:{row['status']}": -1,  # type: ignore
+                    _day_key(row['created_at']): -1  # type: ignore
+                })
+                self._apply_counter_deltas(deltas)
+                self._invalidate_cache([strawberry_id], [row['qr_code']])  # type: ignore
             return affected_rows > 0
         except Exception as e:
             logger.error(f"删除草莓失败: {e}")
             return False
             
+    def get_strawberry_id_batch(self, after_id: int = 0, limit: int = 500, status: Optional[str] = None,
+                                created_from: Optional[datetime] = None, created_before: Optional[datetime] = None,
+                                qr_prefix: Optional[str] = None,
+                                strawberry_ids: Optional[Sequence[int]] = None) -> List[int]:
+        """
+        按ID顺序分批查找符合筛选条件的草莓ID（筛选参数同 iter_export_rows）
+        
+        Args:
+            after_id: 上一批最后一个草莓ID
+            limit: 每批数量
+        """
+        conditions, params = _strawberry_conditions(status, created_from, created_before, qr_prefix, strawberry_ids)
+        conditions.append("s.id > %s")
+        params.append(after_id)
+        query = f"""
+            SELECT s.id FROM strawberries s
+            WHERE {' AND '.join(conditions)}
+            ORDER BY s.id
+            LIMIT %s
+        """
+        rows = self.db.execute_query(query, tuple(params) + (limit,), dictionary=False)
+        return [row[0] for row in rows or []]
+    
+    def update_strawberries_status(self, strawberry_ids: Iterable[int], status: str) -> int:
+        """
+        批量更新草莓状态（一条 UPDATE 语句，统计计数器在同一事务中调整）
+        
+        Args:
+            strawberry_ids: 草莓ID（数量不超过 Config.DB_IN_CHUNK_SIZE）
+            status: 新状态
+        
+        Returns:
+            状态发生变化的草莓数
+        """
+        ids = _unique(strawberry_ids)
+        if not ids:
+            return 0
+        with self.db.transaction():
+            rows = self.db.execute_query(f"""
+                SELECT id, status FROM strawberries
+                WHERE id IN ({', '.join(['%s'] * len(ids))}) AND status <> %s{self.db.backend.for_update}
+            """, tuple(ids) + (status,))
+            if not rows:
+                return 0
+            changed = [row['id'] for row in rows]  # type: ignore
+            affected_rows = self.db.execute_update(
+                f"UPDATE strawberries SET status = %s WHERE id IN ({', '.join(['%s'] * len(changed))})",
+                (status, *changed)
+            )
+            deltas = Counter({f"status:{status}": len(changed)})
+            deltas.subtract(f"status:{row['status']}" for row in rows)  # type: ignore
+            self._apply_counter_deltas(deltas)
+            self._invalidate_cache(changed)
+        return affected_rows
+    
+    def delete_strawberries(self, strawberry_ids: Iterable[int]) -> Dict:
+        """
+        批量删除草莓（记录级联删除，一条 DELETE 语句，统计计数器在同一事务中扣减）
+        
+        文件不在事务中删除，调用方在提交后按返回的路径清理。
+        
+        Args:
+            strawberry_ids: 草莓ID（数量不超过 Config.DB_IN_CHUNK_SIZE）
+        
+        Returns:
+            {'deleted': 删除的草莓数, 'image_paths': 记录图片路径, 'qr_code_paths': 二维码图片路径}
+        """
+        result = {'deleted': 0, 'image_paths': [], 'qr_code_paths': []}
+        ids = _unique(strawberry_ids)
+        if not ids:
+            return result
+        with self.db.transaction():
+            rows = self.db.execute_query(f"""
+                SELECT id, qr_code, qr_code_path, status, created_at, latest_record_id, latest_growth_stage,
+                       latest_health_status, record_count
+                FROM strawberries WHERE id IN ({', '.join(['%s'] * len(ids))}){self.db.backend.for_update}
+            """, tuple(ids))
+            if not rows:
+                return result
+            found = [row['id'] for row in rows]  # type: ignore
+            placeholders = ', '.join(['%s'] * len(found))
+            images = self.db.execute_query(f"""
+                SELECT image_path FROM strawberry_records
+                WHERE strawberry_id IN ({placeholders}) AND image_path IS NOT NULL
+            """, tuple(found), dictionary=False)
+            result['deleted'] = self.db.execute_delete(
+                f"DELETE FROM strawberries WHERE id IN ({placeholders})", tuple(found)
+            )
+            
+            deltas = Counter()
+            for row in rows:  # type: ignore
+                deltas.update(_latest_counter_deltas(row, -1))
+                deltas.subtract(['strawberries', f"status:{row['status']}", _day_key(row['created_at'])])
+            self._apply_counter_deltas(deltas)
+            self._invalidate_cache(found, [row['qr_code'] for row in rows])  # type: ignore
+        result['image_paths'] = [row[0] for row in images or []]
+        result['qr_code_paths'] = [row['qr_code_path'] for row in rows if row['qr_code_path']]  # type: ignore
+        return result
+    
     def delete_record(self, record_id: int) -> bool:
         """删除单条观察记录"""
         try:
-            query = "DELETE FROM strawberry_records WHERE id = %s"
-            affected_rows = self.db.execute_delete(query, (record_id,))
+            # 删除记录与更新草莓上的最新记录字段在同一事务中完成
+            with self.db.transaction():
+                record = self.db.execute_query(
+                    "SELECT strawberry_id FROM strawberry_records WHERE id = %s", (record_id,), fetch_one=True
+                )
+                if not record:
+                    return False
+                query = "DELETE FROM strawberry_records WHERE id = %s"
+                affected_rows = self.db.execute_delete(query, (record_id,))
+                self.refresh_latest_records([record['strawberry_id']])  # type: ignore
             return affected_rows > 0
         except Exception as e:
             logger.error(f"删除记录失败: {e}")
@@ -211,34 +1055,158 @@ class StrawberryDAO:
             logger.error(f"获取记录失败: {e}")
             return None
     
-    def get_statistics(self) -> Dict:
-        """获取统计信息"""
-        try:
-            stats = {}
+    def _invalidate_cache(self, strawberry_ids: Iterable[int], qr_codes: Iterable[str] = ()):
+        """事务提交后失效扫码查询缓存中的草莓完整信息（二维码不变，只在删除草莓时失效）"""
+        keys = [strawberry_key(strawberry_id) for strawberry_id in strawberry_ids]
+        keys.extend(qr_key(qr_code) for qr_code in qr_codes)
+        if keys:
+            self.db.after_commit(lambda: strawberry_cache.invalidate(*keys))
+    
+    def _apply_counter_deltas(self, deltas: Dict[str, int]):
+        """
+        累加统计计数器（须在写入数据的同一事务中调用）
+        
+        按名称排序加锁，避免并发事务以不同顺序更新同一组计数器时死锁。
+        """
+        params = [(name, delta) for name, delta in sorted(deltas.items()) if delta]
+        if params:
+            query = self.db.backend.upsert_add(COUNTERS_TABLE, 'name', 'value')
+            self.db.execute_many(query, params)
+    
+    def reconcile_counters(self) -> Dict[str, int]:
+        """
+        根据草莓表和记录表重新计算全部统计计数器，并覆盖原有的计数器
+        
+        Returns:
+            重新计算后的计数器
+        """
+        counters = Counter()
+        with self.db.transaction():
+            for row in self.db.execute_query(
+                "SELECT status, COUNT(*) as count FROM strawberries GROUP BY status"
+            ):
+                counters['strawberries'] += row['count']  # type: ignore
+                counters[f"status:{row['status']}"] += row['count']  # type: ignore
             
-            # 草莓总数
-            result = self.db.execute_query(
-                "SELECT COUNT(*) as total FROM strawberries", 
-                fetch_one=True
+            for row in self.db.execute_query(
+                "SELECT DATE(created_at) as day, COUNT(*) as count FROM strawberries GROUP BY DATE(created_at)"
+            ):
+                counters[_day_key(row['day'])] += row['count']  # type: ignore
+            
+            total = self.db.execute_query(
+                "SELECT COUNT(*) as count FROM strawberry_records", fetch_one=True
             )
-            stats['total_strawberries'] = result['total'] if result else 0  # type: ignore
+            counters['records'] = total['count'] if total else 0  # type: ignore
             
-            # 各状态草莓数量
-            status_result = self.db.execute_query("""
-                SELECT status, COUNT(*) as count 
-                FROM strawberries 
-                GROUP BY status
-            """)
-            stats['status_counts'] = {row['status']: row['count'] for row in status_result}  # type: ignore
+            for column, prefix in (('latest_growth_stage', 'stage'), ('latest_health_status', 'health')):
+                for row in self.db.execute_query(f"""
+                    SELECT {column} as value, COUNT(*) as count FROM strawberries
+                    WHERE latest_record_id IS NOT NULL AND {column} IS NOT NULL
+                    GROUP BY {column}
+                """):
+                    counters[f"{prefix}:{row['value']}"] += row['count']  # type: ignore
             
-            # 记录总数
-            record_result = self.db.execute_query(
-                "SELECT COUNT(*) as total FROM strawberry_records", 
-                fetch_one=True
+            self.db.execute_delete(f"DELETE FROM {COUNTERS_TABLE}")
+            self.db.execute_many(
+                f"INSERT INTO {COUNTERS_TABLE} (name, value) VALUES (%s, %s)",
+                [(name, int(value)) for name, value in sorted(counters.items())]
+            )
+        logger.info(f"统计计数器已重建，共 {len(counters)} 项")
+        return dict(counters)
+    
+    def get_counters(self, since: Optional[date] = None) -> Dict[str, int]:
+        """
+        读取统计计数器
+        
+        Args:
+            since: 只读取该日期及之后的创建日期计数器，避免随运行天数增长；为None时读取全部
+        """
+        if since is None:
+            rows = self.db.execute_query(f"SELECT name, value FROM {COUNTERS_TABLE}")
+        else:
+            # 其余计数器名称都排在 created: 前缀区间之外（'created:' 之前或日期之后）
+            rows = self.db.execute_query(
+                f"SELECT name, value FROM {COUNTERS_TABLE} WHERE name < %s OR name >= %s",
+                (_CREATED_PREFIX, _day_key(since))
             )
-            stats['total_records'] = record_result['total'] if record_result else 0  # type: ignore
+        return {row['name']: int(row['value']) for row in rows}  # type: ignore
+    
+    def get_created_counts(self, start: date, end: date) -> Dict[str, int]:
+        """
+        读取日期范围内每天新增且仍存在的草莓数（创建日期计数器）
+        
+        Args:
+            start: 开始日期（含）
+            end: 结束日期（含）
+        
+        Returns:
+            {'YYYY-MM-DD': 数量}，没有新增的日期不出现
+        """
+        rows = self.db.execute_query(
+            f"SELECT name, value FROM {COUNTERS_TABLE} WHERE name >= %s AND name <= %s",
+            (_day_key(start), _day_key(end))
+        )
+        return {row['name'][len(_CREATED_PREFIX):]: int(row['value'])  # type: ignore
+                for row in rows if int(row['value']) > 0}  # type: ignore
+    
+    def get_record_activity(self, start: datetime, end: datetime) -> List[Dict]:
+        """
+        按天聚合时间范围内的新增记录及生长阶段/健康状态变化（一次查询）
+        
+        每条记录与同一颗草莓的上一条记录（按记录时间，可早于开始时间）比较，
+        只对范围内有记录的草莓做窗口计算；已被清理任务删除的记录不参与统计。
+        
+        Args:
+            start: 开始时间（含）
+            end: 结束时间（不含）
+        
+        Returns:
+            [{'day', 'prev_stage', 'growth_stage', 'prev_health', 'health_status', 'count'}]
+        """
+        query = """
+            SELECT DATE(recorded_at) AS day, prev_stage, growth_stage, prev_health, health_status,
+                   COUNT(*) AS count
+            FROM (
+                SELECT recorded_at, growth_stage, health_status,
+                       LAG(growth_stage) OVER (PARTITION BY strawberry_id ORDER BY recorded_at, id) AS prev_stage,
+                       LAG(health_status) OVER (PARTITION BY strawberry_id ORDER BY recorded_at, id) AS prev_health
+                FROM strawberry_records
+                WHERE strawberry_id IN (
+                    SELECT DISTINCT strawberry_id FROM strawberry_records
+                    WHERE recorded_at >= %s AND recorded_at < %s
+                ) AND recorded_at < %s
+            ) activity
+            WHERE recorded_at >= %s
+            GROUP BY DATE(recorded_at), prev_stage, growth_stage, prev_health, health_status
+        """
+        return self.db.execute_query(query, (start, end, end, start))  # type: ignore
+    
+    def get_statistics(self) -> Dict:
+        """
+        获取统计信息
+        
+        读取增量维护的统计计数器，不扫描草莓表和记录表；计数器与数据不一致时
+        可执行 reconcile_counters 重建。
+        """
+        try:
+            today = date.today()
+            week_start = today - timedelta(days=today.weekday())
+            counters = self.get_counters(since=week_start)
+            
+            def grouped(prefix: str) -> Dict[str, int]:
+                return {name[len(prefix):]: value for name, value in counters.items()
+                        if name.startswith(prefix) and value > 0}
             
-            return stats
+            created = grouped(_CREATED_PREFIX)
+            return {
+                'status_counts': grouped('status:'),
+                'total_strawberries': counters.get('strawberries', 0),
+                'total_records': counters.get('records', 0),
+                'growth_stage_counts': grouped('stage:'),
+                'health_status_counts': grouped('health:'),
+                'today_new_strawberries': created.get(str(today), 0),
+                'week_new_strawberries': sum(created.values())
+            }
         except Exception as e:
             logger.error(f"获取统计信息失败: {e}")
             return {}
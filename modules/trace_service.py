@@ -4,12 +4,20 @@
 """
 import json
 import os
-from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Any
+import base64
+from collections.abc import Mapping
+from datetime import datetime
+from types import MappingProxyType
+from typing import List, Dict, Optional, Any, Tuple
 import logging
-from modules.strawberry_dao import strawberry_dao
+from config import Config
+from modules.strawberry_dao import strawberry_dao, FIELD_SETS, STRAWBERRY_STATUSES
 from modules.image_manager import image_manager
 from modules.qr_code import qr_manager
+from modules.cache import strawberry_cache, strawberry_key, qr_key
+from modules.models import RowModel, GrowthRecord, LatestSummary
+from modules.integrity import integrity_scanner
+from modules.jobs import job_registry, Job
 
 logger = logging.getLogger(__name__)
 
@@ -40,28 +48,35 @@ class StrawberryTraceService:
                 logger.error("生成二维码失败")
                 return None
             
-            # 创建草莓记录
-            strawberry_id = self.dao.create_strawberry(qr_content, qr_image_path, notes)
-            if not strawberry_id:
-                # 如果创建失败，清理已生成的二维码
-                self.qr_manager.delete_qr_code(qr_image_path)
-                logger.error("创建草莓记录失败")
-                return None
-            
-            # 重命名二维码文件，添加草莓ID
-            new_filename = f"qr_{qr_content}_id{strawberry_id}.png"
-            new_qr_path = os.path.join(os.path.dirname(qr_image_path), new_filename)
+            # 插入、更新二维码路径和回读在同一事务中完成，只提交一次
+            new_qr_path = None
             try:
-                os.rename(qr_image_path, new_qr_path)
-                # 更新数据库中的二维码路径
-                self.dao.update_qr_code_path(strawberry_id, new_qr_path)
-                qr_image_path = new_qr_path
-                logger.info(f"二维码文件已重命名: {new_qr_path}")
+                with self.dao.db.transaction():
+                    strawberry_id = self.dao.create_strawberry(qr_content, qr_image_path, notes)
+                    if not strawberry_id:
+                        raise Exception("创建草莓记录失败")
+                    
+                    # 重命名二维码文件，添加草莓ID
+                    new_filename = f"qr_{qr_content}_id{strawberry_id}.png"
+                    new_qr_path = os.path.join(os.path.dirname(qr_image_path), new_filename)
+                    try:
+                        os.rename(qr_image_path, new_qr_path)
+                    except Exception as e:
+                        logger.warning(f"重命名二维码文件失败: {e}")
+                        new_qr_path = None
+                    else:
+                        # 更新数据库中的二维码路径
+                        self.dao.update_qr_code_path(strawberry_id, new_qr_path)
+                        logger.info(f"二维码文件已重命名: {new_qr_path}")
+                    
+                    # 获取完整信息
+                    strawberry_info = self.dao.get_strawberry_by_id(strawberry_id)
             except Exception as e:
-                logger.warning(f"重命名二维码文件失败: {e}")
+                # 事务已回滚，清理已生成的二维码
+                self.qr_manager.delete_qr_code(new_qr_path or qr_image_path)
+                logger.error(f"创建草莓记录失败: {e}")
+                return None
             
-            # 获取完整信息
-            strawberry_info = self.dao.get_strawberry_by_id(strawberry_id)
             logger.info(f"成功创建草莓记录，ID: {strawberry_id}")
             return strawberry_info
             
@@ -88,6 +103,7 @@ class StrawberryTraceService:
         Returns:
             记录信息字典，失败返回None
         """
+        saved_image_path = None
         try:
             # 验证草莓是否存在
             strawberry = self.dao.get_strawberry_by_id(strawberry_id)
@@ -95,82 +111,117 @@ class StrawberryTraceService:
                 logger.error(f"草莓不存在，ID: {strawberry_id}")
                 return None
             
-            # 保存图片
-            saved_image_path = self.image_manager.save_image(image_path, strawberry_id)
-            if not saved_image_path:
+            # 保存图片并读取元数据（缩放、生成缩略图）在事务之外完成，不占用事务连接
+            image_metadata = self.image_manager.save_image_with_metadata(image_path, strawberry_id)
+            if not image_metadata:
                 logger.error("保存图片失败")
                 return None
+            saved_image_path = image_metadata['image_path']
             
-            # 添加记录
+            # 插入记录、刷新最新记录字段和统计计数器在 add_growth_record 的同一事务中完成
             record_id = self.dao.add_growth_record(
                 strawberry_id, saved_image_path, ai_description, 
-                growth_stage, health_status, size_estimate, color_description
+                growth_stage, health_status, size_estimate, color_description,
+                image_metadata=image_metadata
             )
-            
             if not record_id:
-                # 如果添加记录失败，清理已保存的图片
-                self.image_manager.delete_image(saved_image_path)
-                logger.error("添加观察记录失败")
-                return None
+                raise Exception("添加观察记录失败")
             
             # 获取完整记录信息
-            records = self.dao.get_strawberry_records(strawberry_id, 1)
-            if records:
-                logger.info(f"成功添加观察记录，ID: {record_id}")
-                return records[0]
+            record = self.dao.get_record_by_id(record_id)
             
-            return None
+            logger.info(f"成功添加观察记录，ID: {record_id}")
+            return record
             
         except Exception as e:
+            # 记录未写入（事务已回滚），清理已保存的图片
+            if saved_image_path:
+                self.image_manager.delete_image(saved_image_path)
             logger.error(f"添加观察记录失败: {e}")
             return None
     
-    def get_strawberry_full_info(self, strawberry_id: int) -> Optional[Dict]:
+    def add_observation_records_bulk(self, observations: List[Dict]) -> Dict:
+        """
+        批量添加观察记录（例如整垄拍摄后一次上传）
+        
+        Args:
+            observations: 观察列表，每项包含 strawberry_id、image_path（待保存的图片），
+                          以及可选的 ai_description、growth_stage、health_status、
+                          size_estimate、color_description、recorded_at
+        
+        Returns:
+            {'ids': 与输入顺序对应的记录ID列表（失败为None）,
+             'failed': [{'index': 输入下标, 'error': 失败原因}],
+             'created_count': 成功条数}
+        """
+        records = []
+        indexes = []
+        failed = []
+        for index, observation in enumerate(observations):
+            image_metadata = self.image_manager.save_image_with_metadata(
+                observation.get('image_path'), observation.get('strawberry_id')
+            ) if observation.get('image_path') else None
+            if not image_metadata:
+                failed.append({'index': index, 'error': '保存图片失败'})
+                continue
+            records.append(dict(observation, **image_metadata))
+            indexes.append(index)
+        
+        result = self.dao.add_growth_records_bulk(records)
+        
+        ids: List[Optional[int]] = [None] * len(observations)
+        for position, record_id in enumerate(result['ids']):
+            ids[indexes[position]] = record_id
+        for item in result['failed']:
+            # 未写入数据库的记录，清理已保存的图片
+            self.image_manager.delete_image(records[item['index']]['image_path'])
+            failed.append({'index': indexes[item['index']], 'error': item['error']})
+        failed.sort(key=lambda item: item['index'])
+        
+        created_count = len(observations) - len(failed)
+        logger.info(f"批量添加观察记录完成，成功 {created_count} 条，失败 {len(failed)} 条")
+        return {'ids': ids, 'failed': failed, 'created_count': created_count}
+    
+    def get_strawberry_full_info(self, strawberry_id: int) -> Optional[Mapping]:
         """
         获取草莓的完整信息，包括基本信息和所有记录
         
+        结果经扫码查询缓存读取，草莓或其记录变更时由DAO失效；命中时直接返回缓存中的只读结构，
+        需要修改的调用方自行复制。
+        
         Args:
             strawberry_id: 草莓ID
         
         Returns:
-            完整信息字典
+            完整信息（只读映射，records 为元组）
         """
         try:
-            # 获取基本信息
-            strawberry = self.dao.get_strawberry_by_id(strawberry_id)
-            if not strawberry:
-                return None
-            
-            # 获取所有记录
-            records = self.dao.get_strawberry_records(strawberry_id)
-            
-            # 为每个记录添加图片信息
-            for record in records:
-                if record.get('image_path'):
-                    # 获取图片信息
-                    image_info = self.image_manager.get_image_info(record['image_path'])
-                    if image_info:
-                        record['image_info'] = image_info
-                    
-                    # 获取缩略图路径
-                    thumbnail_path = self.image_manager.get_thumbnail_path(record['image_path'])
-                    if thumbnail_path:
-                        record['thumbnail_path'] = thumbnail_path
-            
-            # 组合完整信息
-            full_info = {
-                'strawberry': strawberry,
-                'records': records,
-                'record_count': len(records)
-            }
-            
-            return full_info
+            return strawberry_cache.get_or_load(
+                strawberry_key(strawberry_id),
+                lambda: self._load_full_info(self.dao.get_strawberry_by_id(strawberry_id))
+            )
             
         except Exception as e:
             logger.error(f"获取草莓完整信息失败: {e}")
             return None
     
-    def search_strawberry_by_qr(self, qr_content: str) -> Optional[Dict]:
+    def _load_full_info(self, strawberry: Optional[Dict]) -> Optional[Mapping]:
+        """根据草莓基本信息读取最近记录及图片信息，组合完整信息（写入缓存后共享，因此只读）"""
+        if not strawberry:
+            return None
+        
+        # 获取所有记录
+        records = self.dao.get_strawberry_records(strawberry['id'])
+        self._attach_image_info(records)
+        
+        # 组合完整信息
+        return MappingProxyType({
+            'strawberry': strawberry,
+            'records': tuple(records),
+            'record_count': len(records)
+        })
+    
+    def search_strawberry_by_qr(self, qr_content: str) -> Optional[Mapping]:
         """
         通过二维码内容搜索草莓
         
@@ -178,47 +229,100 @@ class StrawberryTraceService:
             qr_content: 二维码内容
         
         Returns:
-            草莓完整信息
+            草莓完整信息（与 get_strawberry_full_info 相同的只读结构）
         """
         try:
+            strawberry_id = strawberry_cache.get(qr_key(qr_content))
+            if strawberry_id is not None:
+                full_info = self.get_strawberry_full_info(strawberry_id)
+                if full_info:
+                    return full_info
+            
+            # 二维码未缓存：按二维码读到的基本信息直接组合完整信息，不再按ID重复查询
             strawberry = self.dao.get_strawberry_by_qr_code(qr_content)
             if not strawberry:
                 return None
-            
-            return self.get_strawberry_full_info(strawberry['id'])
+            strawberry_cache.put(qr_key(qr_content), strawberry['id'])
+            return strawberry_cache.get_or_load(
+                strawberry_key(strawberry['id']), lambda: self._load_full_info(strawberry)
+            )
             
         except Exception as e:
             logger.error(f"通过二维码搜索草莓失败: {e}")
             return None
     
-    def get_strawberry_list(self, status: Optional[str] = None, limit: Optional[int] = None) -> List[Dict]:
+    def lookup_strawberries_by_qr(self, qr_codes: List[str]) -> Dict:
+        """
+        批量解析二维码，一次查询草莓信息、一次查询各自的记录
+        
+        Args:
+            qr_codes: 二维码内容列表
+        
+        Returns:
+            {'found': {二维码: 完整信息}, 'missing': [未匹配的二维码]}
+        """
+        try:
+            strawberries = self.dao.get_strawberries_by_qr_codes(qr_codes)
+            records_by_id = self.dao.get_records_for_strawberries(
+                [strawberry['id'] for strawberry in strawberries.values()]
+            )
+            
+            found = {}
+            for qr_code, strawberry in strawberries.items():
+                records = records_by_id.get(strawberry['id'], [])
+                self._attach_image_info(records)
+                found[qr_code] = {
+                    'strawberry': strawberry,
+                    'records': records,
+                    'record_count': len(records)
+                }
+            
+            missing = [code for code in dict.fromkeys(qr_codes) if code not in found]
+            return {'found': found, 'missing': missing}
+            
+        except Exception as e:
+            logger.error(f"批量解析二维码失败: {e}")
+            return {'found': {}, 'missing': list(dict.fromkeys(qr_codes))}
+    
+    def _attach_image_info(self, records: List[GrowthRecord]):
+        """根据记录中保存的图片元数据为每条记录添加图片信息（不读取图片文件）"""
+        for record in records:
+            if record.image_path and record.image_width is not None:
+                record.image_info = {
+                    'path': record.image_path,
+                    'filename': os.path.basename(record.image_path),
+                    'size_bytes': record.image_size_bytes,
+                    'width': record.image_width,
+                    'height': record.image_height,
+                    'format': record.image_format,
+                    'has_exif': bool(record.image_has_exif),
+                    'taken_at': record.image_taken_at
+                }
+    
+    def get_strawberry_list(self, status: Optional[str] = None, limit: Optional[int] = None,
+                            fields: str = 'summary') -> List[LatestSummary]:
         """
         获取草莓列表及其最新记录
         
         Args:
             status: 草莓状态过滤
             limit: 限制返回数量
+            fields: 字段集，summary（默认，不含AI描述）或 full
         
         Returns:
             草莓列表
         """
         try:
-            strawberries = self.dao.get_strawberry_with_latest_record()
-            
-            # 状态过滤
-            if status:
-                strawberries = [s for s in strawberries if s.get('strawberry_status') == status]
-            
-            # 数量限制
             if limit:
-                strawberries = strawberries[:limit]
+                # 指定数量时只读取第一页
+                return self.get_strawberry_page(status, limit, fields=fields)['items']
             
-            # 为每个草莓添加额外信息
-            for strawberry in strawberries:
-                if strawberry.get('latest_image_path'):
-                    thumbnail_path = self.image_manager.get_thumbnail_path(strawberry['latest_image_path'])
-                    if thumbnail_path:
-                        strawberry['latest_thumbnail_path'] = thumbnail_path
+            # 全量列表流式读取，状态过滤在SQL中完成
+            rows = self.dao.iter_strawberries_with_latest_record(status, fields)
+            try:
+                strawberries = list(rows)
+            finally:
+                rows.close()
             
             return strawberries
             
@@ -226,6 +330,59 @@ class StrawberryTraceService:
             logger.error(f"获取草莓列表失败: {e}")
             return []
     
+    def get_strawberry_page(self, status: Optional[str] = None, limit: Optional[int] = None,
+                            after: Optional[str] = None, fields: str = 'summary') -> Dict:
+        """
+        游标分页获取草莓列表及其最新记录（按创建时间倒序）
+        
+        Args:
+            status: 草莓状态过滤
+            limit: 每页数量，默认 Config.LIST_PAGE_SIZE，最大 Config.LIST_MAX_PAGE_SIZE
+            after: 上一页返回的 next_cursor
+            fields: 字段集，summary（默认，不含AI描述）或 full
+        
+        Returns:
+            {'items': 草莓列表, 'next_cursor': 下一页游标或None, 'has_more': 是否还有下一页, 'limit': 每页数量}
+        
+        Raises:
+            ValueError: 游标格式或字段集无效
+        """
+        if fields not in FIELD_SETS:
+            raise ValueError(f"未知的字段集: {fields}，可选: {', '.join(FIELD_SETS)}")
+        limit = min(max(1, limit or Config.LIST_PAGE_SIZE), Config.LIST_MAX_PAGE_SIZE)
+        position = self.decode_cursor(after) if after else None
+        
+        # 多取一行用于判断是否还有下一页
+        rows = self.dao.get_strawberry_page(status, position, limit + 1, fields)
+        has_more = len(rows) > limit
+        items = rows[:limit]
+        
+        return {
+            'items': items,
+            'next_cursor': self.encode_cursor(items[-1]) if has_more else None,
+            'has_more': has_more,
+            'limit': limit
+        }
+    
+    @staticmethod
+    def encode_cursor(strawberry: LatestSummary) -> str:
+        """把一行草莓的 (创建时间, ID) 编码为URL安全的游标"""
+        created_at = strawberry.strawberry_created_at
+        if isinstance(created_at, datetime):
+            created_at = created_at.isoformat(' ')
+        raw = json.dumps([created_at, strawberry.id], separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+    
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+        """解析游标为 (创建时间, ID)，格式无效时抛出 ValueError"""
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            created_at, strawberry_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            return datetime.fromisoformat(created_at), int(strawberry_id)
+        except Exception as e:
+            raise ValueError(f"无效的分页游标: {cursor}") from e
+    
     def get_growth_timeline(self, strawberry_id: int) -> List[Dict]:
         """
         获取草莓生长时间线
@@ -251,9 +408,8 @@ class StrawberryTraceService:
                 }
                 
                 # 添加缩略图
-                thumbnail_path = self.image_manager.get_thumbnail_path(record['image_path'])
-                if thumbnail_path:
-                    timeline_item['thumbnail_path'] = thumbnail_path
+                if record.thumbnail_path:
+                    timeline_item['thumbnail_path'] = record.thumbnail_path
                 
                 timeline.append(timeline_item)
             
@@ -263,6 +419,39 @@ class StrawberryTraceService:
             logger.error(f"获取生长时间线失败: {e}")
             return []
     
+    def backfill_image_metadata(self, batch_size: int = 200) -> Dict:
+        """
+        为保存元数据之前的记录读取图片元数据并写入数据库（每批单独提交）
+        
+        图片文件已不存在或无法读取的记录保持为空，不影响其他记录。
+        
+        Args:
+            batch_size: 每批处理的记录数
+        
+        Returns:
+            {'scanned': 检查的记录数, 'updated': 回填的记录数, 'unreadable': 图片缺失或无法读取的记录数}
+        """
+        result = {'scanned': 0, 'updated': 0, 'unreadable': 0}
+        last_id = 0
+        while True:
+            records = self.dao.get_records_missing_image_metadata(last_id, batch_size)
+            if not records:
+                break
+            last_id = records[-1]['id']
+            
+            updates = []
+            for record in records:
+                metadata = self.image_manager.read_image_metadata(record['image_path'])
+                if metadata:
+                    updates.append(dict(metadata, id=record['id'], strawberry_id=record['strawberry_id']))
+                else:
+                    result['unreadable'] += 1
+            
+            result['scanned'] += len(records)
+            result['updated'] += self.dao.update_image_metadata(updates)
+            logger.info(f"已检查 {result['scanned']} 条记录，回填图片元数据 {result['updated']} 条")
+        return result
+    
     def get_statistics_report(self) -> Dict:
         """
         获取统计报告
@@ -271,57 +460,8 @@ class StrawberryTraceService:
             统计信息字典
         """
         try:
-            # 基础统计
+            # 总数、各状态数量、最新生长阶段/健康状态分布和新增数量均取自统计计数器
             stats = self.dao.get_statistics()
-            
-            # 添加更多统计信息
-            now = datetime.now()
-            
-            # 今日新增
-            today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-            today_strawberries = self.dao.db.execute_query(
-                "SELECT COUNT(*) as count FROM strawberries WHERE created_at >= %s",
-                (today_start,), fetch_one=True
-            )
-            stats['today_new_strawberries'] = today_strawberries['count'] if today_strawberries else 0  # type: ignore
-            
-            # 本周新增
-            week_start = today_start - timedelta(days=now.weekday())
-            week_strawberries = self.dao.db.execute_query(
-                "SELECT COUNT(*) as count FROM strawberries WHERE created_at >= %s",
-                (week_start,), fetch_one=True
-            )
-            stats['week_new_strawberries'] = week_strawberries['count'] if week_strawberries else 0  # type: ignore
-            
-            # 生长阶段统计
-            stage_stats = self.dao.db.execute_query("""
-                SELECT growth_stage, COUNT(*) as count
-                FROM strawberry_records sr
-                JOIN (
-                    SELECT strawberry_id, MAX(recorded_at) as max_recorded_at
-                    FROM strawberry_records
-                    GROUP BY strawberry_id
-                ) latest ON sr.strawberry_id = latest.strawberry_id 
-                         AND sr.recorded_at = latest.max_recorded_at
-                WHERE growth_stage IS NOT NULL
-                GROUP BY growth_stage
-            """)
-            stats['growth_stage_counts'] = {row['growth_stage']: row['count'] for row in stage_stats}  # type: ignore
-            
-            # 健康状态统计
-            health_stats = self.dao.db.execute_query("""
-                SELECT health_status, COUNT(*) as count
-                FROM strawberry_records sr
-                JOIN (
-                    SELECT strawberry_id, MAX(recorded_at) as max_recorded_at
-                    FROM strawberry_records
-                    GROUP BY strawberry_id
-                ) latest ON sr.strawberry_id = latest.strawberry_id 
-                         AND sr.recorded_at = latest.max_recorded_at
-                GROUP BY health_status
-            """)
-            stats['health_status_counts'] = {row['health_status']: row['count'] for row in health_stats}  # type: ignore
-            
             return stats
             
         except Exception as e:
@@ -348,9 +488,11 @@ class StrawberryTraceService:
             def convert_datetime(obj):
                 if isinstance(obj, datetime):
                     return obj.isoformat()
-                elif isinstance(obj, dict):
+                elif isinstance(obj, RowModel):
+                    return obj.to_json()
+                elif isinstance(obj, Mapping):
                     return {k: convert_datetime(v) for k, v in obj.items()}
-                elif isinstance(obj, list):
+                elif isinstance(obj, (list, tuple)):
                     return [convert_datetime(item) for item in obj]
                 else:
                     return obj
@@ -377,28 +519,19 @@ class StrawberryTraceService:
             是否删除成功
         """
         try:
-            # 获取草莓信息
-            strawberry = self.dao.get_strawberry_by_id(strawberry_id)
-            if not strawberry:
+            # 与批量删除相同：删除草莓（记录级联删除）的同一事务中取出全部记录的图片路径
+            result = self.dao.delete_strawberries([strawberry_id])
+            if not result['deleted']:
                 logger.warning(f"草莓不存在，ID: {strawberry_id}")
                 return False
             
-            # 获取所有记录
-            records = self.dao.get_strawberry_records(strawberry_id)
-            
-            # 删除数据库记录（会自动级联删除相关记录）
-            if not self.dao.delete_strawberry(strawberry_id):
-                logger.error("删除数据库记录失败")
-                return False
-            
             # 删除二维码文件
-            if strawberry.get('qr_code_path'):
-                self.qr_manager.delete_qr_code(strawberry['qr_code_path'])
+            for qr_code_path in result['qr_code_paths']:
+                self.qr_manager.delete_qr_code(qr_code_path)
             
-            # 删除图片文件
-            for record in records:
-                if record.get('image_path'):
-                    self.image_manager.delete_image(record['image_path'])
+            # 删除图片文件（及缩略图）
+            for image_path in result['image_paths']:
+                self.image_manager.delete_image(image_path)
             
             logger.info(f"成功删除草莓及相关文件，ID: {strawberry_id}")
             return True
@@ -407,42 +540,115 @@ class StrawberryTraceService:
             logger.error(f"删除草莓失败: {e}")
             return False
     
-    def validate_system_integrity(self) -> Dict:
+    def _iter_bulk_batches(self, filters: Dict):
+        """
+        按筛选条件分批产出草莓ID（每批不超过 Config.DB_IN_CHUNK_SIZE，按ID顺序）
+        
+        Raises:
+            ValueError: 未指定任何筛选条件或ID过多
+        """
+        if not any(value is not None for value in filters.values()):
+            raise ValueError("批量操作至少需要指定草莓ID列表或一个筛选条件")
+        ids = filters.get('strawberry_ids')
+        if ids is not None and len(ids) > Config.BULK_MAX_IDS:
+            raise ValueError(f"一次最多指定 {Config.BULK_MAX_IDS} 个草莓ID")
+        after_id = 0
+        while True:
+            batch = self.dao.get_strawberry_id_batch(after_id, Config.DB_IN_CHUNK_SIZE, **filters)
+            if not batch:
+                return
+            after_id = batch[-1]
+            yield batch
+    
+    def bulk_update_status(self, status: str, filters: Dict) -> Dict:
+        """
+        批量修改草莓状态：按筛选条件分批取ID，每批一条 UPDATE 语句并单独提交
+        
+        Args:
+            status: 新状态
+            filters: BulkExporter.build_filters 的返回值（按ID、状态、创建日期、二维码前缀筛选）
+        
+        Returns:
+            {'matched': 符合条件的草莓数, 'updated': 状态发生变化的草莓数}
+        
+        Raises:
+            ValueError: 状态无效或未指定筛选条件
+        """
+        if status not in STRAWBERRY_STATUSES:
+            raise ValueError(f"无效的状态: {status}，可选: {', '.join(STRAWBERRY_STATUSES)}")
+        result = {'matched': 0, 'updated': 0}
+        for batch in self._iter_bulk_batches(filters):
+            result['matched'] += len(batch)
+            result['updated'] += self.dao.update_strawberries_status(batch, status)
+        logger.info(f"批量修改草莓状态为 {status}：符合条件 {result['matched']} 颗，更新 {result['updated']} 颗")
+        return result
+    
+    def bulk_delete_strawberries(self, filters: Dict) -> Dict:
         """
-        验证系统完整性
+        批量删除草莓：按筛选条件分批删除（每批一条 DELETE 语句并单独提交），
+        图片和二维码文件交给后台任务删除
+        
+        Args:
+            filters: BulkExporter.build_filters 的返回值
         
         Returns:
-            验证结果字典
+            {'deleted': 删除的草莓数, 'files': 待删除的文件数, 'job': 文件清理任务（无文件时为None）}
+        
+        Raises:
+            ValueError: 未指定筛选条件
+        """
+        deleted = 0
+        image_paths: List[str] = []
+        qr_code_paths: List[str] = []
+        for batch in self._iter_bulk_batches(filters):
+            batch_result = self.dao.delete_strawberries(batch)
+            deleted += batch_result['deleted']
+            image_paths.extend(batch_result['image_paths'])
+            qr_code_paths.extend(batch_result['qr_code_paths'])
+        
+        files = len(image_paths) + len(qr_code_paths)
+        job = None
+        if files:
+            job = job_registry.submit('file_cleanup', self._delete_files, image_paths, qr_code_paths,
+                                      total=files, description=f"删除 {deleted} 颗草莓的图片和二维码文件")
+        logger.info(f"批量删除草莓 {deleted} 颗，待清理文件 {files} 个")
+        return {'deleted': deleted, 'files': files, 'job': job.to_dict() if job else None}
+    
+    def _delete_files(self, job: Job, image_paths: List[str], qr_code_paths: List[str]) -> Dict:
+        """后台任务：删除图片（及缩略图）和二维码文件，逐个报告进度"""
+        result = {'images_deleted': 0, 'qr_codes_deleted': 0}
+        for path in image_paths:
+            success = self.image_manager.delete_image(path)
+            result['images_deleted'] += success
+            job.advance(errors=0 if success else 1)
+        for path in qr_code_paths:
+            success = self.qr_manager.delete_qr_code(path)
+            result['qr_codes_deleted'] += success
+            job.advance(errors=0 if success else 1)
+        return result
+    
+    def validate_system_integrity(self, full: bool = False, delete_orphans: bool = False,
+                                  regenerate_thumbnails: bool = False) -> Dict:
+        """
+        验证系统完整性（比对数据库引用的图片、缩略图、二维码文件与存储目录）
+        
+        Args:
+            full: 是否忽略上次检查的检查点，重新检查全部文件
+            delete_orphans: 是否删除孤立文件
+            regenerate_thumbnails: 是否重新生成缺失的缩略图
+        
+        Returns:
+            验证结果字典，包含 valid、issues、statistics 及 IntegrityScanner.scan 的明细
         """
         try:
-            result = {
-                'valid': True,
-                'issues': [],
-                'statistics': {}
-            }
-            
             # 检查数据库连接
             if not self.dao.db.test_connection():
-                result['valid'] = False
-                result['issues'].append("数据库连接失败")
-            
-            # 检查孤立文件
-            all_images = self.image_manager.list_images()
-            all_records = self.dao.db.execute_query("SELECT image_path FROM strawberry_records")  # type: ignore
-            valid_image_paths = [record['image_path'] for record in all_records if record.get('image_path')]  # type: ignore
-            
-            orphaned_images = [img for img in all_images if img not in valid_image_paths]
-            if orphaned_images:
-                result['issues'].append(f"发现 {len(orphaned_images)} 个孤立图片文件")
-                result['statistics']['orphaned_images'] = len(orphaned_images)
-            
-            # 检查缺失文件
-            missing_images = [path for path in valid_image_paths if not os.path.exists(path)]
-            if missing_images:
-                result['valid'] = False
-                result['issues'].append(f"发现 {len(missing_images)} 个缺失的图片文件")
-                result['statistics']['missing_images'] = len(missing_images)
+                return {'valid': False, 'issues': ["数据库连接失败"], 'statistics': {}}
             
+            result = integrity_scanner.scan(full=full, delete_orphans=delete_orphans,
+                                            regenerate_thumbnails=regenerate_thumbnails)
+            if result is None:
+                return {'valid': False, 'issues': ["完整性检查正在执行，请稍后再试"], 'statistics': {}}
             return result
             
         except Exception as e:
@@ -242,6 +242,7 @@ DB_PORT={self.config['port']}
 DB_USER={self.config['db_user']}
 DB_PASSWORD={self.config['db_password']}
 DB_NAME={self.config['db_name']}
+DB_POOL_SIZE=5
 
 # 文件存储路径
 IMAGE_STORAGE_PATH=./storage/images
@@ -132,9 +132,17 @@ export interface ApiResponse<T = unknown> {
   success: boolean
   message: string
   data?: T
+  pagination?: Pagination
   timestamp: string
 }
 
+// 游标分页信息（请求带 limit 或 after 时返回）
+export interface Pagination {
+  next_cursor: string | null
+  has_more: boolean
+  limit: number
+}
+
 // 草莓数据类型
 export interface Strawberry {
   id: number
@@ -166,6 +174,12 @@ export interface StrawberryFullInfo {
   records: ObservationRecord[]
 }
 
+// 批量解析二维码结果
+export interface StrawberryLookupResult {
+  found: Record<string, StrawberryFullInfo>
+  missing: string[]
+}
+
 // 统计数据类型
 export interface Statistics {
   total_strawberries: number
@@ -207,7 +221,7 @@ export const apiService = {
   },
 
   // 草莓管理
-  async getStrawberries(params?: { status?: string; limit?: number }): Promise<ApiResponse<Strawberry[]>> {
+  async getStrawberries(params?: { status?: string; limit?: number; after?: string; fields?: 'summary' | 'full' }): Promise<ApiResponse<Strawberry[]>> {
     try {
       const response = await getWithCache<ApiResponse<Strawberry[]>>('/strawberries', params)
       return response
@@ -259,6 +273,12 @@ export const apiService = {
     return response.data
   },
 
+  async lookupStrawberries(qrCodes: string[]): Promise<ApiResponse<StrawberryLookupResult>> {
+    const api = createApiInstance()
+    const response = await api.post('/strawberries/lookup', { qr_codes: qrCodes })
+    return response.data
+  },
+
   // 观察记录
   async addObservationRecord(strawberryId: number, formData: FormData): Promise<ApiResponse<ObservationRecord>> {
     const api = createApiInstance()
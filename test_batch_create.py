@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+测试批量创建草莓（使用嵌入式SQLite，无需MySQL）
+- 草莓行、二维码路径和统计计数器一次写入，二维码图片直接保存为 qr_<内容>_id<ID>.png
+- 渲染失败的草莓清空二维码路径并在结果中列出
+- 数量和前缀校验；后台任务按渲染完成的二维码报告进度
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import conftest  # noqa: F401  设置测试环境，须在导入项目模块之前
+
+from PIL import Image
+from modules.migrations import migration_runner
+from modules.strawberry_dao import strawberry_dao
+from modules.qr_code import QRCodeManager
+from modules.batch_create import BatchCreator, batch_creator
+
+
+def setup_module(module=None):
+    migration_runner.migrate()
+
+
+def test_create_writes_rows_and_qr_images():
+    """批量创建：二维码内容带前缀，图片按最终文件名保存，计数器同步增加"""
+    before = strawberry_dao.get_counters()
+    result = batch_creator.create(5, 'BATCH-A', '新一季定植', workers=1)
+    after = strawberry_dao.get_counters()
+
+    assert result['created'] == 5 and result['rendered'] == 5 and result['failed'] == []
+    assert len(set(result['ids'])) == 5
+    for strawberry_id in result['ids']:
+        strawberry = strawberry_dao.get_strawberry_by_id(strawberry_id)
+        assert strawberry.qr_code.startswith('BATCH-A_') and strawberry.notes == '新一季定植'
+        assert strawberry.status == 'active'
+        expected = os.path.join(batch_creator.qr_manager.storage_path, f"qr_{strawberry.qr_code}_id{strawberry_id}.png")
+        assert strawberry.qr_code_path == expected
+        with Image.open(expected) as image:
+            assert image.format == 'PNG'
+
+    assert after['strawberries'] - before.get('strawberries', 0) == 5
+    assert after['status:active'] - before.get('status:active', 0) == 5
+    day = f"created:{str(strawberry_dao.get_strawberry_by_id(result['ids'][0]).created_at)[:10]}"
+    assert after[day] - before.get(day, 0) == 5
+
+
+def test_failed_renders_clear_qr_path():
+    """二维码目录不可写时草莓仍然创建，二维码路径清空并列出失败项"""
+    blocked = os.path.join(conftest.TEST_DIR, 'qr_blocked')
+    open(blocked, 'wb').close()
+    creator = BatchCreator()
+    creator.qr_manager = QRCodeManager()
+    # 存储目录是一个普通文件，图片无法保存
+    creator.qr_manager.storage_path = blocked
+
+    result = creator.create(2, 'BATCH-FAIL', workers=1)
+    assert result['created'] == 2 and result['rendered'] == 0
+    assert [item['id'] for item in result['failed']] == result['ids']
+    assert all(item['error'] for item in result['failed'])
+    for strawberry_id in result['ids']:
+        assert strawberry_dao.get_strawberry_by_id(strawberry_id).qr_code_path is None
+
+
+def test_validate():
+    """数量超出范围、不是整数或前缀含非法字符时抛出 ValueError"""
+    creator = BatchCreator(max_count=10)
+    assert creator.validate('3') == {'count': 3, 'prefix': 'SB'}
+    for count, prefix in ((0, None), (11, None), ('abc', None), (None, None),
+                          (1, 'BAD_PREFIX'), (1, '前缀'), (1, 'X' * 33)):
+        try:
+            creator.validate(count, prefix)
+        except ValueError:
+            continue
+        raise AssertionError(f"应抛出 ValueError: {count!r}, {prefix!r}")
+
+
+def test_submit_reports_progress():
+    """提交为后台任务：进度为已渲染的二维码数，结果与同步创建一致"""
+    job = batch_creator.submit(3, 'BATCH-JOB', '后台创建')
+    assert job.kind == 'batch_create' and job.total == 3
+    assert job.wait(60)
+    assert job.status == 'completed', job.error
+    assert job.processed == 3 and job.errors == 0
+    assert job.to_dict()['progress'] == 1.0
+    assert job.result['created'] == 3 and job.result['rendered'] == 3
+    for strawberry_id in job.result['ids']:
+        assert os.path.isfile(strawberry_dao.get_strawberry_by_id(strawberry_id).qr_code_path)
+
+
+if __name__ == "__main__":
+    setup_module()
+    for test in (test_create_writes_rows_and_qr_images, test_failed_renders_clear_qr_path, test_validate,
+                 test_submit_reports_progress):
+        test()
+        print(f"✅ {test.__doc__}")
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+测试溯源包导出（使用嵌入式SQLite，无需MySQL）
+- ZIP 和 tar 归档可被标准库完整读出，文件内容与 strawberry.json 中的大小、SHA-256 一致
+- 缺失的文件和存储目录之外的文件不打包，记录在 missing_files 中
+- manifest.json 汇总草莓、记录、文件数量
+"""
+import os
+import io
+import sys
+import json
+import hashlib
+import tarfile
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import conftest  # noqa: F401  设置测试环境，须在导入项目模块之前
+
+from modules.migrations import migration_runner
+from modules.strawberry_dao import strawberry_dao
+from modules.image_manager import image_manager
+from modules.qr_code import qr_manager
+from modules.exporter import bulk_exporter
+from modules.bundle import bundle_exporter, FILE_CHUNK_SIZE
+
+FILES = {}
+IDS = []
+
+
+def _write(directory, name, data):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, name)
+    with open(path, 'wb') as f:
+        f.write(data)
+    FILES[name] = data
+    return path
+
+
+def setup_module(module=None):
+    migration_runner.migrate()
+    qr_path = _write(qr_manager.storage_path, 'qr_BUNDLE_A.png', b'\x89PNG qr code')
+    # 超过一个读取块，覆盖分块读取
+    image_path = _write(image_manager.storage_path, 'bundle_a.jpg', os.urandom(FILE_CHUNK_SIZE * 2 + 123))
+    thumbnail_path = _write(os.path.join(image_manager.storage_path, 'thumbnails'), 'bundle_a_thumb.jpg',
+                            b'thumbnail')
+    outside_path = _write(os.path.join(conftest.TEST_DIR, 'outside'), 'outside.jpg', b'outside storage')
+
+    first = strawberry_dao.create_strawberry('BUNDLE_A', qr_path)
+    second = strawberry_dao.create_strawberry('BUNDLE/B')
+    IDS[:] = [first, second]
+    result = strawberry_dao.add_growth_records_bulk([
+        {'strawberry_id': first, 'image_path': image_path, 'thumbnail_path': thumbnail_path,
+         'growth_stage': 'flowering'},
+        {'strawberry_id': first, 'image_path': os.path.join(image_manager.storage_path, 'bundle_missing.jpg')},
+        {'strawberry_id': second, 'image_path': outside_path},
+    ])
+    assert result['failed'] == []
+
+
+def _members(data, format):
+    """读取归档中的全部成员，返回 {名称: 内容}"""
+    if format == 'zip':
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            assert archive.testzip() is None
+            return {name: archive.read(name) for name in archive.namelist()}
+    with tarfile.open(fileobj=io.BytesIO(data)) as archive:
+        return {member.name: archive.extractfile(member).read() for member in archive.getmembers()}
+
+
+def _check_bundle(format):
+    chunks = list(bundle_exporter.stream(format, bulk_exporter.build_filters(ids=IDS)))
+    assert all(chunks)
+    members = _members(b''.join(chunks), format)
+
+    root = {name.split('/')[0] for name in members}
+    assert len(root) == 1
+    root = root.pop()
+    first, second = IDS
+    first_dir, second_dir = f"{root}/{first}_BUNDLE_A", f"{root}/{second}_BUNDLE_B"
+
+    metadata = json.loads(members[f"{first_dir}/strawberry.json"])
+    assert metadata['qr_code'] == 'BUNDLE_A' and len(metadata['records']) == 2
+    packed = [metadata['files']['qr_code'], metadata['records'][0]['files']['image'],
+              metadata['records'][0]['files']['thumbnail']]
+    for entry in packed:
+        content = members[f"{first_dir}/{entry['path']}"]
+        assert content == FILES[os.path.basename(entry['path'])]
+        assert entry['size_bytes'] == len(content)
+        assert entry['sha256'] == hashlib.sha256(content).hexdigest()
+    assert metadata['missing_files'] == [metadata['records'][1]['image_path']]
+
+    outside = json.loads(members[f"{second_dir}/strawberry.json"])
+    assert outside['records'][0]['files'] == {}
+    assert outside['missing_files'] == [outside['records'][0]['image_path']]
+    assert not any(name.endswith('outside.jpg') for name in members)
+
+    manifest = json.loads(members[f"{root}/manifest.json"])
+    assert manifest['format'] == format
+    assert (manifest['strawberry_count'], manifest['record_count'], manifest['file_count'],
+            manifest['missing_file_count']) == (2, 3, 3, 2)
+    assert manifest['total_bytes'] == sum(entry['size_bytes'] for entry in packed)
+
+
+def test_zip_bundle():
+    """ZIP 溯源包：文件、元数据、缺失文件和清单"""
+    _check_bundle('zip')
+
+
+def test_tar_bundle():
+    """tar 溯源包：与 ZIP 内容一致"""
+    _check_bundle('tar')
+
+
+def test_unknown_format():
+    """未知的归档格式抛出 ValueError"""
+    try:
+        bundle_exporter.stream('rar')
+    except ValueError:
+        return
+    raise AssertionError("应抛出 ValueError")
+
+
+if __name__ == "__main__":
+    setup_module()
+    for test in (test_zip_bundle, test_tar_bundle, test_unknown_format):
+        test()
+        print(f"✅ {test.__doc__}")
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+测试数据库层（使用嵌入式SQLite，无需MySQL）
+- 事务回滚与保存点
+- 多行插入返回的ID与行的对应关系
+- 统计计数器增量维护与 reconcile_counters 重建结果一致，重建覆盖偏离的计数器
+- 记录清理保留 MAX_RECORDS_PER_STRAWBERRY 条最新记录
+- 连接池饱和时数据库健康检查很快返回
+- 旧版本表结构执行全部迁移
+
+数据库由 conftest 在导入项目模块之前按旧版本（迁移之前）的表结构创建，setup_module 执行迁移后其余测试在迁移后的库上运行。
+"""
+import os
+import sys
+import logging
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import conftest  # noqa: F401  设置测试环境并创建旧版本表结构的数据库，须在导入项目模块之前
+
+from config import Config
+from modules.database import db_manager, TransactionRolledBack
+from modules.strawberry_dao import strawberry_dao
+from modules.migrations import migration_runner, MIGRATIONS
+from modules.retention import RetentionEngine
+from modules.health import HealthMonitor
+from modules.query_stats import QueryStats
+
+
+def setup_module(module=None):
+    """把旧版本表结构迁移到最新版本"""
+    migration_runner.migrate()
+
+
+def _count(query, params=None):
+    return db_manager.execute_query(query, params, fetch_one=True, dictionary=False)[0]
+
+
+def _nonzero(counters):
+    return {name: value for name, value in counters.items() if value}
+
+
+def test_migrate_pre_series_schema():
+    """旧版本表结构执行全部迁移：版本、索引、触发器、最新记录字段和计数器"""
+    assert set(migration_runner.applied_versions()) == {migration.version for migration in MIGRATIONS}
+    assert migration_runner.pending() == []
+    assert migration_runner.migrate() == []
+
+    assert migration_runner.index_exists('strawberry_records', 'idx_strawberry_recorded')
+    assert migration_runner.index_exists('strawberries', 'idx_status_created')
+    assert not migration_runner.index_exists('strawberry_records', 'idx_strawberry_id')
+    assert not migration_runner.index_exists('strawberries', 'idx_qr_code')
+    assert migration_runner.column_exists('strawberry_records', 'thumbnail_path')
+    assert _count("SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name = 'clean_old_records'") == 0
+
+    # 迁移中回填了已有草莓的最新记录字段
+    old = strawberry_dao.get_strawberries_by_qr_codes(['OLD_001', 'OLD_002'])
+    assert old['OLD_001'].record_count == 2
+    assert old['OLD_001'].latest_growth_stage == 'flowering'
+    assert old['OLD_001'].latest_health_status == 'warning'
+    assert old['OLD_002'].record_count == 1
+    assert old['OLD_002'].latest_growth_stage == 'fruiting'
+    view = db_manager.execute_query(
+        "SELECT latest_image_path FROM strawberry_latest_view WHERE qr_code = %s", ('OLD_001',), fetch_one=True
+    )
+    assert view['latest_image_path'] == 'old_1b.jpg'
+
+    # 迁移中按已有数据重建了计数器
+    counters = strawberry_dao.get_counters()
+    assert counters['created:2024-05-01'] == 1
+    assert counters['stage:flowering'] >= 1
+
+
+def test_transaction_rollback():
+    """事务内抛出异常或有语句失败时整体回滚"""
+    try:
+        with db_manager.transaction():
+            db_manager.execute_insert("INSERT INTO strawberries (qr_code) VALUES (%s)", ('TX_ROLLBACK',))
+            raise ValueError("中止事务")
+    except ValueError:
+        pass
+    assert strawberry_dao.get_strawberry_by_qr_code('TX_ROLLBACK') is None
+
+    # DAO 吞掉了失败的语句，事务仍然整体回滚
+    raised = False
+    try:
+        with db_manager.transaction():
+            db_manager.execute_insert("INSERT INTO strawberries (qr_code) VALUES (%s)", ('TX_SWALLOWED',))
+            assert strawberry_dao.create_strawberry('TX_SWALLOWED') is None
+    except TransactionRolledBack:
+        raised = True
+    assert raised
+    assert strawberry_dao.get_strawberry_by_qr_code('TX_SWALLOWED') is None
+
+
+def test_savepoint_restore():
+    """保存点之后的失败只回滚到保存点，外层事务正常提交"""
+    with db_manager.transaction():
+        db_manager.execute_insert("INSERT INTO strawberries (qr_code) VALUES (%s)", ('SP_KEPT',))
+        try:
+            with db_manager.savepoint('test_sp'):
+                db_manager.execute_insert("INSERT INTO strawberries (qr_code) VALUES (%s)", ('SP_DISCARDED',))
+                # 二维码重复，违反唯一约束
+                db_manager.execute_insert("INSERT INTO strawberries (qr_code) VALUES (%s)", ('SP_KEPT',))
+        except Exception:
+            pass
+    assert strawberry_dao.get_strawberry_by_qr_code('SP_KEPT') is not None
+    assert strawberry_dao.get_strawberry_by_qr_code('SP_DISCARDED') is None
+
+
+def test_execute_insert_rows_ids():
+    """多行插入返回的ID与输入行一一对应；自增ID不保证连续时逐行插入"""
+    codes = [f"ROWS_{index:03d}" for index in range(7)]
+    ids = db_manager.execute_insert_rows(
+        "INSERT INTO strawberries (qr_code) VALUES", "(%s)", [(code,) for code in codes[:4]]
+    )
+    backend = db_manager.backend
+    backend.consecutive_insert_ids = lambda cursor: False
+    try:
+        ids += db_manager.execute_insert_rows(
+            "INSERT INTO strawberries (qr_code) VALUES", "(%s)", [(code,) for code in codes[4:]]
+        )
+    finally:
+        del backend.consecutive_insert_ids
+    assert len(set(ids)) == len(codes)
+    found = strawberry_dao.get_strawberries_by_ids(ids)
+    assert [found[strawberry_id].qr_code for strawberry_id in ids] == codes
+
+    # 批量创建草莓和批量写入记录返回的ID同样对应输入顺序
+    batch_codes = [f"BATCH_{index:03d}" for index in range(5)]
+    batch_ids = strawberry_dao.create_strawberries(batch_codes, None, 'qr_', batch_size=2)
+    found = strawberry_dao.get_strawberries_by_ids(batch_ids)
+    for strawberry_id, code in zip(batch_ids, batch_codes):
+        assert found[strawberry_id].qr_code == code
+        assert found[strawberry_id].qr_code_path == f"qr_{code}_id{strawberry_id}.png"
+
+    records = [{'strawberry_id': batch_ids[index % 2], 'image_path': f"rows_{index}.jpg", 'growth_stage': 'seedling'}
+               for index in range(5)]
+    result = strawberry_dao.add_growth_records_bulk(records, batch_size=2)
+    assert result['failed'] == []
+    for record_id, record in zip(result['ids'], records):
+        assert strawberry_dao.get_record_by_id(record_id)['image_path'] == record['image_path']
+
+
+def test_counters_match_reconcile():
+    """各写入路径增量维护的计数器与重建结果一致，删除草莓时扣减其创建日期计数器"""
+    # 前面的测试直接写入了 SQL，不经过 DAO，先重建一次作为基准
+    strawberry_dao.reconcile_counters()
+    today = f"created:{datetime.now().date()}"
+    created_before = strawberry_dao.get_counters().get(today, 0)
+    today_before = strawberry_dao.get_statistics()['today_new_strawberries']
+
+    first = strawberry_dao.create_strawberry('CNT_001')
+    ids = strawberry_dao.create_strawberries([f"CNT_{index:03d}" for index in range(2, 7)], None, 'qr_')
+    for index, stage in enumerate(('seedling', 'flowering', 'mature')):
+        strawberry_dao.add_growth_record(first, f"cnt_{index}.jpg", growth_stage=stage, health_status='healthy')
+    strawberry_dao.add_growth_records_bulk([
+        {'strawberry_id': ids[0], 'image_path': 'cnt_bulk_a.jpg', 'growth_stage': 'fruiting', 'health_status': 'sick'},
+        {'strawberry_id': ids[1], 'image_path': 'cnt_bulk_b.jpg', 'growth_stage': 'ripening'}
+    ])
+    strawberry_dao.update_strawberry_status(ids[2], 'harvested')
+    strawberry_dao.update_strawberries_status(ids[2:4], 'inactive')
+    assert strawberry_dao.delete_record(strawberry_dao.get_strawberry_by_id(first).latest_record_id)
+    strawberry_dao.delete_strawberry(ids[0])
+    strawberry_dao.delete_strawberries(ids[1:3])
+
+    counters = _nonzero(strawberry_dao.get_counters())
+    # 创建6颗、删除3颗
+    assert counters[today] - created_before == 3
+    statistics = strawberry_dao.get_statistics()
+    assert statistics['today_new_strawberries'] - today_before == 3
+    assert statistics['today_new_strawberries'] <= statistics['total_strawberries']
+    assert _nonzero(strawberry_dao.reconcile_counters()) == counters
+    assert _nonzero(strawberry_dao.get_counters()) == counters
+    assert counters['strawberries'] == _count("SELECT COUNT(*) FROM strawberries")
+    assert counters['records'] == _count("SELECT COUNT(*) FROM strawberry_records")
+    created_days = {row['day'] for row in db_manager.execute_query(
+        "SELECT DATE(created_at) as day FROM strawberries WHERE qr_code LIKE %s", ('CNT_%',)
+    )}
+    assert {f"created:{day}" for day in created_days} <= set(counters)
+
+
+def test_reconcile_overwrites_drifted_counters():
+    """reconcile_counters 用重建结果覆盖偏大或偏小的计数器"""
+    expected = _nonzero(strawberry_dao.reconcile_counters())
+    today = f"created:{datetime.now().date()}"
+    db_manager.execute_update("UPDATE statistics_counters SET value = value + 100 WHERE name IN (%s, %s)",
+                              (today, 'strawberries'))
+    db_manager.execute_update("UPDATE statistics_counters SET value = value - 1 WHERE name = %s", ('records',))
+    db_manager.execute_insert("INSERT INTO statistics_counters (name, value) VALUES (%s, %s)",
+                              ('created:2000-01-01', 7))
+
+    assert _nonzero(strawberry_dao.reconcile_counters()) == expected
+    assert _nonzero(strawberry_dao.get_counters()) == expected
+
+
+def test_retention_keeps_max_records():
+    """记录清理后每颗草莓保留 MAX_RECORDS_PER_STRAWBERRY 条最新记录"""
+    keep = Config.MAX_RECORDS_PER_STRAWBERRY
+    many, few = strawberry_dao.create_strawberries(['RET_MANY', 'RET_FEW'], None, 'qr_')
+    started = datetime(2025, 3, 1, 8, 0, 0)
+    records = [{'strawberry_id': many, 'image_path': f"ret_{index}.jpg", 'growth_stage': 'flowering',
+                'recorded_at': started + timedelta(hours=index)} for index in range(keep + 5)]
+    records.append({'strawberry_id': few, 'image_path': 'ret_few.jpg', 'growth_stage': 'seedling',
+                    'recorded_at': started})
+    assert strawberry_dao.add_growth_records_bulk(records)['failed'] == []
+
+    report = RetentionEngine(batch_size=1).run()
+    assert report['records'] >= 5
+
+    kept = db_manager.execute_query(
+        "SELECT image_path FROM strawberry_records WHERE strawberry_id = %s ORDER BY recorded_at", (many,)
+    )
+    assert [row['image_path'] for row in kept] == [f"ret_{index}.jpg" for index in range(5, keep + 5)]
+    assert _count("SELECT COUNT(*) FROM strawberry_records WHERE strawberry_id = %s", (few,)) == 1
+
+    strawberry = strawberry_dao.get_strawberry_by_id(many)
+    assert strawberry.record_count == keep
+    assert strawberry.latest_recorded_at == started + timedelta(hours=keep + 4)
+    assert _count("SELECT COUNT(*) FROM strawberries WHERE record_count > %s", (keep,)) == 0
+    assert _nonzero(strawberry_dao.get_counters()) == _nonzero(strawberry_dao.reconcile_counters())
+
+
+def test_retention_started_once_per_process():
+    """定时清理线程在每个进程中只启动一次，fork 出的进程重新启动"""
+    engine = RetentionEngine(interval=3600)
+    try:
+        assert engine.ensure_started()
+        thread = engine._thread
+        assert engine.ensure_started() and engine._thread is thread
+        # 模拟 fork：父进程的线程不属于当前进程
+        engine._started_pid = -1
+        assert engine.ensure_started() and engine._thread is not thread
+    finally:
+        engine.stop()
+    assert not RetentionEngine(interval=0).ensure_started()
+
+
+def test_health_check_fails_fast_when_pool_saturated():
+    """连接池被占满时数据库健康检查在 HEALTH_DB_TIMEOUT 内返回未就绪"""
+    pool = db_manager.pool
+    held = [pool.acquire() for _ in range(pool.size)]
+    try:
+        started = datetime.now()
+        result = HealthMonitor(ttl=0)._check_database()
+        elapsed = (datetime.now() - started).total_seconds()
+    finally:
+        for connection in held:
+            pool.release(connection)
+    assert not result['ok'] and result['saturated']
+    assert elapsed < Config.DB_POOL_TIMEOUT
+    assert HealthMonitor(ttl=0)._check_database()['ok']
+
+
+def test_slow_log_counts_params_per_row_for_execute_many():
+    """execute_many 的慢查询日志按单组参数计算参数个数，组数单独记录"""
+    messages = []
+    handler = logging.Handler()
+    handler.emit = lambda record: messages.append(record.getMessage())
+    query_logger = logging.getLogger('modules.query_stats')
+    query_logger.addHandler(handler)
+    stats, db_manager.stats = db_manager.stats, QueryStats(slow_query_ms=1e-6)
+    try:
+        db_manager.execute_many("UPDATE strawberries SET notes = %s WHERE id = %s",
+                                [('slow', index) for index in range(7)])
+    finally:
+        db_manager.stats = stats
+        query_logger.removeHandler(handler)
+    assert any("绑定参数 2 个 × 7 组" in message for message in messages)
+
+
+if __name__ == "__main__":
+    setup_module()
+    for test in (test_migrate_pre_series_schema, test_transaction_rollback, test_savepoint_restore,
+                 test_execute_insert_rows_ids, test_counters_match_reconcile, test_reconcile_overwrites_drifted_counters,
+                 test_retention_keeps_max_records, test_retention_started_once_per_process,
+                 test_health_check_fails_fast_when_pool_saturated, test_slow_log_counts_params_per_row_for_execute_many):
+        test()
+        print(f"✅ {test.__doc__}")
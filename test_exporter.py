@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+测试批量导出（使用嵌入式SQLite，无需MySQL）
+- NDJSON 每行一颗草莓及其按记录时间排序的记录
+- CSV 每行一条记录（没有记录的草莓占一行），带BOM和表头，含逗号、换行的字段正确转义
+- 按状态、创建日期范围、二维码前缀和ID筛选
+- 提前关闭导出流时归还流式查询占用的连接
+"""
+import os
+import io
+import csv
+import sys
+import json
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import conftest  # noqa: F401  设置测试环境，须在导入项目模块之前
+
+import modules.exporter as exporter
+from modules.database import db_manager
+from modules.migrations import migration_runner
+from modules.strawberry_dao import strawberry_dao
+from modules.exporter import bulk_exporter, CSV_COLUMNS
+
+IDS = []
+
+
+def setup_module(module=None):
+    migration_runner.migrate()
+    IDS[:] = strawberry_dao.create_strawberries(['EXP_A', 'EXP_B', 'EXP_C'], '备注,含逗号\n第二行', 'qr_')
+    first, second, third = IDS
+    strawberry_dao.update_strawberry_status(third, 'harvested')
+    db_manager.execute_update("UPDATE strawberries SET created_at = %s WHERE id = %s",
+                              (datetime(2023, 6, 1, 9, 0), second))
+    records = [
+        {'strawberry_id': first, 'image_path': 'exp_a2.jpg', 'growth_stage': 'flowering',
+         'recorded_at': datetime(2024, 1, 2, 8, 0), 'ai_description': '开花，"花瓣"完整'},
+        {'strawberry_id': first, 'image_path': 'exp_a1.jpg', 'growth_stage': 'seedling',
+         'recorded_at': datetime(2024, 1, 1, 8, 0)},
+        {'strawberry_id': second, 'image_path': 'exp_b1.jpg', 'growth_stage': 'fruiting',
+         'recorded_at': datetime(2024, 1, 3, 8, 0)},
+    ]
+    assert strawberry_dao.add_growth_records_bulk(records)['failed'] == []
+
+
+def _ndjson(**criteria):
+    text = ''.join(bulk_exporter.stream('ndjson', bulk_exporter.build_filters(**criteria)))
+    return [json.loads(line) for line in text.splitlines()]
+
+
+def _csv(**criteria):
+    text = ''.join(bulk_exporter.stream('csv', bulk_exporter.build_filters(**criteria)))
+    assert text.startswith('\ufeff')
+    return list(csv.reader(io.StringIO(text[1:])))
+
+
+def test_ndjson_export():
+    """NDJSON 每颗草莓一行，记录按时间排序，日期时间为ISO格式"""
+    items = _ndjson(prefix='EXP_')
+    assert [item['qr_code'] for item in items] == ['EXP_A', 'EXP_B', 'EXP_C']
+    first = items[0]
+    assert first['notes'] == '备注,含逗号\n第二行'
+    assert first['record_count'] == 2 and first['latest_growth_stage'] == 'flowering'
+    assert [record['image_path'] for record in first['records']] == ['exp_a1.jpg', 'exp_a2.jpg']
+    assert first['records'][1]['ai_description'] == '开花，"花瓣"完整'
+    assert first['records'][0]['recorded_at'] == '2024-01-01T08:00:00'
+    assert items[2]['records'] == []
+
+
+def test_csv_export():
+    """CSV 每条记录一行，没有记录的草莓保留一行空记录，特殊字符往返不变"""
+    rows = _csv(prefix='EXP_')
+    assert rows[0] == CSV_COLUMNS
+    column = {name: index for index, name in enumerate(CSV_COLUMNS)}
+    body = rows[1:]
+    assert [(row[column['qr_code']], row[column['record_image_path']]) for row in body] == [
+        ('EXP_A', 'exp_a1.jpg'), ('EXP_A', 'exp_a2.jpg'), ('EXP_B', 'exp_b1.jpg'), ('EXP_C', '')
+    ]
+    assert body[0][column['notes']] == '备注,含逗号\n第二行'
+    assert body[1][column['record_ai_description']] == '开花，"花瓣"完整'
+    assert body[0][column['record_recorded_at']] == '2024-01-01T08:00:00'
+
+
+def test_export_filters():
+    """按状态、创建日期范围和ID筛选"""
+    first, second, third = IDS
+    assert [item['id'] for item in _ndjson(prefix='EXP_', status='harvested')] == [third]
+    assert [item['id'] for item in _ndjson(prefix='EXP_', start='2023-06-01', end='2023-06-01')] == [second]
+    assert [item['id'] for item in _ndjson(ids=[third, first])] == [first, third]
+    assert _ndjson(prefix='EXP_NONE') == []
+
+    for call in (lambda: bulk_exporter.build_filters(start='2023-13-01'),
+                 lambda: bulk_exporter.build_filters(start='2023-06-02', end='2023-06-01'),
+                 lambda: bulk_exporter.build_filters(ids=list(range(exporter.MAX_EXPORT_IDS + 1))),
+                 lambda: bulk_exporter.stream('xml')):
+        try:
+            call()
+        except ValueError:
+            continue
+        raise AssertionError("应抛出 ValueError")
+
+
+def test_closing_stream_releases_connection():
+    """只读取第一块就关闭导出流时，流式查询的连接归还连接池"""
+    in_use = db_manager.pool.stats()['in_use']
+    chunk_size, exporter.CHUNK_SIZE = exporter.CHUNK_SIZE, 1
+    try:
+        chunks = bulk_exporter.stream('ndjson', bulk_exporter.build_filters(prefix='EXP_'))
+        assert json.loads(next(chunks))['qr_code'] == 'EXP_A'
+        assert db_manager.pool.stats()['in_use'] == in_use + 1
+        chunks.close()
+    finally:
+        exporter.CHUNK_SIZE = chunk_size
+    assert db_manager.pool.stats()['in_use'] == in_use
+
+
+if __name__ == "__main__":
+    setup_module()
+    for test in (test_ndjson_export, test_csv_export, test_export_filters, test_closing_stream_releases_connection):
+        test()
+        print(f"✅ {test.__doc__}")
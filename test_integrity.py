@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+测试系统完整性检查（使用嵌入式SQLite，无需MySQL）
+- 缺失的原图、缩略图（按原图文件名推定）和二维码图片，孤立文件和空文件
+- 增量检查复用未变化目录的文件清单，只 stat 新出现的文件
+- 删除孤立文件时跳过最近写入的文件；为原图存在的记录重新生成缩略图
+
+共用的测试库中其他测试写入了大量引用不存在文件的记录，断言只针对本文件创建的草莓和文件。
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import conftest  # noqa: F401  设置测试环境，须在导入项目模块之前
+
+from PIL import Image
+import modules.integrity as integrity
+from modules.migrations import migration_runner
+from modules.strawberry_dao import strawberry_dao
+from modules.image_manager import image_manager
+from modules.qr_code import qr_manager
+from modules.integrity import IntegrityScanner, ORPHAN_GRACE_SECONDS
+
+PATHS = {}
+RECORDS = {}
+# 早于删除孤立文件的宽限期
+OLD = time.time() - ORPHAN_GRACE_SECONDS - 3600
+
+
+def _real(path):
+    return os.path.normcase(os.path.realpath(path))
+
+
+def _directories():
+    return (image_manager.storage_path, os.path.join(image_manager.storage_path, 'thumbnails'),
+            qr_manager.storage_path)
+
+
+def _age_directories(offset=0):
+    """把存储目录的修改时间调到检查之前，使检查点记录目录清单"""
+    for directory in _directories():
+        os.utime(directory, (OLD + offset, OLD + offset))
+
+
+def setup_module(module=None):
+    migration_runner.migrate()
+    for directory in _directories():
+        os.makedirs(directory, exist_ok=True)
+    images = image_manager.storage_path
+    PATHS['image'] = os.path.join(images, 'integrity_ok.jpg')
+    Image.new('RGB', (64, 48), (200, 30, 40)).save(PATHS['image'], 'JPEG')
+    PATHS['empty'] = os.path.join(images, 'integrity_empty.jpg')
+    open(PATHS['empty'], 'wb').close()
+    PATHS['missing'] = os.path.join(images, 'integrity_missing.jpg')
+    PATHS['old_orphan'] = os.path.join(images, 'integrity_old_orphan.jpg')
+    PATHS['new_orphan'] = os.path.join(images, 'integrity_new_orphan.jpg')
+    for name in ('old_orphan', 'new_orphan'):
+        with open(PATHS[name], 'wb') as f:
+            f.write(b'orphan')
+    os.utime(PATHS['old_orphan'], (OLD, OLD))
+    PATHS['qr'] = os.path.join(qr_manager.storage_path, 'qr_INTEGRITY_A.png')
+    with open(PATHS['qr'], 'wb') as f:
+        f.write(b'\x89PNG')
+    PATHS['missing_qr'] = os.path.join(qr_manager.storage_path, 'qr_INTEGRITY_B.png')
+
+    first = strawberry_dao.create_strawberry('INTEGRITY_A', PATHS['qr'])
+    second = strawberry_dao.create_strawberry('INTEGRITY_B', PATHS['missing_qr'])
+    RECORDS['strawberries'] = (first, second)
+    result = strawberry_dao.add_growth_records_bulk([
+        {'strawberry_id': first, 'image_path': PATHS['image']},
+        {'strawberry_id': first, 'image_path': PATHS['missing']},
+        {'strawberry_id': second, 'image_path': PATHS['empty']},
+    ])
+    assert result['failed'] == []
+    RECORDS['ok'], RECORDS['missing'], RECORDS['empty'] = result['ids']
+
+
+def _scan(scanner, **options):
+    # 共用的测试库中有许多缺失文件，报告中列出全部
+    sample_size, integrity.REPORT_SAMPLE_SIZE = integrity.REPORT_SAMPLE_SIZE, 100000
+    try:
+        return scanner.scan(**options)
+    finally:
+        integrity.REPORT_SAMPLE_SIZE = sample_size
+
+
+def _missing_records(report, kind):
+    return {reference['record_id'] for reference in report['missing'][kind]}
+
+
+def test_full_scan_finds_missing_orphaned_and_empty_files():
+    """全量检查：缺失文件、孤立文件和空文件"""
+    report = _scan(IntegrityScanner(workers=2, checkpoint_path=os.path.join(conftest.TEST_DIR, 'full.json')),
+                   full=True)
+    assert report['scan']['mode'] == 'full'
+    assert not report['valid']
+
+    assert RECORDS['missing'] in _missing_records(report, 'image')
+    assert RECORDS['ok'] not in _missing_records(report, 'image')
+    # 没有缩略图路径的记录按原图文件名推定缩略图
+    assert RECORDS['ok'] in _missing_records(report, 'thumbnail')
+    first, second = RECORDS['strawberries']
+    missing_qr = {reference['strawberry_id'] for reference in report['missing']['qr_code']}
+    assert second in missing_qr and first not in missing_qr
+
+    orphans = {orphan['path'] for orphan in report['orphans']}
+    assert {_real(PATHS['old_orphan']), _real(PATHS['new_orphan'])} <= orphans
+    assert _real(PATHS['image']) not in orphans and _real(PATHS['qr']) not in orphans
+    assert {'kind': 'image', 'path': _real(PATHS['empty'])} in report['empty_files']
+
+
+def test_incremental_scan_reuses_checkpoint():
+    """增量检查：未变化的目录不重新列出，新文件只 stat 一次"""
+    scanner = IntegrityScanner(workers=2, checkpoint_path=os.path.join(conftest.TEST_DIR, 'incremental.json'))
+    _age_directories()
+    first = _scan(scanner)
+    assert first['scan']['mode'] == 'full' and first['scan']['directories_rescanned'] == 3
+
+    second = _scan(scanner)
+    assert second['scan']['mode'] == 'incremental'
+    assert second['scan']['directories_rescanned'] == 0
+    assert second['statistics'] == first['statistics']
+
+    added = os.path.join(image_manager.storage_path, 'integrity_added.jpg')
+    with open(added, 'wb') as f:
+        f.write(b'added')
+    _age_directories(offset=60)
+    third = _scan(scanner)
+    # 三个目录的修改时间都变了，但只有新文件需要 stat
+    assert third['scan']['directories_rescanned'] == 3
+    assert third['scan']['files_statted'] == second['scan']['files_statted'] + 1
+    assert _real(added) in {orphan['path'] for orphan in third['orphans']}
+    os.remove(added)
+
+
+def test_repairs():
+    """删除早于宽限期的孤立文件，为原图存在的记录重新生成缩略图"""
+    scanner = IntegrityScanner(workers=2, checkpoint_path=os.path.join(conftest.TEST_DIR, 'repair.json'))
+    report = _scan(scanner, full=True, delete_orphans=True, regenerate_thumbnails=True)
+    assert report['repaired']['orphans_deleted'] >= 1 and report['repaired']['orphans_skipped'] >= 1
+    assert not os.path.exists(PATHS['old_orphan'])
+    assert os.path.exists(PATHS['new_orphan'])
+    assert report['repaired']['thumbnails_regenerated'] >= 1
+
+    thumbnail = strawberry_dao.get_record_by_id(RECORDS['ok'])['thumbnail_path']
+    assert thumbnail and os.path.isfile(thumbnail)
+    after = _scan(scanner, full=True)
+    assert RECORDS['ok'] not in _missing_records(after, 'thumbnail')
+    assert RECORDS['missing'] in _missing_records(after, 'image')
+
+
+if __name__ == "__main__":
+    setup_module()
+    for test in (test_full_scan_finds_missing_orphaned_and_empty_files, test_incremental_scan_reuses_checkpoint,
+                 test_repairs):
+        test()
+        print(f"✅ {test.__doc__}")
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+测试后台任务和观察记录上传处理（使用嵌入式SQLite，无需MySQL）
+- 任务状态、进度和结果；任务函数抛出异常时状态为 failed
+- 独立线程池的未结束任务数上限；只保留最近的已结束任务
+- 上传同步处理和后台处理写入相同的记录，处理结束后删除上传的临时文件
+- 上传队列已满时拒绝提交并删除上传文件
+
+测试环境没有 ai_config.json，AI服务未启用，不会访问网络。
+"""
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import conftest  # noqa: F401  设置测试环境，须在导入项目模块之前
+
+from PIL import Image
+from modules.migrations import migration_runner
+from modules.strawberry_dao import strawberry_dao
+from modules.ai_service import ai_service
+from modules.jobs import JobRegistry, JobQueueFull, job_registry
+from modules.ingestion import IngestionPipeline, INGEST_POOL
+
+
+def setup_module(module=None):
+    migration_runner.migrate()
+    assert not ai_service.is_enabled()
+
+
+def _upload(name):
+    """保存一张上传的临时图片"""
+    path = os.path.join(conftest.TEST_DIR, name)
+    Image.new('RGB', (320, 240), (220, 40, 60)).save(path, 'JPEG')
+    return path
+
+
+def test_job_progress_and_result():
+    """任务依次经过 running、completed，进度和结果可查询"""
+    registry = JobRegistry(workers=1)
+    release = threading.Event()
+
+    def work(job, count):
+        release.wait(10)
+        for _ in range(count):
+            job.advance()
+        job.advance(errors=1)
+        return {'done': count}
+
+    job = registry.submit('demo', work, 3, total=4, description='示例任务')
+    assert registry.get(job.id) is job and job.status in ('pending', 'running')
+    assert not job.wait(0.05)
+    release.set()
+    assert job.wait(10)
+    assert job.status == 'completed' and job.result == {'done': 3}
+    info = job.to_dict()
+    assert (info['processed'], info['errors'], info['progress']) == (4, 1, 1.0)
+    assert info['started_at'] <= info['finished_at']
+    registry.shutdown()
+
+
+def test_failed_job():
+    """任务函数抛出异常时状态为 failed 并记录错误信息"""
+    registry = JobRegistry(workers=1)
+
+    def broken(job):
+        raise RuntimeError("磁盘已满")
+
+    job = registry.submit('broken', broken)
+    assert job.wait(10)
+    assert job.status == 'failed' and job.error == "磁盘已满" and job.result is None
+    assert job.to_dict()['progress'] == 1.0
+    registry.shutdown()
+
+
+def test_pool_limit_and_history():
+    """独立线程池达到未结束任务上限时拒绝提交，默认线程池不受影响；只保留最近的已结束任务"""
+    registry = JobRegistry(workers=1, history_size=2)
+    registry.configure_pool('limited', workers=1, max_pending=2)
+    release = threading.Event()
+    blocked = [registry.submit('block', lambda job: release.wait(10), pool='limited') for _ in range(2)]
+    assert registry.pending_count('limited') == 2
+    try:
+        registry.submit('block', lambda job: None, pool='limited')
+    except JobQueueFull:
+        pass
+    else:
+        raise AssertionError("应抛出 JobQueueFull")
+    other = registry.submit('other', lambda job: 'ok')
+    assert other.wait(10) and other.result == 'ok'
+
+    release.set()
+    assert all(job.wait(10) for job in blocked)
+    assert registry.pending_count('limited') == 0
+
+    finished = [registry.submit('quick', lambda job: None) for _ in range(3)]
+    assert all(job.wait(10) for job in finished)
+    # 提交时淘汰：最后一次提交前已结束的任务中只保留最近 history_size 个
+    registry.submit('quick', lambda job: None).wait(10)
+    assert registry.get(blocked[0].id) is None and registry.get(other.id) is None
+    assert registry.get(finished[-1].id) is finished[-1]
+    registry.shutdown()
+
+
+def test_sync_ingestion():
+    """同步处理：写入记录，附加环境和位置信息，删除上传文件"""
+    strawberry_id = strawberry_dao.create_strawberry('INGEST_SYNC')
+    upload = _upload('ingest_sync.jpg')
+    result = IngestionPipeline().process(strawberry_id, upload, {
+        'notes': '叶片舒展', 'growth_stage': 'flowering', 'location': 'A区3垄'
+    })
+    assert result and result['strawberry_id'] == strawberry_id
+    assert result['ai_enabled'] is False and result['ai_generated'] is False
+    assert result['ai_description_used'] == "叶片舒展\n位置: A区3垄"
+    assert result['growth_stage'] == 'flowering' and result['health_status'] == 'healthy'
+    assert os.path.isfile(result['image_path']) and result['image_path'] != upload
+    assert not os.path.exists(upload)
+    assert strawberry_dao.get_strawberry_by_id(strawberry_id).record_count == 1
+
+
+def test_async_ingestion():
+    """后台处理：任务分两步报告进度，结果与同步处理相同；失败时任务为 failed 且删除上传文件"""
+    pipeline = IngestionPipeline()
+    strawberry_id = strawberry_dao.create_strawberry('INGEST_ASYNC')
+    upload = _upload('ingest_async.jpg')
+    job = pipeline.submit(strawberry_id, upload, {'ai_description': '果实转红'})
+    assert job.kind == 'ingest_record' and job.pool == INGEST_POOL and job.total == 2
+    assert job.wait(30)
+    assert job.status == 'completed', job.error
+    assert job.processed == 2
+    assert job.result['strawberry_id'] == strawberry_id and job.result['ai_description'] == '果实转红'
+    assert not os.path.exists(upload)
+
+    missing = _upload('ingest_missing.jpg')
+    job = pipeline.submit(999999999, missing, {})
+    assert job.wait(30)
+    assert job.status == 'failed' and job.processed == 1
+    assert not os.path.exists(missing)
+
+
+def test_ingestion_queue_full():
+    """排队及处理中的上传达到上限时拒绝新的上传并删除上传文件"""
+    pipeline = IngestionPipeline(workers=1, max_pending=1)
+    release = threading.Event()
+    try:
+        blocker = job_registry.submit('block', lambda job: release.wait(10), pool=INGEST_POOL)
+        upload = _upload('ingest_rejected.jpg')
+        try:
+            pipeline.submit(strawberry_dao.create_strawberry('INGEST_FULL'), upload, {})
+        except JobQueueFull:
+            pass
+        else:
+            raise AssertionError("应抛出 JobQueueFull")
+        assert not os.path.exists(upload)
+    finally:
+        release.set()
+        # 恢复默认的上传线程池配置
+        IngestionPipeline()
+    assert blocker.wait(10)
+
+
+if __name__ == "__main__":
+    setup_module()
+    for test in (test_job_progress_and_result, test_failed_job, test_pool_limit_and_history,
+                 test_sync_ingestion, test_async_ingestion, test_ingestion_queue_full):
+        test()
+        print(f"✅ {test.__doc__}")
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+测试草莓列表的游标分页（使用嵌入式SQLite，无需MySQL）
+- 逐页读取的结果与按 (创建时间, ID) 倒序的全量列表一致，不重复、不遗漏
+- 创建时间相同的草莓按ID区分翻页位置
+- 状态过滤、字段集和无效游标
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import conftest  # noqa: F401  设置测试环境，须在导入项目模块之前
+
+from modules.database import db_manager
+from modules.migrations import migration_runner
+from modules.strawberry_dao import strawberry_dao
+from modules.trace_service import trace_service
+
+
+def setup_module(module=None):
+    migration_runner.migrate()
+
+
+def _walk(status=None, limit=3):
+    """按 next_cursor 逐页读取全部草莓ID"""
+    ids, after = [], None
+    while True:
+        page = trace_service.get_strawberry_page(status, limit, after)
+        assert len(page['items']) <= limit
+        ids.extend(item.id for item in page['items'])
+        if not page['has_more']:
+            assert page['next_cursor'] is None
+            return ids
+        assert page['next_cursor']
+        after = page['next_cursor']
+
+
+def test_pages_cover_all_rows_in_order():
+    """逐页读取与全量倒序列表一致；同一秒批量创建的草莓按ID翻页"""
+    # 批量创建的草莓 created_at 相同，翻页位置只能由ID区分
+    created = strawberry_dao.create_strawberries([f"PAGE_{index:02d}" for index in range(8)], None, 'qr_')
+
+    expected = [row['id'] for row in db_manager.execute_query(
+        "SELECT id FROM strawberries ORDER BY created_at DESC, id DESC"
+    )]
+    ids = _walk(limit=3)
+    assert ids == expected
+    assert len(set(ids)) == len(ids)
+    assert set(created) <= set(ids)
+
+
+def test_status_filter_and_fields():
+    """按状态过滤的分页只返回该状态；full 字段集包含最新记录的AI描述"""
+    first, second = strawberry_dao.create_strawberries(['PAGE_HARVESTED_A', 'PAGE_HARVESTED_B'], None, 'qr_')
+    strawberry_dao.update_strawberries_status([first, second], 'harvested')
+    strawberry_dao.add_growth_record(first, 'page_full.jpg', ai_description='叶片健康', growth_stage='mature')
+
+    ids = _walk('harvested', limit=1)
+    expected = [row['id'] for row in db_manager.execute_query(
+        "SELECT id FROM strawberries WHERE status = %s ORDER BY created_at DESC, id DESC", ('harvested',)
+    )]
+    assert ids == expected and {first, second} <= set(ids)
+
+    page = trace_service.get_strawberry_page('harvested', 500, fields='full')
+    items = {item.id: item for item in page['items']}
+    assert items[first].latest_ai_description == '叶片健康'
+    summary = trace_service.get_strawberry_page('harvested', 500)
+    assert 'latest_ai_description' not in {item.id: item for item in summary['items']}[first].keys()
+
+
+def test_cursor_round_trip_and_invalid_cursor():
+    """游标可还原为 (创建时间, ID)；无效游标和字段集抛出 ValueError"""
+    strawberry_dao.create_strawberry('PAGE_CURSOR')
+    item = trace_service.get_strawberry_page(limit=1)['items'][0]
+    created_at, strawberry_id = trace_service.decode_cursor(trace_service.encode_cursor(item))
+    assert strawberry_id == item.id
+    assert str(created_at) == str(item.strawberry_created_at)
+
+    for call in (lambda: trace_service.get_strawberry_page(after='not-a-cursor'),
+                 lambda: trace_service.get_strawberry_page(fields='everything')):
+        try:
+            call()
+        except ValueError:
+            continue
+        raise AssertionError("应抛出 ValueError")
+
+
+if __name__ == "__main__":
+    setup_module()
+    for test in (test_pages_cover_all_rows_in_order, test_status_filter_and_fields,
+                 test_cursor_round_trip_and_invalid_cursor):
+        test()
+        print(f"✅ {test.__doc__}")
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+测试统计报表（使用嵌入式SQLite，无需MySQL）
+- 按天/周/月汇总新增草莓、新增记录以及生长阶段、健康状态的变化
+- 报表快照在有效期内直接返回，关闭缓存时每次重新计算
+- 统计范围参数校验
+"""
+import os
+import sys
+from datetime import date, datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import conftest  # noqa: F401  设置测试环境，须在导入项目模块之前
+
+from modules.database import db_manager
+from modules.migrations import migration_runner
+from modules.strawberry_dao import strawberry_dao
+from modules.statistics import StatisticsEngine
+
+# 其他测试不会写入的历史月份
+MARCH = (date(2023, 3, 1), date(2023, 3, 31))
+
+
+def setup_module(module=None):
+    migration_runner.migrate()
+    first, second = strawberry_dao.create_strawberries(['STAT_A', 'STAT_B'], None, 'qr_')
+    db_manager.execute_update("UPDATE strawberries SET created_at = %s WHERE id = %s",
+                              (datetime(2023, 3, 1, 9, 0), first))
+    db_manager.execute_update("UPDATE strawberries SET created_at = %s WHERE id = %s",
+                              (datetime(2023, 3, 14, 9, 0), second))
+    # 直接修改了 created_at，按表数据重建创建日期计数器
+    strawberry_dao.reconcile_counters()
+
+    observations = [
+        (first, datetime(2023, 3, 2, 8), 'seedling', 'healthy'),
+        (first, datetime(2023, 3, 3, 8), 'seedling', 'healthy'),
+        (first, datetime(2023, 3, 9, 8), 'flowering', 'warning'),
+        (first, datetime(2023, 3, 20, 8), 'fruiting', 'warning'),
+        (second, datetime(2023, 3, 15, 8), 'seedling', 'healthy'),
+        (second, datetime(2023, 3, 16, 8), 'seedling', 'sick'),
+    ]
+    result = strawberry_dao.add_growth_records_bulk([
+        {'strawberry_id': strawberry_id, 'image_path': f"stat_{index}.jpg", 'recorded_at': recorded_at,
+         'growth_stage': stage, 'health_status': health}
+        for index, (strawberry_id, recorded_at, stage, health) in enumerate(observations)
+    ])
+    assert result['failed'] == []
+
+
+def test_report_by_week():
+    """按周汇总：首个时间段从范围开始日截取，各周的新增数和状态变化正确"""
+    report = StatisticsEngine(ttl=0).report(*MARCH, 'week')
+    assert report['summary'] == {
+        'new_strawberries': 2,
+        'new_records': 6,
+        'stage_transitions': {'seedling->flowering': 1, 'flowering->fruiting': 1},
+        'health_transitions': {'healthy->warning': 1, 'healthy->sick': 1}
+    }
+
+    series = {item['start']: item for item in report['series']}
+    assert min(series) == date(2023, 3, 1)
+    assert report['series'][-1]['end'] == date(2023, 3, 31)
+    assert series[date(2023, 3, 1)]['new_strawberries'] == 1
+    assert series[date(2023, 3, 1)]['new_records'] == 2
+    assert series[date(2023, 3, 6)]['stage_transitions'] == {'seedling->flowering': 1}
+    assert series[date(2023, 3, 13)]['new_strawberries'] == 1
+    assert series[date(2023, 3, 13)]['health_transitions'] == {'healthy->sick': 1}
+    assert series[date(2023, 3, 20)]['stage_transitions'] == {'flowering->fruiting': 1}
+
+
+def test_report_by_day_and_month():
+    """按天和按月汇总的合计与按周一致"""
+    engine = StatisticsEngine(ttl=0)
+    weekly = engine.report(*MARCH, 'week')['summary']
+    daily = engine.report(*MARCH, 'day')
+    monthly = engine.report(*MARCH, 'month')
+    assert daily['summary'] == weekly and monthly['summary'] == weekly
+    assert len(daily['series']) == 31 and len(monthly['series']) == 1
+    assert daily['series'][1]['new_records'] == 1
+
+
+def test_snapshot_cached_until_ttl():
+    """快照在有效期内直接返回，之后的写入要等快照过期才体现"""
+    cached = StatisticsEngine(ttl=60)
+    first = cached.report(*MARCH, 'month')
+    strawberry_id = strawberry_dao.create_strawberry('STAT_LATE')
+    db_manager.execute_update("UPDATE strawberries SET created_at = %s WHERE id = %s",
+                              (datetime(2023, 3, 31, 9, 0), strawberry_id))
+    strawberry_dao.reconcile_counters()
+
+    assert cached.report(*MARCH, 'month') is first
+    assert cached.snapshots.stats()['hits'] == 1
+    assert StatisticsEngine(ttl=0).report(*MARCH, 'month')['summary']['new_strawberries'] == 3
+
+    assert strawberry_dao.delete_strawberry(strawberry_id)
+    assert StatisticsEngine(ttl=0).report(*MARCH, 'month')['summary']['new_strawberries'] == 2
+
+
+def test_parse_range():
+    """默认范围、粒度和时间段数上限"""
+    engine = StatisticsEngine(ttl=0, max_buckets=40)
+    start, end, bucket = engine.parse_range()
+    assert end == date.today() and (end - start).days == 29 and bucket == 'day'
+    assert engine.parse_range('2023-03-01', '2023-03-31', 'week') == (*MARCH, 'week')
+
+    for args in (('2023-03-01', '2023-03-31', 'year'), ('2023-04-01', '2023-03-01', 'day'),
+                 ('2023-01-01', '2023-03-31', 'day'), ('2023-3-1x', None, None)):
+        try:
+            engine.parse_range(*args)
+        except ValueError:
+            continue
+        raise AssertionError(f"应抛出 ValueError: {args}")
+
+
+if __name__ == "__main__":
+    setup_module()
+    for test in (test_report_by_week, test_report_by_day_and_month, test_snapshot_cached_until_ttl,
+                 test_parse_range):
+        test()
+        print(f"✅ {test.__doc__}")
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+测试扫码查询缓存（使用嵌入式SQLite，无需MySQL）
+- 按ID和按二维码查询命中缓存，命中时直接返回只读的完整信息
+- 添加/删除记录、修改状态、删除草莓提交后失效缓存
+- 加载期间发生失效时不把旧数据写回缓存
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import conftest  # noqa: F401  设置测试环境，须在导入项目模块之前
+
+from modules.cache import TTLCache, strawberry_cache
+from modules.migrations import migration_runner
+from modules.strawberry_dao import strawberry_dao
+from modules.trace_service import trace_service
+
+
+def setup_module(module=None):
+    migration_runner.migrate()
+
+
+def _create(qr_code):
+    strawberry_cache.clear()
+    return strawberry_dao.create_strawberry(qr_code)
+
+
+def test_full_info_cache_hit():
+    """按ID重复查询命中缓存，返回同一个只读结构"""
+    strawberry_id = _create('CACHE_HIT')
+    hits = strawberry_cache.hits
+
+    first = trace_service.get_strawberry_full_info(strawberry_id)
+    second = trace_service.get_strawberry_full_info(strawberry_id)
+    assert second is first
+    assert strawberry_cache.hits == hits + 1
+    assert first['strawberry'].qr_code == 'CACHE_HIT'
+    assert first['records'] == () and first['record_count'] == 0
+
+    try:
+        first['record_count'] = 1
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("缓存中的完整信息应为只读")
+
+
+def test_search_by_qr_cache_hit():
+    """按二维码重复查询命中二维码和完整信息两个缓存条目，并与按ID查询共用完整信息"""
+    strawberry_id = _create('CACHE_QR')
+
+    first = trace_service.search_strawberry_by_qr('CACHE_QR')
+    hits = strawberry_cache.hits
+    second = trace_service.search_strawberry_by_qr('CACHE_QR')
+    assert second is first
+    assert strawberry_cache.hits == hits + 2
+    assert trace_service.get_strawberry_full_info(strawberry_id) is first
+    assert trace_service.search_strawberry_by_qr('CACHE_MISSING') is None
+
+
+def test_cache_invalidated_on_write():
+    """写入提交后失效缓存，下一次查询读到新数据"""
+    strawberry_id = _create('CACHE_WRITE')
+    cached = trace_service.search_strawberry_by_qr('CACHE_WRITE')
+
+    record_id = strawberry_dao.add_growth_record(strawberry_id, 'cache_write.jpg', growth_stage='flowering')
+    after_record = trace_service.search_strawberry_by_qr('CACHE_WRITE')
+    assert after_record is not cached
+    assert after_record['record_count'] == 1
+    assert after_record['strawberry'].latest_growth_stage == 'flowering'
+
+    assert strawberry_dao.update_strawberry_status(strawberry_id, 'harvested')
+    assert trace_service.get_strawberry_full_info(strawberry_id)['strawberry'].status == 'harvested'
+
+    assert strawberry_dao.delete_record(record_id)
+    assert trace_service.get_strawberry_full_info(strawberry_id)['record_count'] == 0
+
+    assert trace_service.delete_strawberry_with_cleanup(strawberry_id)
+    assert trace_service.get_strawberry_full_info(strawberry_id) is None
+    assert trace_service.search_strawberry_by_qr('CACHE_WRITE') is None
+
+
+def test_load_racing_invalidation_not_stored():
+    """加载期间有失效时，加载结果只返回给调用方，不写入缓存"""
+    cache = TTLCache(max_entries=8, ttl=60)
+
+    def loader():
+        cache.invalidate('key')
+        return 'stale'
+
+    assert cache.get_or_load('key', loader) == 'stale'
+    assert cache.get('key') is None
+    assert cache.get_or_load('key', lambda: 'fresh') == 'fresh'
+    assert cache.get('key') == 'fresh'
+
+
+if __name__ == "__main__":
+    setup_module()
+    for test in (test_full_info_cache_hit, test_search_by_qr_cache_hit, test_cache_invalidated_on_write,
+                 test_load_racing_invalidation_not_stored):
+        test()
+        print(f"✅ {test.__doc__}")
@@ -8,9 +8,11 @@ import os
 import sys
 import json
 import logging
-from datetime import datetime
+from collections.abc import Mapping
+from datetime import date, datetime
 from typing import Optional
-from flask import Flask, request, jsonify, send_from_directory, render_template_string
+from flask import Flask, Response, request, jsonify, send_from_directory, render_template_string, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 from werkzeug.exceptions import RequestEntityTooLarge
@@ -21,8 +23,19 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from config import Config
 from modules.trace_service import trace_service
+from modules.strawberry_dao import FIELD_SETS
 from modules.database import db_manager
 from modules.ai_service import ai_service
+from modules.health import health_monitor
+from modules.retention import retention_engine
+from modules.cache import strawberry_cache
+from modules.statistics import statistics_engine
+from modules.exporter import bulk_exporter, EXPORT_FORMATS
+from modules.bundle import bundle_exporter, BUNDLE_FORMATS
+from modules.models import RowModel
+from modules.jobs import job_registry, JobQueueFull
+from modules.ingestion import ingestion_pipeline, INGEST_MODES, RECORD_FORM_FIELDS
+from modules.batch_create import batch_creator
 
 # 配置日志（文件 + 控制台）
 logging.basicConfig(
@@ -35,8 +48,23 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+class TraceJSONProvider(DefaultJSONProvider):
+    """JSON序列化：datetime 输出ISO格式（确保前端解析一致），行模型按字段输出"""
+    
+    @staticmethod
+    def default(o):
+        if isinstance(o, (datetime, date)):
+            return o.isoformat()
+        if isinstance(o, RowModel):
+            return o.to_json()
+        if isinstance(o, Mapping):
+            # 缓存中的只读完整信息（MappingProxyType）
+            return dict(o)
+        return DefaultJSONProvider.default(o)
+
 # 创建Flask应用
 app = Flask(__name__)
+app.json = TraceJSONProvider(app)
 logger.info("Web API 服务初始化完成")
 
 # 配置CORS
@@ -54,6 +82,16 @@ app.config['PHOTO_STORAGE_PATH'] = Config.PHOTO_STORAGE_PATH
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs(app.config['PHOTO_STORAGE_PATH'], exist_ok=True)
 
+@app.before_request
+def start_retention():
+    """每个服务进程处理第一个请求时启动定时记录清理（包括 gunicorn/uwsgi 等 WSGI 部署）"""
+    retention_engine.ensure_started()
+
+@app.teardown_request
+def reset_db_routing(exc):
+    """请求结束后清理读写分离的线程状态"""
+    db_manager.end_request()
+
 # 允许的文件扩展名
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp'}
 
@@ -70,26 +108,17 @@ def error_response(message: str, code: int = 400):
         'timestamp': datetime.now().isoformat()
     }), code
 
-def success_response(data=None, message: str = 'Success'):
-    """返回成功响应"""
-    # 转换datetime对象为字符串，确保前端解析一致
-    def convert_datetime(obj):
-        if isinstance(obj, datetime):
-            return obj.isoformat()
-        elif isinstance(obj, dict):
-            return {k: convert_datetime(v) for k, v in obj.items()}
-        elif isinstance(obj, list):
-            return [convert_datetime(item) for item in obj]
-        else:
-            return obj
-
+def success_response(data=None, message: str = 'Success', pagination: Optional[dict] = None):
+    """返回成功响应（datetime 和行模型由 TraceJSONProvider 在序列化时转换）"""
     response = {
         'success': True,
         'message': message,
         'timestamp': datetime.now().isoformat()
     }
     if data is not None:
-        response['data'] = convert_datetime(data)
+        response['data'] = data
+    if pagination is not None:
+        response['pagination'] = pagination
     return jsonify(response)
 
 # === 静态文件路由 ===
@@ -111,19 +140,39 @@ def static_files(filename):
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    """健康检查"""
+    """健康检查（结果按 HEALTH_CACHE_TTL 缓存，复用连接池连接探活）"""
     try:
-        # 测试数据库连接
-        db_status = db_manager.test_connection()
+        report = health_monitor.readiness()
+        db_status = report['checks']['database']['ok']
         return success_response({
-            'status': 'healthy' if db_status else 'unhealthy',
+            'status': 'healthy' if report['ready'] else 'unhealthy',
             'database': 'connected' if db_status else 'disconnected',
-            'version': '1.0.0'
+            'version': '1.0.0',
+            'checks': report['checks']
         })
     except Exception as e:
         logger.error(f"健康检查失败: {e}")
         return error_response(f"健康检查失败: {str(e)}", 500)
 
+@app.route('/api/health/live', methods=['GET'])
+def liveness_check():
+    """存活检查：不访问数据库"""
+    return success_response(health_monitor.liveness(), 'alive')
+
+@app.route('/api/health/ready', methods=['GET'])
+def readiness_check():
+    """就绪检查：数据库、连接池和图片存储均正常时返回200，否则返回503"""
+    try:
+        report = health_monitor.readiness()
+        if report['ready']:
+            return success_response(report, 'ready')
+        response = success_response(report, 'not ready')
+        response.status_code = 503
+        return response
+    except Exception as e:
+        logger.error(f"就绪检查失败: {e}")
+        return error_response(f"就绪检查失败: {str(e)}", 503)
+
 @app.route('/api/strawberries', methods=['GET'])
 def get_strawberries():
     """获取草莓列表"""
@@ -131,8 +180,26 @@ def get_strawberries():
         status = request.args.get('status')
         limit_str = request.args.get('limit')
         limit = int(limit_str) if limit_str and limit_str.isdigit() else None
-        
-        strawberries = trace_service.get_strawberry_list(status, limit)
+        after = request.args.get('after')
+        # 字段集：summary（默认，不含AI描述）或 full
+        fields = request.args.get('fields', 'summary')
+        if fields not in FIELD_SETS:
+            return error_response(f"fields 参数无效，可选: {', '.join(FIELD_SETS)}")
+        
+        if limit or after:
+            # 游标分页：?after=<上一页的next_cursor>&limit=
+            try:
+                page = trace_service.get_strawberry_page(status, limit, after, fields)
+            except ValueError as e:
+                return error_response(str(e))
+            pagination = {
+                'next_cursor': page['next_cursor'],
+                'has_more': page['has_more'],
+                'limit': page['limit']
+            }
+            return success_response(page['items'], f"获取到 {len(page['items'])} 条草莓记录", pagination)
+        
+        strawberries = trace_service.get_strawberry_list(status, fields=fields)
         return success_response(strawberries, f'获取到 {len(strawberries)} 条草莓记录')
         
     except Exception as e:
@@ -157,6 +224,25 @@ def create_strawberry():
         logger.error(f"创建草莓失败: {e}")
         return error_response(f"创建草莓失败: {str(e)}", 500)
 
+@app.route('/api/strawberries/batch', methods=['POST'])
+def batch_create_strawberries():
+    """
+    批量创建草莓（后台任务执行，返回202及任务信息，进度通过 /api/jobs/<job_id> 查询）
+    
+    请求体: {"count": 1000, "prefix": "SB2025", "notes": "2025春季定植"}
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        try:
+            job = batch_creator.submit(data.get('count'), data.get('prefix'), data.get('notes'))
+        except ValueError as e:
+            return error_response(f"参数无效: {e}", 400)
+        return success_response(job.to_dict(), '批量创建任务已提交'), 202
+        
+    except Exception as e:
+        logger.error(f"批量创建草莓失败: {e}")
+        return error_response(f"批量创建草莓失败: {str(e)}", 500)
+
 @app.route('/api/strawberries/<int:strawberry_id>', methods=['GET'])
 def get_strawberry(strawberry_id):
     """获取指定草莓的完整信息"""
@@ -189,6 +275,31 @@ def search_strawberry():
         logger.error(f"搜索草莓失败: {e}")
         return error_response(f"搜索草莓失败: {str(e)}", 500)
 
+@app.route('/api/strawberries/lookup', methods=['GET', 'POST'])
+def lookup_strawberries():
+    """批量解析二维码：POST JSON {"qr_codes": [...]} 或 GET ?qr_codes=a,b"""
+    try:
+        if request.method == 'POST':
+            data = request.get_json(silent=True) or {}
+            qr_codes = data.get('qr_codes') or []
+        else:
+            qr_codes = request.args.get('qr_codes', '').split(',')
+
+        if not isinstance(qr_codes, list):
+            return error_response('qr_codes 必须是列表')
+        qr_codes = [str(code).strip() for code in qr_codes if code and str(code).strip()]
+        if not qr_codes:
+            return error_response('请提供二维码内容')
+        if len(qr_codes) > Config.LOOKUP_MAX_CODES:
+            return error_response(f'单次最多解析 {Config.LOOKUP_MAX_CODES} 个二维码')
+
+        result = trace_service.lookup_strawberries_by_qr(qr_codes)
+        return success_response(result, f"找到 {len(result['found'])} 个草莓，{len(result['missing'])} 个未匹配")
+
+    except Exception as e:
+        logger.error(f"批量解析二维码失败: {e}")
+        return error_response(f"批量解析二维码失败: {str(e)}", 500)
+
 @app.route('/api/images/test')
 def test_images():
     """测试图片目录和文件"""
@@ -335,12 +446,21 @@ def capture_photo():
 
 @app.route('/api/strawberries/<int:strawberry_id>/records', methods=['POST'])
 def add_record(strawberry_id):
-    """添加观察记录"""
+    """
+    添加观察记录
+    
+    参数 mode（查询参数或表单字段）: sync 在请求中完成处理并返回记录；async 保存上传文件后返回202及任务，
+    AI描述、图片处理和写入记录由后台线程池完成，进度通过 /api/jobs/<job_id> 查询。默认 Config.INGEST_MODE
+    """
     try:
         # strawberry_id 已从 URL 路径中获取
         if not strawberry_id:
             return error_response('草莓ID参数缺失')
         
+        mode = (request.args.get('mode') or request.form.get('mode') or Config.INGEST_MODE).lower()
+        if mode not in INGEST_MODES:
+            return error_response(f"未知的处理方式: {mode}，可选: {', '.join(INGEST_MODES)}")
+        
         # 检查是否有文件上传
         if 'image' not in request.files:
             return error_response('请上传图片文件')
@@ -352,70 +472,33 @@ def add_record(strawberry_id):
         if not allowed_file(file.filename):
             return error_response('不支持的文件格式，请上传 PNG、JPG、JPEG、GIF 或 BMP 格式的图片')
         
-        # 保存临时文件
         if not file.filename:
             return error_response('文件名不能为空')
+        
+        # 后台处理前先确认草莓存在，避免接受注定失败的上传
+        if mode == 'async' and not trace_service.dao.get_strawberry_by_id(strawberry_id):
+            return error_response(f"草莓 #{strawberry_id} 不存在", 404)
+        
+        # 保存临时文件
         filename = secure_filename(file.filename)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
         temp_filename = f"{timestamp}_{filename}"
         temp_path = os.path.join(app.config['UPLOAD_FOLDER'], temp_filename)
         file.save(temp_path)
         
         # 获取表单数据
-        growth_stage = request.form.get('growth_stage', '观察期')
-        health_status = request.form.get('health_status', 'healthy')
-        size_estimate = request.form.get('size_estimate', '')
-        color_description = request.form.get('color_description', '')
-        environment_conditions = request.form.get('environment_conditions', '')
-        location = request.form.get('location', '')
-        
-        # AI自动生成描述（优先使用AI，如果失败则使用手动输入）
-        manual_description = request.form.get('ai_description', '')
-        notes = request.form.get('notes', '')
-        ai_description = manual_description or notes or '无描述'  # 默认值
-        generated_description = None  # 初始化变量
-        
-        if ai_service.is_enabled():
-            logger.info(f"尝试使用AI生成描述: {temp_path}")
-            generated_description = ai_service.generate_description(temp_path)
-            if generated_description:
-                logger.info("AI描述生成成功")
-                ai_description = generated_description
-            else:
-                logger.warning("AI描述生成失败，使用备用描述")
-        else:
-            logger.info("AI服务未启用，使用手动输入的描述")
-        
-        # 如果有环境和位置信息，添加到AI描述中
-        if environment_conditions or location:
-            additional_info = []
-            if environment_conditions:
-                additional_info.append(f"环境条件: {environment_conditions}")
-            if location:
-                additional_info.append(f"位置: {location}")
-            additional_text = "; ".join(additional_info)
-            ai_description = ai_description + "\n" + additional_text if ai_description else additional_text
-        
-        # 添加记录
-        record = trace_service.add_observation_record(
-            strawberry_id, temp_path, ai_description, growth_stage,
-            health_status, size_estimate, color_description
-        )
+        fields = {name: request.form.get(name, default) for name, default in RECORD_FORM_FIELDS.items()}
         
-        # 清理临时文件
-        try:
-            os.remove(temp_path)
-        except:
-            pass
+        if mode == 'async':
+            try:
+                job = ingestion_pipeline.submit(strawberry_id, temp_path, fields)
+            except JobQueueFull as e:
+                return error_response(str(e), 503)
+            return success_response(job.to_dict(), '观察记录已接收，正在后台处理'), 202
         
+        record = ingestion_pipeline.process(strawberry_id, temp_path, fields)
         if record:
-            response_data = record.copy()
-            # 添加AI状态信息
-            response_data['ai_enabled'] = ai_service.is_enabled()
-            response_data['ai_generated'] = ai_service.is_enabled() and bool(generated_description)
-            response_data['ai_description_used'] = ai_description
-            
-            return success_response(response_data, '观察记录添加成功')
+            return success_response(record, '观察记录添加成功')
         else:
             return error_response('添加观察记录失败', 500)
             
@@ -427,8 +510,22 @@ def add_record(strawberry_id):
 
 @app.route('/api/statistics', methods=['GET'])
 def get_statistics():
-    """获取统计信息"""
+    """
+    获取统计信息
+    
+    带 from、to（YYYY-MM-DD，均包含）或 bucket（day/week/month）参数时，返回该范围内
+    各时间段的新增草莓、新增记录和状态变化；不带参数时返回当前总数和分布
+    """
     try:
+        if any(name in request.args for name in ('from', 'to', 'bucket')):
+            try:
+                start, end, bucket = statistics_engine.parse_range(
+                    request.args.get('from'), request.args.get('to'), request.args.get('bucket')
+                )
+            except ValueError as e:
+                return error_response(str(e), 400)
+            return success_response(statistics_engine.report(start, end, bucket), '获取统计信息成功')
+        
         stats = trace_service.get_statistics_report()
         if stats:
             return success_response(stats, '获取统计信息成功')
@@ -439,6 +536,32 @@ def get_statistics():
         logger.error(f"获取统计信息失败: {e}")
         return error_response(f"获取统计信息失败: {str(e)}", 500)
 
+@app.route('/api/metrics/db', methods=['GET'])
+def get_db_metrics():
+    """获取数据库查询统计（按语句指纹的调用次数、行数和延迟分位数）"""
+    try:
+        top_str = request.args.get('top')
+        top = int(top_str) if top_str and top_str.isdigit() else None
+        metrics = db_manager.get_metrics(top)
+        if request.args.get('reset', '').lower() == 'true':
+            db_manager.stats.reset()
+        return success_response(metrics, '获取数据库统计成功')
+        
+    except Exception as e:
+        logger.error(f"获取数据库统计失败: {e}")
+        return error_response(f"获取数据库统计失败: {str(e)}", 500)
+
+@app.route('/api/metrics/cache', methods=['GET'])
+def get_cache_metrics():
+    """获取扫码查询缓存统计（命中率、淘汰和失效次数）"""
+    try:
+        reset = request.args.get('reset', '').lower() == 'true'
+        return success_response(strawberry_cache.stats(reset=reset), '获取缓存统计成功')
+        
+    except Exception as e:
+        logger.error(f"获取缓存统计失败: {e}")
+        return error_response(f"获取缓存统计失败: {str(e)}", 500)
+
 @app.route('/api/strawberries/<int:strawberry_id>/export', methods=['GET'])
 def export_strawberry_data(strawberry_id):
     """导出草莓数据"""
@@ -458,6 +581,71 @@ def export_strawberry_data(strawberry_id):
         logger.error(f"导出数据失败: {e}")
         return error_response(f"导出数据失败: {str(e)}", 500)
 
+@app.route('/api/export', methods=['GET'])
+def export_strawberries():
+    """
+    批量导出草莓及其记录（分块响应，边查询边输出）
+    
+    参数: format（ndjson/csv，默认ndjson）、status、from/to（创建日期 YYYY-MM-DD，均包含）、prefix（二维码前缀）
+    """
+    try:
+        format_type = request.args.get('format', 'ndjson').lower()
+        if format_type not in EXPORT_FORMATS:
+            return error_response(f"未知的导出格式: {format_type}，可选: {', '.join(EXPORT_FORMATS)}", 400)
+        try:
+            filters = bulk_exporter.build_filters(
+                request.args.get('status'), request.args.get('from'),
+                request.args.get('to'), request.args.get('prefix')
+            )
+        except ValueError as e:
+            return error_response(str(e), 400)
+        
+        export_format = EXPORT_FORMATS[format_type]
+        filename = f"strawberries_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{export_format['extension']}"
+        return Response(
+            stream_with_context(bulk_exporter.stream(format_type, filters)),
+            mimetype=export_format['mimetype'],
+            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+        )
+        
+    except Exception as e:
+        logger.error(f"批量导出失败: {e}")
+        return error_response(f"批量导出失败: {str(e)}", 500)
+
+@app.route('/api/export/bundle', methods=['GET'])
+def export_bundle():
+    """
+    导出溯源包：元数据及原图、缩略图、二维码图片打包为 ZIP/tar，边打包边输出
+    
+    参数: format（zip/tar，默认zip）、ids（逗号分隔的草莓ID）、prefix（二维码前缀）、
+    from/to（创建日期 YYYY-MM-DD，均包含）、status
+    """
+    try:
+        format_type = request.args.get('format', 'zip').lower()
+        if format_type not in BUNDLE_FORMATS:
+            return error_response(f"未知的归档格式: {format_type}，可选: {', '.join(BUNDLE_FORMATS)}", 400)
+        try:
+            ids_str = request.args.get('ids')
+            ids = [int(value) for value in ids_str.split(',') if value.strip()] if ids_str else None
+            filters = bulk_exporter.build_filters(
+                request.args.get('status'), request.args.get('from'),
+                request.args.get('to'), request.args.get('prefix'), ids
+            )
+        except ValueError as e:
+            return error_response(f"参数无效: {e}", 400)
+        
+        bundle_format = BUNDLE_FORMATS[format_type]
+        filename = f"traceability_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{bundle_format['extension']}"
+        return Response(
+            stream_with_context(bundle_exporter.stream(format_type, filters)),
+            mimetype=bundle_format['mimetype'],
+            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+        )
+        
+    except Exception as e:
+        logger.error(f"导出溯源包失败: {e}")
+        return error_response(f"导出溯源包失败: {str(e)}", 500)
+
 @app.route('/api/strawberries/<int:strawberry_id>/delete', methods=['POST'])
 def delete_strawberry(strawberry_id):
     """删除草莓记录"""
@@ -517,6 +705,78 @@ def update_strawberry_status(strawberry_id):
       logger.error(f"更新草莓状态失败: {e}")
       return error_response(f"更新草莓状态失败: {str(e)}", 500)
 
+def _bulk_filters(data: dict) -> dict:
+    """
+    解析批量操作请求体：ids 为草莓ID列表，filter 中可指定 status、from/to（创建日期 YYYY-MM-DD，均包含）、prefix
+    
+    Raises:
+        ValueError: 参数无效
+    """
+    ids = data.get('ids')
+    if ids is not None:
+        if not isinstance(ids, list):
+            raise ValueError("ids 必须是草莓ID列表")
+        ids = [int(value) for value in ids]
+    criteria = data.get('filter') or {}
+    if not isinstance(criteria, dict):
+        raise ValueError("filter 必须是对象")
+    filters = bulk_exporter.build_filters(
+        criteria.get('status'), criteria.get('from'), criteria.get('to'), criteria.get('prefix')
+    )
+    filters['strawberry_ids'] = ids
+    return filters
+
+@app.route('/api/strawberries/bulk/status', methods=['POST'])
+def bulk_update_strawberry_status():
+    """
+    批量修改草莓状态
+    
+    请求体: {"status": "harvested", "ids": [1, 2, 3]} 或 {"status": "inactive", "filter": {"status": "active", "to": "2024-12-31"}}
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        try:
+            result = trace_service.bulk_update_status(data.get('status'), _bulk_filters(data))
+        except (TypeError, ValueError) as e:
+            return error_response(f"参数无效: {e}", 400)
+        return success_response(result, f"已更新 {result['updated']} 颗草莓的状态")
+        
+    except Exception as e:
+        logger.error(f"批量修改草莓状态失败: {e}")
+        return error_response(f"批量修改草莓状态失败: {str(e)}", 500)
+
+@app.route('/api/strawberries/bulk/delete', methods=['POST'])
+def bulk_delete_strawberries():
+    """
+    批量删除草莓及其记录，图片和二维码文件由后台任务删除（进度通过 /api/jobs/<job_id> 查询）
+    
+    请求体: {"ids": [1, 2, 3]} 或 {"filter": {"status": "harvested", "prefix": "SB2024"}}
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        try:
+            result = trace_service.bulk_delete_strawberries(_bulk_filters(data))
+        except (TypeError, ValueError) as e:
+            return error_response(f"参数无效: {e}", 400)
+        return success_response(result, f"已删除 {result['deleted']} 颗草莓，{result['files']} 个文件正在后台清理")
+        
+    except Exception as e:
+        logger.error(f"批量删除草莓失败: {e}")
+        return error_response(f"批量删除草莓失败: {str(e)}", 500)
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """查询后台任务的状态和进度"""
+    try:
+        job = job_registry.get(job_id)
+        if not job:
+            return error_response(f"任务不存在: {job_id}", 404)
+        return success_response(job.to_dict())
+        
+    except Exception as e:
+        logger.error(f"查询后台任务失败: {e}")
+        return error_response(f"查询后台任务失败: {str(e)}", 500)
+
 # === AI服务API ===
 
 @app.route('/api/ai/config', methods=['GET'])